@@ -0,0 +1,481 @@
+# api_tareas.py
+"""API JSON de tareas, sin interfaz, sobre la misma capa de datos que app_streamlit.py.
+
+Se levanta junto a Streamlit, en el mismo directorio (usa tareas.db y usuarios.db):
+
+    python api_tareas.py --puerto 8502
+
+SQLite en modo WAL, los reintentos ante 'database is locked' y la revisión de
+datos permiten que ambos procesos escriban a la vez: cada uno ve los cambios
+del otro en a lo más un par de segundos.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import os
+import tempfile
+
+from aiohttp import web
+
+# Fuera de `streamlit run` los decoradores de Streamlit avisan que no hay runtime
+logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+import app_streamlit as app
+from autenticacion import ErrorAutenticacion, IntentosExcedidos, iniciar_sesion, preparar_usuarios, usuario_de_sesion
+from exportacion import FORMATOS, formatos_disponibles
+from historial import historial_de, tareas_en
+from modelo_tarea import Tarea
+
+PUERTO = 8502
+LIMITE_PAGINA = 100
+MAX_LIMITE_PAGINA = 1000
+MAX_LOTE = 5000                       # tareas por petición en las operaciones por lote
+MAX_ARCHIVO = 50 * 1024 * 1024        # bytes de un archivo a importar
+ESPERA_CAMBIOS = 25                   # segundos máximos de /cambios antes de responder sin novedades
+SONDEO_CAMBIOS = 0.25                 # segundos entre miradas al canal mientras se espera
+CAMPOS_ESCRITURA = ('tarea', 'acciones', 'fecha_inicio', 'plazo', 'observaciones', 'delegada', 'estado')
+
+rutas = web.RouteTableDef()
+
+
+class ErrorPeticion(Exception):
+    """Petición inválida: se responde con `estado` y el mensaje como JSON"""
+    def __init__(self, mensaje, estado=400):
+        self.estado = estado
+        super().__init__(mensaje)
+
+
+# =========================
+# 🧰 AUXILIARES
+# =========================
+def en_hilo(funcion, *argumentos, **opciones):
+    """La capa de datos es síncrona (sqlite3): se ejecuta fuera del bucle de eventos"""
+    return asyncio.to_thread(funcion, *argumentos, **opciones)
+
+
+def respuesta(datos, estado=200, etag=None):
+    encabezados = {"ETag": etag} if etag else None
+    return web.json_response(datos, status=estado, headers=encabezados,
+                             dumps=lambda d: json.dumps(d, ensure_ascii=False))
+
+
+def no_modificado(request, etag):
+    """304 si el cliente ya tiene la versión `etag` (If-None-Match), si no None"""
+    cabecera = request.headers.get("If-None-Match")
+    if cabecera and (cabecera.strip() == "*" or etag in (e.strip() for e in cabecera.split(","))):
+        return web.Response(status=304, headers={"ETag": etag})
+    return None
+
+
+def etag_tarea(tarea):
+    return f'"t{tarea.id}-{tarea.rev}"'
+
+
+def rev_de_if_match(request, id):
+    """Revisión pedida en If-Match (la ETag de GET /tareas/{id}), o None"""
+    cabecera = request.headers.get("If-Match")
+    if not cabecera:
+        return None
+    prefijo = f'"t{id}-'
+    valor = cabecera.strip()
+    if not (valor.startswith(prefijo) and valor.endswith('"') and valor[len(prefijo):-1].isdigit()):
+        raise ErrorPeticion("If-Match debe ser la ETag de la tarea", 412)
+    return int(valor[len(prefijo):-1])
+
+
+async def leer_json(request):
+    try:
+        return await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise ErrorPeticion("El cuerpo debe ser JSON válido") from None
+
+
+def entero(valor, nombre, minimo=None, maximo=None):
+    try:
+        numero = int(valor)
+    except (TypeError, ValueError):
+        raise ErrorPeticion(f"'{nombre}' debe ser un número entero") from None
+    if (minimo is not None and numero < minimo) or (maximo is not None and numero > maximo):
+        raise ErrorPeticion(f"'{nombre}' fuera de rango")
+    return numero
+
+
+def lista_ids(cuerpo):
+    ids = cuerpo.get("ids") if isinstance(cuerpo, dict) else None
+    if not isinstance(ids, list) or not ids:
+        raise ErrorPeticion("Se espera {\"ids\": [...]} con al menos un ID")
+    if len(ids) > MAX_LOTE:
+        raise ErrorPeticion(f"Máximo {MAX_LOTE} IDs por petición", 413)
+    return [entero(id, "ids") for id in ids]
+
+
+def datos_tarea(cuerpo, base=None):
+    """Argumentos de agregar_tarea/editar_tarea desde un objeto JSON, validados.
+
+    Con `base` (la tarea guardada) los campos ausentes conservan su valor (PATCH).
+    """
+    if not isinstance(cuerpo, dict):
+        raise ErrorPeticion("Cada tarea debe ser un objeto JSON")
+    desconocidos = set(cuerpo) - set(CAMPOS_ESCRITURA) - {"id", "rev"}
+    if desconocidos:
+        raise ErrorPeticion(f"Campos desconocidos: {', '.join(sorted(desconocidos))}")
+    valores = {campo: getattr(base, campo) if base else None for campo in CAMPOS_ESCRITURA}
+    if base is None:
+        valores["estado"] = "Pendiente"
+    valores.update({campo: cuerpo[campo] for campo in CAMPOS_ESCRITURA if campo in cuerpo})
+    if not isinstance(valores["tarea"], str) or not valores["tarea"].strip():
+        raise ErrorPeticion("El campo 'tarea' es obligatorio")
+    if valores["estado"] not in app.ESTADOS:
+        raise ErrorPeticion(f"Estado inválido: {valores['estado']!r} (use {', '.join(app.ESTADOS)})")
+    # Tarea valida y normaliza las fechas (ValueError -> 400)
+    try:
+        tarea = Tarea(None, fecha_termino=None, **valores)
+    except ValueError as e:
+        raise ErrorPeticion(str(e)) from None
+    return dict(zip(CAMPOS_ESCRITURA, tarea.parametros(CAMPOS_ESCRITURA)))
+
+
+def codificar_cursor(tarea, orden):
+    valor = getattr(tarea, orden)
+    valor = valor.isoformat() if hasattr(valor, "isoformat") else valor
+    return base64.urlsafe_b64encode(json.dumps([valor, tarea.id]).encode()).decode()
+
+
+def decodificar_cursor(texto):
+    try:
+        valor, id = json.loads(base64.urlsafe_b64decode(texto.encode()))
+        return valor, int(id)
+    except (ValueError, TypeError):
+        raise ErrorPeticion("Cursor inválido") from None
+
+
+def conflicto(e):
+    """409 con la versión guardada para que el cliente decida (como el formulario de edición)"""
+    return respuesta({"error": str(e), "actual": e.actual.a_dict()}, 409, etag_tarea(e.actual))
+
+
+# =========================
+# 🔐 SESIÓN
+# =========================
+@rutas.post("/sesion")
+async def crear_sesion(request):
+    """Mismas credenciales que la app; devuelve el token para 'Authorization: Bearer'"""
+    cuerpo = await leer_json(request)
+    if not isinstance(cuerpo, dict):
+        raise ErrorPeticion("Se espera {\"email\": ..., \"password\": ...}")
+    try:
+        token = await en_hilo(iniciar_sesion, app.USER_DB_PATH, cuerpo.get("email"), cuerpo.get("password") or "")
+    except IntentosExcedidos as e:
+        limitada = respuesta({"error": str(e)}, 429)
+        limitada.headers["Retry-After"] = str(e.segundos)
+        return limitada
+    except ErrorAutenticacion as e:
+        return respuesta({"error": str(e)}, 401)
+    return respuesta({"token": token})
+
+
+@web.middleware
+async def autenticacion(request, handler):
+    if request.path != "/sesion":
+        esquema, _, token = request.headers.get("Authorization", "").partition(" ")
+        if esquema.lower() != "bearer" or not usuario_de_sesion(token.strip()):
+            return web.json_response({"error": "Se requiere un token de sesión (POST /sesion)"}, status=401,
+                                     headers={"WWW-Authenticate": "Bearer"})
+    return await handler(request)
+
+
+@web.middleware
+async def errores(request, handler):
+    try:
+        return await handler(request)
+    except ErrorPeticion as e:
+        return respuesta({"error": str(e)}, e.estado)
+
+
+# =========================
+# 📖 LECTURAS
+# =========================
+@rutas.get("/tareas")
+async def listar_tareas(request):
+    """Página de tareas con cursor (keyset): ?limite=&cursor=&orden=&desc=1&estado=&delegada=&busqueda=&archivadas=1"""
+    consulta = request.query
+    limite = entero(consulta.get("limite", LIMITE_PAGINA), "limite", 1, MAX_LIMITE_PAGINA)
+    orden = consulta.get("orden", "id")
+    if orden not in app.COLUMNAS_ORDEN.values():
+        raise ErrorPeticion(f"Orden no permitido: {orden} (use {', '.join(app.COLUMNAS_ORDEN.values())})")
+    descendente = consulta.get("desc") in ("1", "true")
+    filtros = {
+        'estados': consulta.getall("estado", []),
+        'delegada': consulta.get("delegada"),
+        'busqueda': consulta.get("busqueda"),
+        'plazo_desde': consulta.get("plazo_desde"),
+        'plazo_hasta': consulta.get("plazo_hasta"),
+        'archivadas': consulta.get("archivadas") in ("1", "true"),
+    }
+    cursor = decodificar_cursor(consulta["cursor"]) if consulta.get("cursor") else None
+
+    # La ETag se toma antes de leer: si la página resultara más nueva, el cliente solo pierde un 304
+    revision = await en_hilo(app.cache_tareas().revision)
+    etag = f'"r{revision}"'
+    if (no_cambio := no_modificado(request, etag)) is not None:
+        return no_cambio
+
+    # Una fila de más indica si hay página siguiente
+    pagina = await en_hilo(app.obtener_pagina_tareas, filtros, orden, descendente, limite + 1, 0, cursor)
+    tareas = [Tarea.desde_registro(registro) for registro in pagina.to_dict('records')]
+    siguiente = codificar_cursor(tareas[limite - 1], orden) if len(tareas) > limite else None
+    return respuesta({
+        "tareas": [tarea.a_dict() for tarea in tareas[:limite]],
+        "siguiente": siguiente,
+        "revision": revision,
+    }, etag=etag)
+
+
+@rutas.get("/tareas/{id}")
+async def ver_tarea(request):
+    id = entero(request.match_info["id"], "id")
+    tarea = await en_hilo(app.obtener_tarea_por_id, id)
+    if tarea is None:
+        raise ErrorPeticion(f"La tarea {id} no existe", 404)
+    etag = etag_tarea(tarea)
+    return no_modificado(request, etag) or respuesta(tarea.a_dict(), etag=etag)
+
+
+@rutas.get("/tareas/{id}/historial")
+async def ver_historial(request):
+    id = entero(request.match_info["id"], "id")
+    entradas = await en_hilo(historial_de, app.DB_FILE, id)
+    if not entradas:
+        raise ErrorPeticion(f"La tarea {id} no tiene historial", 404)
+    return respuesta([{**entrada, "cambios": {campo: {"antes": antes, "despues": despues}
+                                              for campo, (antes, despues) in entrada["cambios"].items()}}
+                      for entrada in entradas])
+
+
+@rutas.get("/historial")
+async def tareas_en_fecha(request):
+    """Todas las tareas como estaban en ?en= (fecha u hora ISO)"""
+    if not request.query.get("en"):
+        raise ErrorPeticion("Indique ?en=AAAA-MM-DD (o fecha y hora ISO)")
+    try:
+        tareas = await en_hilo(tareas_en, app.DB_FILE, request.query["en"])
+    except ValueError:
+        raise ErrorPeticion(f"Fecha inválida: {request.query['en']!r}") from None
+    return respuesta({"en": request.query["en"], "tareas": [tarea.a_dict() for tarea in tareas]})
+
+
+@rutas.get("/cambios")
+async def esperar_cambios(request):
+    """Long polling: responde cuando la revisión supera ?desde= (o tras ?espera= segundos)"""
+    desde = entero(request.query.get("desde", 0), "desde", 0)
+    espera = entero(request.query.get("espera", ESPERA_CAMBIOS), "espera", 0, ESPERA_CAMBIOS)
+    canal = app.canal_cambios()
+    limite = asyncio.get_running_loop().time() + espera
+    # Se mira el canal en memoria: esperar no ocupa un hilo ni consulta SQLite
+    while canal.revision() <= desde and asyncio.get_running_loop().time() < limite:
+        await asyncio.sleep(SONDEO_CAMBIOS)
+    revision = canal.revision()
+    ids = canal.ids_cambiados(desde, revision) if revision > desde else set()
+    return respuesta({"revision": revision, "ids": sorted(ids) if ids is not None else None})
+
+
+@rutas.get("/exportar")
+async def exportar(request):
+    formato = request.query.get("formato", "xlsx")
+    if formato not in formatos_disponibles():
+        raise ErrorPeticion(f"Formato no disponible: {formato} (use {', '.join(formatos_disponibles())})")
+    revision = await en_hilo(app.cache_tareas().revision)
+    archivadas = request.query.get("archivadas") in ("1", "true")
+    etag = f'"r{revision}-{formato}{"-a" if archivadas else ""}"'
+    if (no_cambio := no_modificado(request, etag)) is not None:
+        return no_cambio
+    datos = await en_hilo(app.exportar_en_memoria, formato, archivadas)
+    if datos is None:
+        raise ErrorPeticion("No hay tareas para exportar", 404)
+    extension, mime = FORMATOS[formato]
+    return web.Response(body=datos, content_type=mime, headers={
+        "ETag": etag, "Content-Disposition": f'attachment; filename="tareas{extension}"',
+    })
+
+
+# =========================
+# ✏️ ESCRITURAS
+# =========================
+@rutas.post("/tareas")
+async def crear_tareas(request):
+    """Un objeto crea una tarea; una lista, todas en una transacción"""
+    cuerpo = await leer_json(request)
+    if isinstance(cuerpo, list):
+        if len(cuerpo) > MAX_LOTE:
+            raise ErrorPeticion(f"Máximo {MAX_LOTE} tareas por petición", 413)
+        ids = await en_hilo(app.agregar_tareas, [datos_tarea(item) for item in cuerpo])
+        return respuesta({"ids": ids}, 201)
+    id = await en_hilo(app.agregar_tarea, **datos_tarea(cuerpo))
+    tarea = await en_hilo(app.obtener_tarea_por_id, id)
+    creada = respuesta(tarea.a_dict(), 201, etag_tarea(tarea))
+    creada.headers["Location"] = f"/tareas/{id}"
+    return creada
+
+
+async def guardar_tarea(request, parcial):
+    id = entero(request.match_info["id"], "id")
+    cuerpo = await leer_json(request)
+    rev = rev_de_if_match(request, id)
+    if rev is None and isinstance(cuerpo, dict) and cuerpo.get("rev") is not None:
+        rev = entero(cuerpo["rev"], "rev")
+    base = None
+    if parcial:
+        base = await en_hilo(app.obtener_tarea_por_id, id)
+        if base is None:
+            raise ErrorPeticion(f"La tarea {id} no existe", 404)
+        # Se mezcla sobre lo leído: si otro guarda entremedio, es un conflicto y no se pisa
+        rev = base.rev if rev is None else rev
+    try:
+        await en_hilo(app.editar_tarea, id, **datos_tarea(cuerpo, base), rev=rev)
+    except app.ConflictoEdicion as e:
+        return conflicto(e)
+    except app.TareaInexistente as e:
+        raise ErrorPeticion(str(e), 404) from None
+    tarea = await en_hilo(app.obtener_tarea_por_id, id)
+    return respuesta(tarea.a_dict(), etag=etag_tarea(tarea))
+
+
+@rutas.put("/tareas/{id}")
+async def reemplazar_tarea(request):
+    """Reemplaza la tarea; con If-Match (o "rev") solo si nadie la cambió antes"""
+    return await guardar_tarea(request, parcial=False)
+
+
+@rutas.patch("/tareas/{id}")
+async def modificar_tarea(request):
+    """Cambia solo los campos enviados"""
+    return await guardar_tarea(request, parcial=True)
+
+
+@rutas.delete("/tareas/{id}")
+async def borrar_tarea(request):
+    id = entero(request.match_info["id"], "id")
+    if await en_hilo(app.obtener_tarea_por_id, id) is None:
+        raise ErrorPeticion(f"La tarea {id} no existe", 404)
+    await en_hilo(app.eliminar_tarea, id)
+    return web.Response(status=204)
+
+
+# =========================
+# 📦 OPERACIONES POR LOTE
+# =========================
+@rutas.post("/tareas/estados")
+async def cambiar_estados(request):
+    """{"cambios": {"id": "estado", ...}} en una sola transacción"""
+    cuerpo = await leer_json(request)
+    cambios = cuerpo.get("cambios") if isinstance(cuerpo, dict) else None
+    if not isinstance(cambios, dict) or not cambios:
+        raise ErrorPeticion("Se espera {\"cambios\": {\"id\": \"estado\"}}")
+    if len(cambios) > MAX_LOTE:
+        raise ErrorPeticion(f"Máximo {MAX_LOTE} cambios por petición", 413)
+    invalidos = sorted({estado for estado in cambios.values() if estado not in app.ESTADOS}, key=str)
+    if invalidos:
+        raise ErrorPeticion(f"Estados inválidos: {', '.join(map(str, invalidos))}")
+    # Cuentan solo las que existen: un ID inexistente o archivado no se actualiza
+    actualizadas = await en_hilo(app.actualizar_estados,
+                                 {entero(id, "id"): estado for id, estado in cambios.items()})
+    return respuesta({"actualizadas": actualizadas})
+
+
+@rutas.post("/tareas/reasignar")
+async def reasignar(request):
+    cuerpo = await leer_json(request)
+    ids = lista_ids(cuerpo)
+    delegada = cuerpo.get("delegada")
+    if delegada is not None and not isinstance(delegada, str):
+        raise ErrorPeticion("'delegada' debe ser texto o null")
+    actualizadas = await en_hilo(app.reasignar_tareas, ids, (delegada or "").strip() or None)
+    return respuesta({"actualizadas": actualizadas})
+
+
+@rutas.post("/tareas/eliminar")
+async def eliminar_lote(request):
+    ids = lista_ids(await leer_json(request))
+    return respuesta({"eliminadas": await en_hilo(app.eliminar_tareas, ids)})
+
+
+@rutas.post("/tareas/archivar")
+async def archivar(request):
+    """{"dias": N}: archiva las terminadas hace más de N días (por defecto, los de la app)"""
+    cuerpo = await leer_json(request) if request.can_read_body else {}
+    dias = entero((cuerpo or {}).get("dias", app.DIAS_ARCHIVO), "dias", 0)
+    return respuesta({"archivadas": await en_hilo(app.archivar_tareas, dias)})
+
+
+@rutas.post("/tareas/restaurar")
+async def restaurar(request):
+    ids = lista_ids(await leer_json(request))
+    return respuesta({"restauradas": await en_hilo(app.restaurar_tareas, ids)})
+
+
+@rutas.post("/importar")
+async def importar(request):
+    """Cuerpo: el archivo .xlsx o .csv tal cual (?formato=csv para CSV)"""
+    formato = request.query.get("formato", "xlsx")
+    if formato not in ("xlsx", "csv"):
+        raise ErrorPeticion("Solo se importan archivos xlsx o csv")
+    # Se copia a disco por partes: el archivo no se carga entero en memoria
+    descriptor, ruta = tempfile.mkstemp(suffix=f".{formato}")
+    try:
+        recibidos = 0
+        with os.fdopen(descriptor, "wb") as archivo:
+            async for parte in request.content.iter_chunked(1024 * 1024):
+                recibidos += len(parte)
+                if recibidos > MAX_ARCHIVO:
+                    raise ErrorPeticion(f"El archivo supera {MAX_ARCHIVO // (1024 * 1024)} MB", 413)
+                archivo.write(parte)
+        if recibidos == 0:
+            raise ErrorPeticion("El cuerpo está vacío")
+        # Archivo dañado, con otra codificación o que no es del formato indicado: error del cliente
+        from zipfile import BadZipFile
+        from openpyxl.utils.exceptions import InvalidFileException
+        from pandas.errors import ParserError
+        try:
+            reporte = await en_hilo(app.importar_archivo, ruta)
+        except (ValueError, KeyError, UnicodeDecodeError, ParserError, BadZipFile, InvalidFileException) as e:
+            raise ErrorPeticion(f"No se pudo importar: {e}") from None
+    finally:
+        os.remove(ruta)
+    return respuesta({
+        "insertadas": reporte.insertadas,
+        "actualizadas": reporte.actualizadas,
+        "sin_cambios": reporte.sin_cambios,
+        "omitidas": [{"fila": fila, "motivo": motivo} for fila, motivo in reporte.omitidas],
+        "invalidas": [{"fila": fila, "motivo": motivo} for fila, motivo in reporte.invalidas],
+    })
+
+
+# =========================
+# 🚀 ARRANQUE
+# =========================
+async def preparar(aplicacion):
+    await en_hilo(app.init_db)
+    await en_hilo(preparar_usuarios, app.USER_DB_PATH)
+    app.canal_cambios()  # vigila las escrituras de Streamlit y otros procesos
+
+
+def crear_app():
+    aplicacion = web.Application(middlewares=[errores, autenticacion], client_max_size=MAX_ARCHIVO)
+    aplicacion.add_routes(rutas)
+    aplicacion.on_startup.append(preparar)
+    return aplicacion
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="API JSON de tareas")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=PUERTO)
+    opciones = parser.parse_args(argumentos)
+    print(f"[api_tareas] Escuchando en http://{opciones.host}:{opciones.puerto}")
+    web.run_app(crear_app(), host=opciones.host, port=opciones.puerto, print=None)
+
+
+if __name__ == "__main__":
+    main()
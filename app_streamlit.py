@@ -1,89 +1,77 @@
 import streamlit as st
-import pandas as pd
-import sqlite3
-from datetime import datetime
+from datetime import date, datetime
+import copy
+import functools
 import os
-import numpy as np
-import base64  # Añadido para manejar la imagen
-
-# 🔐 AUTENTICACIÓN (nuevos imports)
-import secrets
-import string
+import json
 from pathlib import Path
+from streamlit import runtime
+
+from archivo import DIAS_ARCHIVO, archivar, restaurar
+from autenticacion import (ErrorAutenticacion, cambiar_clave, iniciar_sesion, preparar_usuarios,
+                           recuperar_clave, usuario_de_sesion)
+from busqueda import buscar_tareas, consulta_fts, indice_para_importacion, reparar_indice
+from cache_tareas import CacheTareas
+from conexion import liberar_conexiones, obtener_conexion, reintentar_si_ocupada
+from exportacion import FORMATOS, exportar_tareas, formatos_disponibles
+from exportacion_excel import ExportadorExcel
+from historial import historial_de
+from instrumentacion import ejecucion, fase, medido, ultimas_ejecuciones
+from migraciones import asegurar_esquema
+from modelo_tarea import CAMPOS, Tarea
+from notificaciones import canal_de
+from recursos import css_app, encabezado_html, logo_data_uri
+from resumen import leer_resumen
+from sincronizacion_excel import SincronizadorExcel, escribir_atomico
 
 DB_FILE = "tareas.db"
 EXCEL_FILE = "tareas_exportadas.xlsx"
 EXCEL_EXPORTADO = "Excel_Exportado.xlsx"  # Nuevo nombre para exportación manual
 
+# Columna en la BD -> encabezado en el Excel (exportación e importación)
+COLUMNAS_EXCEL = {
+    'id': 'ID',
+    'tarea': 'Tarea',
+    'acciones': 'Acciones a Realizar',
+    'fecha_inicio': 'Fecha Inicio',
+    'plazo': 'Plazo',
+    'observaciones': 'Observaciones',
+    'estado': 'Estado',
+    'delegada': 'Delegada a',
+    'fecha_termino': 'F.Término'
+}
+COLUMNAS_FECHA = ['fecha_inicio', 'plazo', 'fecha_termino']
+# Filas importadas sin ID: se consideran la misma tarea si coinciden en estas columnas
+CLAVE_NATURAL = ('tarea', 'fecha_inicio', 'delegada')
+
+ESTADOS = ["Pendiente", "En Proceso", "Terminada"]
+# Columnas por las que se puede ordenar el listado (etiqueta -> columna)
+COLUMNAS_ORDEN = {
+    'Plazo': 'plazo',
+    'F. Inicio': 'fecha_inicio',
+    'F. Término': 'fecha_termino',
+    'Estado': 'estado',
+    'Delegada a': 'delegada',
+    'Tarea': 'tarea',
+    'ID': 'id'
+}
+TAMANOS_PAGINA = [25, 50, 100, 200]
+INTERVALO_AVISOS = 5  # segundos entre revisiones de cambios de otras sesiones
+
 # =========================
-# 🔐 BASE DE DATOS DE USUARIOS (idéntico a app.py)
+# 🔐 AUTENTICACIÓN (usuarios.db y sesiones en autenticacion.py)
 # =========================
 USER_DB_PATH = Path("usuarios.db")
 
-def init_user_db():
-    """Inicializa la base de datos de usuarios"""
-    with sqlite3.connect(USER_DB_PATH) as con:
-        con.execute("""
-            CREATE TABLE IF NOT EXISTS usuarios(
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                email TEXT UNIQUE NOT NULL,
-                password TEXT NOT NULL,
-                secret_word TEXT NOT NULL
-            );
-        """)
-        # Insertar usuarios por defecto si no existen
-        usuarios_por_defecto = [
-            ("dcostar@isl.gob.cl", "123456", "seguridad"),
-            ("pclaissacs@isl.gob.cl", "123456", "prevencion")
-        ]
-        for email, password, secret_word in usuarios_por_defecto:
-            try:
-                con.execute(
-                    "INSERT OR IGNORE INTO usuarios (email, password, secret_word) VALUES (?, ?, ?)",
-                    (email, password, secret_word)
-                )
-            except Exception as e:
-                st.error(f"Error al insertar usuario {email}: {str(e)}")
-        con.commit()
-
-def get_user(email):
-    """Obtiene un usuario por email"""
-    with sqlite3.connect(USER_DB_PATH) as con:
-        cur = con.execute("SELECT * FROM usuarios WHERE email = ?", (email,))
-        result = cur.fetchone()
-        if result:
-            return {
-                "id": result[0],
-                "email": result[1],
-                "password": result[2],
-                "secret_word": result[3]
-            }
-        return None
-
-def update_user_password(email, new_password):
-    """Actualiza la contraseña de un usuario"""
-    with sqlite3.connect(USER_DB_PATH) as con:
-        con.execute(
-            "UPDATE usuarios SET password = ? WHERE email = ?",
-            (new_password, email)
-        )
-        con.commit()
-        return True
-
-def generate_temp_password(length=8):
-    """Genera una contraseña temporal"""
-    alphabet = string.ascii_letters + string.digits
-    return ''.join(secrets.choice(alphabet) for _ in range(length))
-
 def check_authentication():
     """Muestra el login con pestañas y detiene la app hasta autenticarse"""
-    if 'authenticated' not in st.session_state:
-        st.session_state.authenticated = False
-        st.session_state.current_user = None
+    # Con un token vigente no se toca usuarios.db: se verifica en memoria
+    email = usuario_de_sesion(st.session_state.get("token_sesion"))
+    st.session_state.current_user = email
     
-    if not st.session_state.authenticated:
-        # Inicializar base de datos de usuarios
-        init_user_db()
+    if not email:
+        # Solo la primera vez en el proceso crea la tabla y migra claves
+        preparar_usuarios(USER_DB_PATH)
         # Formulario centrado como en app.py
         col1, col2, col_center, col4, col5 = st.columns([1,1,2,1,1])
         with col_center:
@@ -96,14 +84,13 @@ def check_authentication():
                 password = st.text_input("Contraseña", type="password", key="login_password")
                 
                 if st.button("Ingresar", key="login_btn", use_container_width=True):
-                    user = get_user(email)
-                    if user and password == user["password"]:
-                        st.session_state.authenticated = True
-                        st.session_state.current_user = email
+                    try:
+                        st.session_state["token_sesion"] = iniciar_sesion(USER_DB_PATH, email, password)
+                    except ErrorAutenticacion as e:
+                        st.error(f"❌ {e}")
+                    else:
                         st.success("✅ Credenciales correctas. Redirigiendo...")
                         st.rerun()
-                    else:
-                        st.error("❌ Correo o contraseña incorrectos")
             
             with tab2:
                 st.subheader("Recuperar Contraseña")
@@ -111,14 +98,13 @@ def check_authentication():
                 secret_word = st.text_input("Palabra secreta", type="password", key="secret_word")
                 
                 if st.button("Generar Clave Temporal", key="recover_btn", use_container_width=True):
-                    user = get_user(recovery_email)
-                    if user and secret_word == user["secret_word"]:
-                        temp_password = generate_temp_password()
-                        update_user_password(recovery_email, temp_password)
+                    try:
+                        temp_password = recuperar_clave(USER_DB_PATH, recovery_email, secret_word)
+                    except ErrorAutenticacion as e:
+                        st.error(f"❌ {e}")
+                    else:
                         st.success(f"✅ Clave temporal generada: **{temp_password}**")
                         st.info("Por seguridad, cambie su contraseña después de ingresar al sistema.")
-                    else:
-                        st.error("❌ Correo o palabra secreta incorrectos")
             
             with tab3:
                 st.subheader("Cambiar Contraseña")
@@ -128,34 +114,23 @@ def check_authentication():
                 confirm_password = st.text_input("Confirmar nueva contraseña", type="password", key="confirm_password")
                 
                 if st.button("Cambiar Contraseña", key="change_btn", use_container_width=True):
-                    user = get_user(change_email)
-                    if not user:
-                        st.error("❌ Correo electrónico no válido")
-                    elif current_password != user["password"]:
-                        st.error("❌ Contraseña actual incorrecta")
-                    elif new_password != confirm_password:
+                    if new_password != confirm_password:
                         st.error("❌ Las contraseñas no coinciden")
                     else:
-                        update_user_password(change_email, new_password)
-                        st.success("✅ Contraseña cambiada exitosamente")
+                        try:
+                            cambiar_clave(USER_DB_PATH, change_email, current_password, new_password)
+                        except ErrorAutenticacion as e:
+                            st.error(f"❌ {e}")
+                        else:
+                            st.success("✅ Contraseña cambiada exitosamente")
         
         st.stop()  # Detener ejecución hasta que se autentique
 
 # =========================
-# CONVERTIR IMAGEN LOCAL A BASE64
+# LOGO (reducido y cacheado por proceso en recursos.py)
 # =========================
-def image_to_base64(path):
-    try:
-        with open(path, "rb") as img_file:
-            return base64.b64encode(img_file.read()).decode()
-    except FileNotFoundError:
-        st.error(f"Archivo de imagen no encontrado: {path}")
-        return None
-
-# Cargar imagen
 IMAGEN_LOCAL = "LOGO-PROPIO-ISL-2023-CMYK-01.png"
-img_base64 = image_to_base64(IMAGEN_LOCAL)
-img_src = f"data:image/png;base64,{img_base64}" if img_base64 else None
+img_src = logo_data_uri(IMAGEN_LOCAL)
 
 # =========================
 # Configuración del encabezado
@@ -164,374 +139,753 @@ COLOR_FONDO = "#0F69B4"  # Azul
 TITULO = "COMPROMISOS OCT"
 SUBTITULO = "Coordinación Territorial"
 
+@medido
 def init_db():
-    with sqlite3.connect(DB_FILE) as conn:
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS tareas (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                tarea TEXT NOT NULL,
-                acciones TEXT,
-                fecha_inicio TEXT,
-                plazo TEXT,
-                observaciones TEXT,
-                estado TEXT DEFAULT 'Pendiente',
-                delegada TEXT,
-                fecha_termino TEXT
-            )
-        ''')
-        conn.commit()
-
-    migrar_esquema()
-
-def migrar_esquema():
-    with sqlite3.connect(DB_FILE) as conn:
-        cursor = conn.execute("PRAGMA table_info(tareas)")
-        columnas = [col[1] for col in cursor.fetchall()]
-
-        if 'nombre' in columnas:
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS tareas_nueva (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    tarea TEXT NOT NULL,
-                    acciones TEXT,
-                    fecha_inicio TEXT,
-                    plazo TEXT,
-                    observaciones TEXT,
-                    estado TEXT DEFAULT 'Pendiente',
-                    delegada TEXT,
-                    fecha_termino TEXT
-                )
-            ''')
-
-            conn.execute('''
-                INSERT INTO tareas_nueva (id, tarea, acciones, estado, delegada)
-                SELECT id, nombre, descripcion, estado, responsable
-                FROM tareas
-            ''')
-
-            conn.execute("DROP TABLE tareas")
-            conn.execute("ALTER TABLE tareas_nueva RENAME TO tareas")
-            conn.commit()
-            st.success("Esquema de base de datos actualizado exitosamente")
-
-        # Asegurarse de que la columna fecha_termino exista
-        cursor = conn.execute("PRAGMA table_info(tareas)")
-        columnas = [col[1] for col in cursor.fetchall()]
-        if 'fecha_termino' not in columnas:
-            conn.execute("ALTER TABLE tareas ADD COLUMN fecha_termino TEXT")
-            conn.commit()
+    """Deja el esquema al día; tras la primera llamada del proceso no hace consultas"""
+    asegurar_esquema(DB_FILE)
+    revisar_indice_busqueda()
 
+def recurso_del_proceso(funcion):
+    """st.cache_resource bajo `streamlit run`; fuera de él (api_tareas.py, benchmark) un lru_cache.
+
+    Sin runtime st.cache_resource no guarda nada: cada llamada crearía otra caché u otro hilo.
+    """
+    en_streamlit = st.cache_resource(funcion)
+    en_proceso = functools.lru_cache(maxsize=None)(funcion)
+    @functools.wraps(funcion)
+    def recurso():
+        return en_streamlit() if runtime.exists() else en_proceso()
+    return recurso
+
+@recurso_del_proceso
+def revisar_indice_busqueda():
+    """Una vez por proceso: repara el índice de búsqueda si quedó suspendido"""
+    reparar_indice(DB_FILE)
+
+@recurso_del_proceso
+def cache_tareas():
+    """Caché de lecturas compartida por todas las sesiones del proceso"""
+    return CacheTareas(DB_FILE, canal=canal_cambios())
+
+def canal_cambios():
+    """Feed de cambios del proceso: las escrituras publican y las sesiones miran la revisión"""
+    canal = canal_de(DB_FILE)
+    canal.vigilar()  # escrituras de otros procesos (p. ej. db.py); se inicia una sola vez
+    return canal
+
+def _clave_filtros(filtros):
+    return tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in (filtros or {}).items()))
+
+def registrar_cambios(exportar=True):
+    """Invalida las lecturas cacheadas y, si corresponde, agenda la exportación a Excel"""
+    cache_tareas().registrar_escritura()
+    if exportar:
+        sincronizador_excel().marcar_pendiente()
+
+def iterar_tareas(consulta="SELECT * FROM tareas ORDER BY id", parametros=()):
+    """Recorre las tareas como objetos Tarea, de a una y sin pasar por un DataFrame"""
+    return Tarea.desde_cursor(obtener_conexion(DB_FILE).execute(consulta, parametros))
+
+@medido
 def obtener_tareas():
-    with sqlite3.connect(DB_FILE) as conn:
-        df = pd.read_sql_query("SELECT * FROM tareas", conn)
-    return df
+    """Todas las tareas (lista compartida por la caché: no modificar sus elementos)"""
+    return list(cache_tareas().consulta(('todas',), lambda: tuple(iterar_tareas())))
+
+def _condiciones_filtro(filtros, archivo=False):
+    """Traduce el dict de filtros del listado a una cláusula WHERE parametrizada.
+
+    Con `archivo` es para 'tareas_archivo', que no está en el índice FTS: la
+    búsqueda se resuelve con LIKE por palabra (las archivadas son pocas consultas).
+    """
+    filtros = filtros or {}
+    condiciones, parametros = [], []
+    if archivo and filtros.get('busqueda'):
+        texto = "IFNULL(tarea, '') || ' ' || IFNULL(acciones, '') || ' ' || IFNULL(observaciones, '') || ' ' || IFNULL(delegada, '')"
+        for palabra in filtros['busqueda'].split():
+            condiciones.append(f"({texto}) LIKE ?")
+            parametros.append(f"%{palabra}%")
+    elif consulta := consulta_fts(filtros.get('busqueda')):
+        condiciones.append("id IN (SELECT rowid FROM tareas_fts WHERE tareas_fts MATCH ?)")
+        parametros.append(consulta)
+    if filtros.get('estados'):
+        condiciones.append(f"estado IN ({', '.join('?' for _ in filtros['estados'])})")
+        parametros.extend(filtros['estados'])
+    if filtros.get('delegada'):
+        condiciones.append("delegada = ?")
+        parametros.append(filtros['delegada'])
+    if filtros.get('plazo_desde'):
+        condiciones.append("plazo >= ?")
+        parametros.append(filtros['plazo_desde'])
+    if filtros.get('plazo_hasta'):
+        condiciones.append("plazo <= ?")
+        parametros.append(filtros['plazo_hasta'])
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+    return where, parametros
+
+def _origen_listado(filtros):
+    """(FROM, WHERE, parámetros) del listado: solo 'tareas' o, con 'archivadas', también el archivo.
+
+    Con el archivo cada tabla se filtra por separado y se unen con UNION ALL;
+    la columna 'archivada' distingue de dónde viene cada fila.
+    """
+    where, parametros = _condiciones_filtro(filtros)
+    if not (filtros or {}).get('archivadas'):
+        return "tareas", where, parametros
+    where_archivo, parametros_archivo = _condiciones_filtro(filtros, archivo=True)
+    columnas = ", ".join(CAMPOS)
+    origen = (f"(SELECT {columnas}, 0 AS archivada FROM tareas {where} "
+              f"UNION ALL SELECT {columnas}, 1 AS archivada FROM tareas_archivo {where_archivo})")
+    return origen, "", parametros + parametros_archivo
+
+@medido
+def contar_tareas(filtros=None):
+    origen, where, parametros = _origen_listado(filtros)
+    return cache_tareas().consulta(
+        ('conteo', _clave_filtros(filtros)),
+        lambda: obtener_conexion(DB_FILE).execute(f"SELECT COUNT(*) FROM {origen} {where}", parametros).fetchone()[0]
+    )
+
+def _despues_del_cursor(orden, cursor, descendente):
+    """Condición keyset "después de (valor, id)" y sus parámetros.
+
+    SQLite ordena los NULL como el menor valor: primero en ASC y al final en DESC.
+    """
+    valor, id = cursor
+    if orden == 'id':
+        return ("id < ?" if descendente else "id > ?"), [id]
+    if valor is None:
+        if descendente:
+            return f"({orden} IS NULL AND id < ?)", [id]
+        return f"({orden} IS NOT NULL OR id > ?)", [id]
+    if descendente:
+        return f"({orden} < ? OR {orden} IS NULL OR ({orden} = ? AND id < ?))", [valor, valor, id]
+    return f"({orden} > ? OR ({orden} = ? AND id > ?))", [valor, valor, id]
+
+@medido
+def obtener_pagina_tareas(filtros=None, orden='id', descendente=False, limite=50,
+                          desplazamiento=0, cursor=None):
+    """Devuelve solo una página del listado, filtrada y ordenada en SQL.
+
+    `cursor` permite paginar por clave (keyset): es el par (valor_orden, id) de la
+    última fila de la página anterior y sustituye a `desplazamiento`.
+    """
+    if orden not in COLUMNAS_ORDEN.values():
+        raise ValueError(f"Columna de orden no permitida: {orden}")
+    origen, where, parametros = _origen_listado(filtros)
+    direccion = "DESC" if descendente else "ASC"
+    if cursor is not None:
+        condicion, valores = _despues_del_cursor(orden, cursor, descendente)
+        where += (" AND " if where else "WHERE ") + condicion
+        parametros = parametros + valores
+        desplazamiento = 0
+    # Columna sin IFNULL: así el índice (columna, id) entrega el orden sin ordenar en memoria
+    orden_sql = f"id {direccion}" if orden == 'id' else f"{orden} {direccion}, id {direccion}"
+    consulta = f"""
+        SELECT * FROM {origen} {where}
+        ORDER BY {orden_sql}
+        LIMIT ? OFFSET ?
+    """
+    parametros = parametros + [limite, desplazamiento]
+    import pandas as pd
+    df = cache_tareas().consulta(
+        ('pagina', consulta, tuple(parametros)),
+        lambda: pd.read_sql_query(consulta, obtener_conexion(DB_FILE), params=parametros)
+    )
+    return df.copy()
+
+@medido
+def obtener_delegadas():
+    """Valores distintos de 'delegada' para el filtro del listado"""
+    def consultar():
+        filas = obtener_conexion(DB_FILE).execute(
+            "SELECT DISTINCT delegada FROM tareas WHERE delegada IS NOT NULL AND delegada != '' ORDER BY delegada"
+        ).fetchall()
+        return [fila[0] for fila in filas]
+    return list(cache_tareas().consulta(('delegadas',), consultar))
 
+def _consultar_tarea(id):
+    return next(iterar_tareas("SELECT * FROM tareas WHERE id = ?", (id,)), None)
+
+@medido
 def obtener_tarea_por_id(id):
-    with sqlite3.connect(DB_FILE) as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM tareas WHERE id=?", (id,))
-        tarea = cursor.fetchone()
-        if tarea:
-            columns = [column[0] for column in cursor.description]
-            return dict(zip(columns, tarea))
-        return None
+    tarea = cache_tareas().tarea(int(id), lambda: _consultar_tarea(id))
+    return copy.copy(tarea) if tarea else None
 
-def agregar_tarea(tarea, acciones, fecha_inicio, plazo, observaciones, delegada, estado, exportar=True):
+def _insertar_tarea(conn, tarea, acciones, fecha_inicio, plazo, observaciones, delegada, estado):
     fecha_termino = datetime.now().strftime("%Y-%m-%d") if estado == 'Terminada' else None
-    with sqlite3.connect(DB_FILE) as conn:
-        conn.execute('''
-            INSERT INTO tareas (tarea, acciones, fecha_inicio, plazo, observaciones, delegada, estado, fecha_termino)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (tarea, acciones, fecha_inicio, plazo, observaciones, delegada, estado, fecha_termino))
-        conn.commit()
-    
-    if exportar:
-        exportar_a_excel()
+    return conn.execute('''
+        INSERT INTO tareas (tarea, acciones, fecha_inicio, plazo, observaciones, delegada, estado, fecha_termino)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (tarea, acciones, fecha_inicio, plazo, observaciones, delegada, estado, fecha_termino)).lastrowid
 
-def editar_tarea(id, tarea, acciones, fecha_inicio, plazo, observaciones, delegada, estado, exportar=True):
-    tarea_actual = obtener_tarea_por_id(id)
-    estado_actual = tarea_actual['estado'] if tarea_actual else None
-    
-    if estado == 'Terminada' and estado_actual != 'Terminada':
-        fecha_termino = datetime.now().strftime("%Y-%m-%d")
-    elif estado != 'Terminada' and estado_actual == 'Terminada':
-        fecha_termino = None
-    else:
-        fecha_termino = tarea_actual.get('fecha_termino') if tarea_actual else None
+@medido
+@reintentar_si_ocupada
+def agregar_tarea(tarea, acciones, fecha_inicio, plazo, observaciones, delegada, estado, exportar=True):
+    """Inserta la tarea y devuelve su ID"""
+    with canal_cambios().transaccion() as (conn, ids):
+        id = _insertar_tarea(conn, tarea, acciones, fecha_inicio, plazo, observaciones, delegada, estado)
+        ids.add(id)
     
-    with sqlite3.connect(DB_FILE) as conn:
-        conn.execute('''
+    registrar_cambios(exportar)
+    return id
+
+@medido
+@reintentar_si_ocupada
+def agregar_tareas(tareas, exportar=True):
+    """Inserta varias tareas (dicts con los argumentos de agregar_tarea) en una transacción.
+
+    Devuelve los IDs en el mismo orden; si una falla no se guarda ninguna.
+    """
+    if not tareas:
+        return []
+    with canal_cambios().transaccion() as (conn, ids):
+        nuevos = [_insertar_tarea(conn, **tarea) for tarea in tareas]
+        ids.update(nuevos)
+    registrar_cambios(exportar)
+    return nuevos
+
+class ConflictoEdicion(Exception):
+    """La tarea cambió desde que se abrió el formulario de edición.
+
+    `actual` trae la versión guardada (Tarea).
+    """
+    def __init__(self, id, actual):
+        self.id = id
+        self.actual = actual
+        super().__init__(f"La tarea {id} fue modificada por otra persona")
+
+class TareaInexistente(LookupError):
+    """La tarea que se quiere guardar no existe (nunca existió o alguien la eliminó)"""
+    # Queda en la sesión como un conflicto: cada rerun redefine las clases, así que el
+    # formulario las distingue por `actual` y no con isinstance
+    actual = None
+
+    def __init__(self, id):
+        self.id = id
+        super().__init__(f"La tarea {id} no existe")
+
+@medido
+@reintentar_si_ocupada
+def editar_tarea(id, tarea, acciones, fecha_inicio, plazo, observaciones, delegada, estado,
+                 exportar=True, rev=None):
+    """Guarda la tarea con un único UPDATE condicionado a su revisión.
+
+    Con `rev` (la revisión que se leyó al abrir el formulario) el UPDATE solo se
+    aplica si nadie guardó antes; si no, lanza ConflictoEdicion. Sin `rev` se
+    sobrescribe siempre. Si la tarea no existe lanza TareaInexistente.
+    fecha_termino se calcula en SQL con el estado guardado.
+    """
+    with canal_cambios().transaccion([id]) as (conn, _):
+        cursor = conn.execute('''
             UPDATE tareas
-            SET tarea = ?, acciones = ?, fecha_inicio = ?, plazo = ?, 
-                observaciones = ?, delegada = ?, estado = ?, fecha_termino = ?
-            WHERE id = ?
-        ''', (tarea, acciones, fecha_inicio, plazo, observaciones, delegada, estado, fecha_termino, id))
-        conn.commit()
+            SET tarea = :tarea, acciones = :acciones, fecha_inicio = :fecha_inicio, plazo = :plazo,
+                observaciones = :observaciones, delegada = :delegada,
+                fecha_termino = CASE
+                    WHEN :estado = 'Terminada' AND estado IS NOT 'Terminada' THEN :hoy
+                    WHEN :estado IS NOT 'Terminada' AND estado = 'Terminada' THEN NULL
+                    ELSE fecha_termino
+                END,
+                estado = :estado, rev = rev + 1
+            WHERE id = :id AND (:rev IS NULL OR rev = :rev)
+        ''', {"tarea": tarea, "acciones": acciones, "fecha_inicio": fecha_inicio, "plazo": plazo,
+              "observaciones": observaciones, "delegada": delegada, "estado": estado,
+              "hoy": datetime.now().strftime("%Y-%m-%d"), "id": id, "rev": rev})
+        if cursor.rowcount == 0:
+            actual = _consultar_tarea(id)
+            if actual is None:
+                raise TareaInexistente(id)
+            raise ConflictoEdicion(id, actual)
     
-    if exportar:
-        exportar_a_excel()
+    registrar_cambios(exportar)
 
-def actualizar_estado(id, nuevo_estado):
-    tarea = obtener_tarea_por_id(id)
-    if not tarea:
+def _lista_json(ids):
+    """Lista de IDs como JSON para usar con json_each (sin límite de parámetros)"""
+    return json.dumps([int(id) for id in ids])
+
+def _cambiar_estado(conn, ids, nuevo_estado):
+    # fecha_termino sigue las reglas de siempre, calculadas en SQL con el estado previo:
+    # se fija al terminar, se borra al reabrir y en otro caso se conserva.
+    return conn.execute('''
+        UPDATE tareas
+        SET fecha_termino = CASE
+                WHEN :estado = 'Terminada' AND estado IS NOT 'Terminada' THEN :hoy
+                WHEN :estado IS NOT 'Terminada' AND estado = 'Terminada' THEN NULL
+                ELSE fecha_termino
+            END,
+            estado = :estado, rev = rev + 1
+        WHERE id IN (SELECT value FROM json_each(:ids))
+    ''', {"estado": nuevo_estado, "hoy": datetime.now().strftime("%Y-%m-%d"), "ids": _lista_json(ids)}).rowcount
+
+@medido
+@reintentar_si_ocupada
+def cambiar_estado_tareas(ids, nuevo_estado, exportar=True):
+    """Cambia el estado de varias tareas con un único UPDATE y una sola exportación"""
+    if not ids:
         return
-    
-    if nuevo_estado == 'Terminada' and tarea['estado'] != 'Terminada':
-        fecha_termino = datetime.now().strftime("%Y-%m-%d")
-    elif nuevo_estado != 'Terminada' and tarea['estado'] == 'Terminada':
-        fecha_termino = None
-    else:
-        fecha_termino = tarea.get('fecha_termino')
-    
-    with sqlite3.connect(DB_FILE) as conn:
-        conn.execute('''
-            UPDATE tareas
-            SET estado = ?, fecha_termino = ?
-            WHERE id = ?
-        ''', (nuevo_estado, fecha_termino, id))
-        conn.commit()
-    exportar_a_excel()
+    with canal_cambios().transaccion(ids) as (conn, _):
+        _cambiar_estado(conn, ids, nuevo_estado)
+    registrar_cambios(exportar)
+
+@medido
+@reintentar_si_ocupada
+def actualizar_estados(cambios, exportar=True):
+    """Aplica {id: nuevo_estado} en una sola transacción (un UPDATE por estado distinto).
+
+    Devuelve cuántas tareas existían y se actualizaron.
+    """
+    if not cambios:
+        return 0
+    por_estado = {}
+    for id, nuevo_estado in cambios.items():
+        por_estado.setdefault(nuevo_estado, []).append(id)
+    with canal_cambios().transaccion(cambios) as (conn, _):
+        actualizadas = sum(_cambiar_estado(conn, ids, nuevo_estado) for nuevo_estado, ids in por_estado.items())
+    if actualizadas:
+        registrar_cambios(exportar)
+    return actualizadas
+
+def actualizar_estado(id, nuevo_estado):
+    actualizar_estados({id: nuevo_estado})
+
+@medido
+@reintentar_si_ocupada
+def reasignar_tareas(ids, delegada, exportar=True):
+    """Cambia 'delegada' de varias tareas en una transacción; devuelve cuántas existían"""
+    if not ids:
+        return 0
+    with canal_cambios().transaccion(ids) as (conn, _):
+        actualizadas = conn.execute(
+            "UPDATE tareas SET delegada = ?, rev = rev + 1 WHERE id IN (SELECT value FROM json_each(?))",
+            (delegada, _lista_json(ids))
+        ).rowcount
+    if actualizadas:
+        registrar_cambios(exportar)
+    return actualizadas
+
+@medido
+@reintentar_si_ocupada
+def eliminar_tareas(ids, exportar=True):
+    """Elimina varias tareas en una transacción y agenda una sola exportación; devuelve cuántas"""
+    if not ids:
+        return 0
+    with canal_cambios().transaccion(ids) as (conn, _):
+        eliminadas = conn.execute("DELETE FROM tareas WHERE id IN (SELECT value FROM json_each(?))",
+                                  (_lista_json(ids),)).rowcount
+    if eliminadas:
+        registrar_cambios(exportar)
+    return eliminadas
 
 def eliminar_tarea(id, exportar=True):
-    with sqlite3.connect(DB_FILE) as conn:
-        conn.execute('DELETE FROM tareas WHERE id = ?', (id,))
-        conn.commit()
-    
-    if exportar:
-        exportar_a_excel()
+    eliminar_tareas([id], exportar)
+
+@medido
+@reintentar_si_ocupada
+def archivar_tareas(dias=DIAS_ARCHIVO, exportar=True):
+    """Pasa al archivo las terminadas hace más de `dias` días, por lotes; devuelve cuántas"""
+    total = archivar(DB_FILE, dias, canal=canal_cambios())
+    if total:
+        registrar_cambios(exportar)
+    return total
 
+@medido
+@reintentar_si_ocupada
+def restaurar_tareas(ids, exportar=True):
+    """Devuelve tareas archivadas al listado activo; devuelve los IDs restaurados"""
+    if not ids:
+        return []
+    restaurados = restaurar(DB_FILE, ids, canal=canal_cambios())
+    if restaurados:
+        registrar_cambios(exportar)
+    return restaurados
+
+@medido
 def exportar_a_excel(nombre_archivo=EXCEL_FILE):
     """Exporta todas las tareas a un archivo Excel"""
-    tareas_df = obtener_tareas()
-    if not tareas_df.empty:
-        export_df = tareas_df[['id', 'tarea', 'acciones', 'fecha_inicio', 'plazo', 
-                              'observaciones', 'estado', 'delegada', 'fecha_termino']].copy()
-        
-        export_df.columns = ['ID', 'Tarea', 'Acciones a Realizar', 'Fecha Inicio', 
-                            'Plazo', 'Observaciones', 'Estado', 'Delegada a', 'F.Término']
-        
-        export_df.to_excel(nombre_archivo, index=False)
+    if contar_tareas() > 0:
+        escribir_atomico(nombre_archivo, lambda ruta: exportar_tareas(DB_FILE, COLUMNAS_EXCEL, 'xlsx', ruta))
         return True
     return False
 
-def importar_desde_excel():
+@medido
+def exportar_en_memoria(formato='xlsx', incluir_archivadas=False):
+    """Genera la exportación en memoria para st.download_button (None si no hay tareas)"""
+    if contar_tareas({'archivadas': incluir_archivadas}) == 0:
+        return None
+    return exportar_tareas(DB_FILE, COLUMNAS_EXCEL, formato, incluir_archivadas=incluir_archivadas).getvalue()
+
+@recurso_del_proceso
+def exportador_excel():
+    """Exportación de EXCEL_FILE: solo se regenera si las tareas cambiaron"""
+    return ExportadorExcel(DB_FILE, EXCEL_FILE, COLUMNAS_EXCEL)
+
+@recurso_del_proceso
+def sincronizador_excel():
+    """Hilo único por proceso que mantiene EXCEL_FILE al día en segundo plano"""
+    def exportar():
+        with ejecucion("sincronización de tareas_exportadas.xlsx"):
+            return exportador_excel().exportar()
+    return SincronizadorExcel(exportar)
+
+def revisar_cambios():
+    """Si otra sesión o proceso cambió las tareas desde que se mostró la lista, la recarga"""
+    canal = canal_cambios()
+    revision = canal.revision()  # en memoria: no consulta SQLite
+    vista = st.session_state.get("revision_vista")
+    if vista is not None and revision > vista:
+        st.session_state["cambios_recibidos"] = canal.ids_cambiados(vista, revision)
+        st.rerun()
+
+# Como fragmento se vuelve a ejecutar solo cada INTERVALO_AVISOS segundos, sin rerun completo
+_fragmento = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+if _fragmento is not None:
+    revisar_cambios = _fragmento(run_every=INTERVALO_AVISOS)(revisar_cambios)
+
+def avisar_cambios_recibidos():
+    if "cambios_recibidos" not in st.session_state:
+        return
+    ids = st.session_state.pop("cambios_recibidos")
+    if ids is None:
+        st.toast("🔔 Las tareas cambiaron fuera de esta sesión: la lista se actualizó")
+    elif ids:
+        st.toast(f"🔔 {len(ids)} tarea(s) modificada(s) por otra persona")
+
+def mostrar_estado_sincronizacion():
+    """Muestra cuándo se sincronizó el Excel por última vez, sin esperar al hilo"""
+    estado = sincronizador_excel().estado()
+    if estado["ultimo_error"]:
+        st.warning(f"⚠️ Error al sincronizar {EXCEL_FILE}: {estado['ultimo_error']}")
+    elif estado["pendiente"] or estado["exportando"]:
+        st.caption(f"🔄 Sincronizando {EXCEL_FILE}...")
+    elif estado["ultima_sincronizacion"]:
+        st.caption(f"✅ Última sincronización con {EXCEL_FILE}: "
+                   f"{estado['ultima_sincronizacion'].strftime('%d-%m-%Y %H:%M:%S')}")
+
+def importar_archivo(ruta, tamano_bloque=None, progreso=None, exportar=True):
+    """Importa un .xlsx o .csv por bloques; los errores se propagan (sin mensajes de Streamlit)"""
+    # importacion.py carga pandas: solo se importa al usarla
+    from importacion import TAMANO_BLOQUE, importar_por_bloques
+    # En archivos grandes el índice de búsqueda se reconstruye una vez al final
+    with indice_para_importacion(DB_FILE, ruta):
+        reporte = importar_por_bloques(
+            DB_FILE, ruta, 'tareas', [col for col in COLUMNAS_EXCEL if col != 'id'],
+            renombrar={v: k for k, v in COLUMNAS_EXCEL.items()},
+            tamano_bloque=tamano_bloque or TAMANO_BLOQUE, progreso=progreso,
+            columna_id='id', columnas_fecha=COLUMNAS_FECHA, requeridas=['tarea'],
+            # Idempotente: las filas sin cambios no se escriben y las sin ID se reconocen por contenido
+            clave_natural=CLAVE_NATURAL, tabla_huellas='tareas_huellas', tabla_archivo='tareas_archivo'
+        )
+    if reporte.total_escritas:
+        registrar_cambios(exportar)
+    return reporte
+
+@medido
+def importar_desde_excel(ruta=EXCEL_FILE, tamano_bloque=None, progreso=None):
+    """Importa un .xlsx o .csv por bloques y devuelve un ReporteImportacion.
+
+    Cada bloque se confirma por separado, así la memoria no crece con el archivo.
+    """
     try:
-        if not os.path.exists(EXCEL_FILE):
-            st.error(f"Archivo {EXCEL_FILE} no encontrado")
-            return False
+        if not os.path.exists(ruta):
+            st.error(f"Archivo {ruta} no encontrado")
+            return None
         
-        excel_df = pd.read_excel(EXCEL_FILE)
+        reporte = importar_archivo(ruta, tamano_bloque, progreso)
         
-        if excel_df.empty:
+        if (reporte.total_escritas == 0 and not reporte.sin_cambios
+                and not reporte.invalidas and not reporte.omitidas):
             st.warning("El archivo Excel está vacío")
-            return False
-        
-        columnas_esperadas = ['ID', 'Tarea', 'Acciones a Realizar', 'Fecha Inicio', 
-                             'Plazo', 'Observaciones', 'Estado', 'Delegada a', 'F.Término']
-        
-        for col in excel_df.columns:
-            if col not in columnas_esperadas:
-                excel_df = excel_df.drop(columns=[col])
+            return None
         
-        column_mapping = {
-            'ID': 'id',
-            'Tarea': 'tarea',
-            'Acciones a Realizar': 'acciones',
-            'Fecha Inicio': 'fecha_inicio',
-            'Plazo': 'plazo',
-            'Observaciones': 'observaciones',
-            'Estado': 'estado',
-            'Delegada a': 'delegada',
-            'F.Término': 'fecha_termino'
-        }
-        excel_df.rename(columns=column_mapping, inplace=True)
-        
-        db_tareas = obtener_tareas()
-        db_ids = set(db_tareas['id']) if not db_tareas.empty else set()
-        
-        nuevas = 0
-        actualizadas = 0
-        
-        for _, row in excel_df.iterrows():
-            row = row.where(pd.notnull(row), None)
-            
-            fecha_inicio = row['fecha_inicio']
-            if isinstance(fecha_inicio, pd.Timestamp):
-                fecha_inicio = fecha_inicio.strftime('%Y-%m-%d')
-            
-            plazo = row['plazo']
-            if isinstance(plazo, pd.Timestamp):
-                plazo = plazo.strftime('%Y-%m-%d')
-            
-            fecha_termino = row['fecha_termino']
-            if isinstance(fecha_termino, pd.Timestamp):
-                fecha_termino = fecha_termino.strftime('%Y-%m-%d')
-            
-            tarea_id = row['id']
-            if tarea_id in db_ids:
-                with sqlite3.connect(DB_FILE) as conn:
-                    conn.execute('''
-                        UPDATE tareas
-                        SET tarea = ?, acciones = ?, fecha_inicio = ?, plazo = ?, 
-                            observaciones = ?, delegada = ?, estado = ?, fecha_termino = ?
-                        WHERE id = ?
-                    ''', (
-                        row['tarea'],
-                        row['acciones'],
-                        fecha_inicio,
-                        plazo,
-                        row['observaciones'],
-                        row['delegada'],
-                        row['estado'],
-                        fecha_termino,
-                        tarea_id
-                    ))
-                    conn.commit()
-                actualizadas += 1
-            else:
-                with sqlite3.connect(DB_FILE) as conn:
-                    conn.execute('''
-                        INSERT INTO tareas (tarea, acciones, fecha_inicio, plazo, 
-                                          observaciones, delegada, estado, fecha_termino)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        row['tarea'],
-                        row['acciones'],
-                        fecha_inicio,
-                        plazo,
-                        row['observaciones'],
-                        row['delegada'],
-                        row['estado'],
-                        fecha_termino
-                    ))
-                    conn.commit()
-                nuevas += 1
-        
-        exportar_a_excel()
-        
-        return nuevas, actualizadas
+        return reporte
     except Exception as e:
         st.error(f"Error al importar: {str(e)}")
         return None
 
+@medido
+def obtener_historial(id):
+    """Historial de la tarea para el detalle (solo se consulta al abrirlo)"""
+    return historial_de(DB_FILE, id)
+
+def mostrar_historial(tarea_id):
+    """Tabla con los cambios de la tarea, del más reciente al más antiguo"""
+    import pandas as pd
+    operaciones = {'alta': "Creada", 'base': "Inicio del historial", 'cambio': "Modificada", 'baja': "Eliminada"}
+    filas = []
+    for entrada in reversed(obtener_historial(tarea_id)):
+        if entrada["operacion"] == 'cambio':
+            detalle = "; ".join(f"{COLUMNAS_EXCEL[campo]}: {antes or '—'} → {despues or '—'}"
+                                for campo, (antes, despues) in entrada["cambios"].items())
+        else:
+            detalle = ""
+        filas.append({"Fecha": entrada["cambiado_en"].replace("T", " "),
+                      "Operación": operaciones[entrada["operacion"]], "Cambios": detalle})
+    if filas:
+        st.dataframe(pd.DataFrame(filas), hide_index=True, use_container_width=True)
+    else:
+        st.caption("Sin historial registrado")
+
+def mostrar_reporte_importacion(reporte):
+    """Muestra el resultado de la última importación (sobrevive al st.rerun)"""
+    import pandas as pd
+    st.success(f"Importación exitosa: {reporte.resumen()}")
+    problemas = ([(fila, "Inválida", motivo) for fila, motivo in reporte.invalidas] +
+                 [(fila, "Omitida", motivo) for fila, motivo in reporte.omitidas])
+    if problemas:
+        with st.expander(f"Ver {len(problemas)} filas no importadas"):
+            st.dataframe(
+                pd.DataFrame(sorted(problemas), columns=["Fila Excel", "Resultado", "Motivo"]),
+                hide_index=True, use_container_width=True
+            )
+
+def limpiar_seleccion():
+    st.session_state["selected_tasks"] = []
+    st.session_state["ver_detalle"] = None
+    st.session_state["editor_version"] += 1
+
+def cerrar_edicion():
+    """Vuelve al listado y olvida la versión que se estaba editando"""
+    st.session_state["tarea_seleccionada"] = None
+    st.session_state["current_tab"] = "Listado de Tareas"
+    st.session_state.pop("tarea_en_edicion", None)
+    st.session_state["conflicto_edicion"] = None
+
+def guardar_edicion(tarea_id, valores, rev):
+    """editar_tarea con control de revisión; ante un conflicto lo deja en la sesión"""
+    try:
+        editar_tarea(tarea_id, **valores, rev=rev)
+    except (ConflictoEdicion, TareaInexistente) as e:
+        st.session_state["conflicto_edicion"] = e
+        return False
+    cerrar_edicion()
+    return True
+
+def mostrar_conflicto_edicion(conflicto, valores):
+    """Otra persona guardó la tarea mientras se editaba: recargar o sobrescribir"""
+    if conflicto.actual is None:
+        st.error("Otra persona eliminó esta tarea mientras la editabas. Usa ❌ Cancelar para volver al listado.")
+        return
+    st.warning("Otra persona guardó cambios en esta tarea mientras la editabas.")
+    guardada = conflicto.actual.a_dict()
+    diferencias = [
+        {"Campo": COLUMNAS_EXCEL[campo], "Tu versión": valor or "", "Versión guardada": guardada[campo] or ""}
+        for campo, valor in valores.items()
+        if (valor or None) != (guardada[campo] or None)
+    ]
+    if diferencias:
+        st.table(diferencias)
+    col_recargar, col_sobrescribir = st.columns(2)
+    with col_recargar:
+        if st.button("🔄 Recargar", help="Descartar tus cambios y cargar la versión guardada"):
+            # Otra clave para los widgets: se vuelven a crear con los valores guardados
+            st.session_state["tarea_en_edicion"] = conflicto.actual
+            st.session_state["conflicto_edicion"] = None
+            st.session_state.reset_counter += 1
+            st.rerun()
+    with col_sobrescribir:
+        if st.button("⚠️ Sobrescribir", help="Guardar tus cambios encima de la versión guardada"):
+            guardar_edicion(conflicto.id, valores, conflicto.actual.rev)
+            st.rerun()
+
+def mostrar_acciones_masivas():
+    """Terminar, reabrir o reasignar todas las tareas seleccionadas de una vez"""
+    seleccionadas = st.session_state["selected_tasks"]
+    st.caption(f"{len(seleccionadas)} tareas seleccionadas")
+    m_col1, m_col2, m_col3, m_col4 = st.columns([1, 1, 1, 1])
+    with m_col1:
+        if st.button("✅ Terminar", disabled=not seleccionadas):
+            cambiar_estado_tareas(seleccionadas, 'Terminada')
+            limpiar_seleccion()
+            st.rerun()
+    with m_col2:
+        if st.button("↩️ Reabrir", disabled=not seleccionadas):
+            cambiar_estado_tareas(seleccionadas, 'Pendiente')
+            limpiar_seleccion()
+            st.rerun()
+    with m_col3:
+        nueva_delegada = st.text_input("Delegada a", key="reasignar_delegada",
+                                       label_visibility="collapsed", placeholder="Delegada a...")
+    with m_col4:
+        if st.button("👤 Reasignar", disabled=not seleccionadas):
+            reasignar_tareas(seleccionadas, nueva_delegada.strip() or None)
+            limpiar_seleccion()
+            st.rerun()
+    if st.session_state.get("filtro_archivadas"):
+        if st.button("♻️ Restaurar", disabled=not seleccionadas,
+                     help="Devuelve al listado activo las tareas archivadas seleccionadas"):
+            restaurar_tareas(seleccionadas)
+            limpiar_seleccion()
+            st.rerun()
+
+def cambios_de_terminado(tareas_display, estado_editor):
+    """{id: nuevo_estado} a partir de las filas editadas en el data_editor.
+
+    Solo recorre el delta `edited_rows` (posición -> columnas cambiadas), no toda la tabla.
+    """
+    cambios = {}
+    for posicion, columnas in estado_editor.get("edited_rows", {}).items():
+        if "terminado" not in columnas:
+            continue
+        fila = tareas_display.iloc[int(posicion)]
+        if fila.get("archivada"):
+            continue  # las archivadas no se editan: hay que restaurarlas
+        if bool(columnas["terminado"]) != bool(fila["terminado"]):
+            cambios[int(fila["id"])] = 'Terminada' if columnas["terminado"] else 'Pendiente'
+    return cambios
+
+def mostrar_archivo_admin():
+    """Archivar a mano las terminadas antiguas (también: python archivo.py --dias N)"""
+    with st.expander("📦 Archivo de tareas terminadas", expanded=False):
+        dias = st.number_input("Terminadas hace más de (días)", min_value=0, value=DIAS_ARCHIVO, step=30,
+                               key="admin_dias_archivo")
+        if st.button("📦 Archivar", key="admin_archivar"):
+            total = archivar_tareas(int(dias))
+            st.success(f"{total} tareas archivadas")
+
+def panel_admin_abierto():
+    """Panel oculto: se abre agregando ?admin=1 a la URL"""
+    return st.query_params.get("admin") == "1"
+
+def mostrar_panel_admin():
+    """Desglose de tiempos y consultas SQL de las últimas ejecuciones"""
+    import pandas as pd
+    ejecuciones = [e.a_dict() for e in ultimas_ejecuciones()]
+    with st.expander("🛠️ Rendimiento (últimas ejecuciones)", expanded=True):
+        if not ejecuciones:
+            st.caption("Aún no hay ejecuciones registradas")
+            return
+        st.caption("Las sentencias SQL se cuentan solo en los reruns con el panel abierto "
+                   "(o con TAREAS_PERFIL=1)")
+        st.dataframe(
+            pd.DataFrame([{
+                "Inicio": e["inicio"], "Etiqueta": e["etiqueta"], "Duración (ms)": e["duracion_ms"],
+                "Consultas": e["total_consultas"], "Error": e["error"]
+            } for e in ejecuciones]),
+            hide_index=True, use_container_width=True
+        )
+        indice = st.selectbox("Ejecución", range(len(ejecuciones)), key="admin_ejecucion",
+                              format_func=lambda i: f"{ejecuciones[i]['inicio']} · {ejecuciones[i]['etiqueta']}")
+        elegida = ejecuciones[indice]
+        if elegida["spans"]:
+            spans = pd.DataFrame(elegida["spans"])
+            spans["nombre"] = spans["profundidad"].map(lambda p: "· " * p) + spans["nombre"]
+            st.dataframe(spans[["nombre", "desde_ms", "duracion_ms", "consultas"]],
+                         hide_index=True, use_container_width=True)
+        if elegida["consultas"]:
+            st.dataframe(pd.DataFrame(list(elegida["consultas"].items()), columns=["Sentencia", "Veces"]),
+                         hide_index=True, use_container_width=True)
+        if elegida["perfil"]:
+            st.code(elegida["perfil"])
+        st.download_button("⬇️ Descargar JSON", data=json.dumps(ejecuciones, ensure_ascii=False, indent=2),
+                           file_name="rendimiento.json", mime="application/json")
+
+@medido
+def obtener_resumen():
+    """Cifras del tablero; se recalculan al cambiar la revisión de los datos o el día"""
+    hoy = datetime.now().date()
+    return cache_tareas().consulta(('resumen', hoy.isoformat()), lambda: leer_resumen(DB_FILE, hoy))
+
+def mostrar_tablero():
+    """Resumen al inicio del listado: tareas por estado, vencidas y carga por delegada"""
+    resumen = obtener_resumen()
+    columnas = st.columns(5)
+    columnas[0].metric("Pendientes", resumen.por_estado.get('Pendiente', 0))
+    columnas[1].metric("En Proceso", resumen.por_estado.get('En Proceso', 0))
+    columnas[2].metric("Terminadas", resumen.por_estado.get('Terminada', 0))
+    columnas[3].metric("Vencidas", resumen.vencidas)
+    columnas[4].metric("Vencen hoy", resumen.vencen_hoy)
+    if resumen.por_delegada:
+        import pandas as pd
+        with st.expander("👥 Carga por delegada", expanded=False):
+            carga = pd.DataFrame(resumen.por_delegada, columns=["Delegada a", "Abiertas", "Terminadas"])
+            carga["Delegada a"] = carga["Delegada a"].replace('', 'Sin delegar')
+            st.dataframe(carga, hide_index=True, use_container_width=True)
+
+@medido
+def buscar_coincidencias(texto, limite=5):
+    return cache_tareas().consulta(('busqueda', texto, limite), lambda: buscar_tareas(DB_FILE, texto, limite))
+
+def mostrar_coincidencias(texto):
+    """Las coincidencias más relevantes, con las palabras buscadas resaltadas"""
+    coincidencias = buscar_coincidencias(texto)
+    if not coincidencias:
+        return
+    with st.expander(f"Coincidencias más relevantes para «{texto}»", expanded=False):
+        for tarea in coincidencias:
+            detalle = " · ".join(texto_campo for texto_campo in
+                                 (tarea['acciones'], tarea['observaciones'], tarea['delegada']) if texto_campo)
+            st.markdown(f"**#{tarea['id']}** {tarea['tarea']}  \n{detalle}")
+
+def mostrar_filtros_y_pagina():
+    """Dibuja filtros, orden y paginación, y devuelve solo la página pedida"""
+    busqueda = st.text_input("Buscar", key="filtro_busqueda", label_visibility="collapsed",
+                             placeholder="🔍 Buscar en tarea, acciones, observaciones o delegada...").strip()
+    if busqueda:
+        mostrar_coincidencias(busqueda)
+
+    with st.expander("🔎 Filtros y orden", expanded=False):
+        f_col1, f_col2, f_col3, f_col4 = st.columns([2, 2, 2, 2])
+        with f_col1:
+            estados = st.multiselect("Estado", ESTADOS, key="filtro_estados")
+        with f_col2:
+            delegada = st.selectbox("Delegada a", ["Todas"] + obtener_delegadas(), key="filtro_delegada")
+        with f_col3:
+            rango_plazo = st.date_input("Plazo entre", value=(), format="DD-MM-YYYY", key="filtro_plazo")
+            archivadas = st.toggle("📦 Incluir archivadas", key="filtro_archivadas",
+                                   help="También las tareas terminadas que se pasaron al archivo")
+        with f_col4:
+            orden_etiqueta = st.selectbox("Ordenar por", list(COLUMNAS_ORDEN), index=len(COLUMNAS_ORDEN) - 1,
+                                          key="orden_columna")
+            descendente = st.toggle("Descendente", key="orden_descendente")
+
+    filtros = {
+        'busqueda': busqueda or None,
+        'estados': estados,
+        'delegada': delegada if delegada != "Todas" else None,
+        'plazo_desde': rango_plazo[0].strftime("%Y-%m-%d") if len(rango_plazo) > 0 else None,
+        'plazo_hasta': rango_plazo[1].strftime("%Y-%m-%d") if len(rango_plazo) > 1 else None,
+        'archivadas': archivadas
+    }
+    st.session_state["filtros_activos"] = any(filtros.values())
+
+    # Volver a la primera página cuando cambian los filtros o el orden
+    firma = (busqueda, tuple(estados), filtros['delegada'], filtros['plazo_desde'], filtros['plazo_hasta'],
+             orden_etiqueta, descendente, archivadas)
+    if st.session_state.get("firma_listado") != firma:
+        st.session_state["firma_listado"] = firma
+        st.session_state["pagina"] = 1
+
+    total = contar_tareas(filtros)
+    p_col1, p_col2, p_col3 = st.columns([1, 1, 3])
+    with p_col1:
+        tamano = st.selectbox("Filas por página", TAMANOS_PAGINA, index=1, key="tamano_pagina")
+    paginas = max(1, -(-total // tamano))
+    st.session_state["pagina"] = min(st.session_state.get("pagina", 1), paginas)
+    with p_col2:
+        pagina = st.number_input("Página", min_value=1, max_value=paginas, key="pagina")
+    with p_col3:
+        st.caption(f"{total} tareas · página {pagina} de {paginas}")
+
+    return obtener_pagina_tareas(filtros, orden=COLUMNAS_ORDEN[orden_etiqueta], descendente=descendente,
+                                 limite=tamano, desplazamiento=(pagina - 1) * tamano)
+
 def main():
     # ⚠️ Mantengo tu set_page_config EXACTAMENTE como estaba
     st.set_page_config(layout="wide", page_title="Compromisos OCT")
 
     # 🔐 Llamada al control de acceso (igual que en app.py)
+    fase("autenticación")
     check_authentication()
 
+    fase("esquema y encabezado")
     init_db()
     
-    # Estilos CSS
-    st.markdown(f"""
-    <style>
-        .header-container {{
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            background-color: {COLOR_FONDO};
-            height: 85px;
-            width: 100%;
-            color: white;
-            position: relative;
-            margin: -1rem -1rem 1.2rem -1rem;
-        }}
-        .header-logo {{
-            position: absolute;
-            left: 20px;
-            top: 5px;
-            display: flex;
-            flex-direction: column;
-            align-items: flex-start;
-        }}
-        .header-logo img {{
-            height: 60px;
-        }}
-        .header-subtitle {{
-            position: absolute;
-            bottom: 5px;
-            left: 20px;
-            font-size: 10px;
-        }}
-        .header-title {{
-            font-size: 20px;
-            font-weight: bold;
-        }}
-        .main-container {{
-            display: flex;
-            flex-direction: column;
-            height: calc(100vh - 150px) !important;
-            min-height: 500px !important;
-        }}
-        .table-container {{
-            flex: 1;
-            display: flex;
-            flex-direction: column;
-            min-height: 300px;
-        }}
-        .stDataFrame, .stDataEditor {{
-            flex: 1;
-            min-height: 200px;
-        }}
-        .button-container {{
-            margin-top: auto;
-            padding-bottom: 5px !important;
-        }}
-        div[data-testid="stVerticalBlock"] {{
-            height: 100% !important;
-        }}
-        div[data-testid="stHorizontalBlock"] {{
-            height: 100% !important;
-        }}
-
-        /* 🔐 Estilos para pestañas del login (tomado de app.py) */
-        .stTabs [data-baseweb="tab-list"] {{
-            gap: 8px;
-        }}
-        .stTabs [data-baseweb="tab"] {{
-            height: 40px;
-            white-space: pre-wrap;
-            background-color: #f0f2f6;
-            border-radius: 4px 4px 0px 0px;
-            gap: 1px;
-            padding-top: 10px;
-            padding-bottom: 10px;
-        }}
-        .stTabs [aria-selected="true"] {{
-            background-color: {COLOR_FONDO};
-            color: white;
-        }}
-    </style>
-    """, unsafe_allow_html=True)
+    # Estilos CSS (construidos una vez por proceso en recursos.py)
+    st.markdown(css_app(COLOR_FONDO), unsafe_allow_html=True)
     
     # Encabezado
-    if img_src:
-        st.markdown(f"""
-        <div class="header-container">
-            <div class="header-logo">
-                <img src="{img_src}" alt="Logo">
-            </div>
-            <div class="header-subtitle">{SUBTITULO}</div>
-            <div class="header-title">{TITULO}</div>
-        </div>
-        """, unsafe_allow_html=True)
-    else:
-        st.markdown(f"""
-        <div style="display: flex; align-items: center; justify-content: center; 
-                    background-color: {COLOR_FONDO}; height: 85px; width: 100%; 
-                    color: white; position: relative; margin: -1rem -1rem 1.2rem -1rem;">
-            <div style="position: absolute; left: 20px; top: 5px; display: flex; 
-                       flex-direction: column; align-items: flex-start;">
-                <div style="font-size: 24px; font-weight: bold;">ISL</div>
-            </div>
-            <div style="position: absolute; bottom: 5px; left: 20px; font-size: 10px;">
-                {SUBTITULO}
-            </div>
-            <div style="font-size: 20px; font-weight: bold;">{TITULO}</div>
-        </div>
-        """, unsafe_allow_html=True)
+    st.markdown(encabezado_html(img_src, TITULO, SUBTITULO, COLOR_FONDO), unsafe_allow_html=True)
     
+    fase("estado de sesión")
     if not os.path.exists(EXCEL_FILE):
         exportar_a_excel()
     
@@ -545,25 +899,17 @@ def main():
         st.session_state["current_tab"] = "Listado de Tareas"
     if "selected_tasks" not in st.session_state:
         st.session_state["selected_tasks"] = []
+    if "editor_version" not in st.session_state:
+        st.session_state["editor_version"] = 0
     if "reset_counter" not in st.session_state:
         st.session_state["reset_counter"] = 0
     if "last_interaction" not in st.session_state:
         st.session_state["last_interaction"] = {"type": None, "id": None}
 
-    tareas_df = obtener_tareas()
-    
     # =========================
     # Selector de vista (modificado y estilizado)
     # =========================
-    # CSS para compactar y alinear a la izquierda el selectbox
-    st.markdown("""
-        <style>
-        div[data-baseweb="select"] {
-            width: 220px !important;
-            margin-left: 0 !important;
-        }
-        </style>
-    """, unsafe_allow_html=True)
+    # El CSS que compacta y alinea a la izquierda el selectbox está en recursos.CSS_APP
 
     tabs = ["Listado de Tareas", "Agregar Tarea"]
     # Reemplazamos el selectbox por un contenedor de 5 columnas, selector en la primera
@@ -579,19 +925,32 @@ def main():
     st.session_state["current_tab"] = current_tab
 
     if current_tab == "Listado de Tareas":
+        import pandas as pd
         st.session_state["current_tab"] = "Listado de Tareas"
         
+        fase("listado: tablero")
+        # Revisión que muestra esta vista; el fragmento recarga si el canal avanza
+        st.session_state["revision_vista"] = canal_cambios().revision()
+        avisar_cambios_recibidos()
+        mostrar_tablero()
+
+        fase("listado: filtros y consulta")
         with st.container():
+            tareas_df = mostrar_filtros_y_pagina()
             if not tareas_df.empty:
+                fase("listado: DataFrame y data_editor")
                 tareas_df['terminado'] = tareas_df['estado'].apply(lambda x: 1 if x == 'Terminada' else 0)
                 tareas_df['delegada_bool'] = tareas_df['delegada'].apply(lambda x: 1 if x and str(x).strip() != '' else 0)
                 tareas_df['Seleccionar'] = False
                 if st.session_state["selected_tasks"]:
                     tareas_df['Seleccionar'] = tareas_df['id'].isin(st.session_state["selected_tasks"])
-                tareas_df['fecha_termino'] = pd.to_datetime(tareas_df['fecha_termino'], errors='coerce')
+                tareas_df['fecha_termino'] = pd.to_datetime(tareas_df['fecha_termino'], format="%Y-%m-%d")
                 
-                tareas_display = tareas_df[['Seleccionar', 'id', 'estado', 'tarea', 'acciones', 'terminado', 
-                                           'delegada_bool', 'delegada', 'fecha_inicio', 'plazo', 'fecha_termino']]
+                columnas_listado = ['Seleccionar', 'id', 'estado', 'tarea', 'acciones', 'terminado',
+                                    'delegada_bool', 'delegada', 'fecha_inicio', 'plazo', 'fecha_termino']
+                if 'archivada' in tareas_df:  # solo con "Incluir archivadas"
+                    columnas_listado.append('archivada')
+                tareas_display = tareas_df[columnas_listado]
                 
                 with st.container():
                     edited_df = st.data_editor(
@@ -607,33 +966,33 @@ def main():
                             "delegada": st.column_config.TextColumn("Delegada a"),
                             "fecha_inicio": st.column_config.DateColumn("F. Inicio", format="DD-MM-YYYY"),
                             "plazo": st.column_config.DateColumn("Plazo", format="DD-MM-YYYY"),
-                            "fecha_termino": st.column_config.DateColumn("F.Término", format="DD-MM-YYYY")
+                            "fecha_termino": st.column_config.DateColumn("F.Término", format="DD-MM-YYYY"),
+                            "archivada": st.column_config.CheckboxColumn("Archivada")
                         },
                         hide_index=True,
                         use_container_width=True,
                         disabled=["id", "estado", "tarea", "acciones", "delegada", 
-                                  "fecha_inicio", "plazo", "fecha_termino"],
-                        key="editor",
+                                  "fecha_inicio", "plazo", "fecha_termino", "archivada"],
+                        key=f"editor_{st.session_state['editor_version']}",
                         height=580
                     )
 
+                fase("listado: cambios y botones")
+                # Selección múltiple: se conserva lo marcado en otras páginas
                 seleccionados_actuales = edited_df[edited_df['Seleccionar'] == True]['id'].tolist()
-                terminados_actuales = edited_df[edited_df['terminado'] == True]['id'].tolist()
+                ids_pagina = set(edited_df['id'].tolist())
+                st.session_state["selected_tasks"] = [
+                    tarea_id for tarea_id in st.session_state["selected_tasks"] if tarea_id not in ids_pagina
+                ] + seleccionados_actuales
 
-                if len(seleccionados_actuales) > 1:
-                    ultima = seleccionados_actuales[-1]
-                    edited_df['Seleccionar'] = edited_df['id'] == ultima
-                    st.session_state["selected_tasks"] = [ultima]
+                cambios = cambios_de_terminado(
+                    tareas_display, st.session_state[f"editor_{st.session_state['editor_version']}"]
+                )
+                if cambios:
+                    actualizar_estados(cambios)
+                    # Nueva clave: el editor parte limpio con los datos ya actualizados
+                    st.session_state["editor_version"] += 1
                     st.rerun()
-                elif len(seleccionados_actuales) == 1:
-                    st.session_state["selected_tasks"] = seleccionados_actuales
-
-                for _, row in edited_df.iterrows():
-                    tarea_original = tareas_df[tareas_df['id'] == row['id']].iloc[0]
-                    if row['terminado'] != tarea_original['terminado']:
-                        nuevo_estado = 'Terminada' if row['terminado'] else 'Pendiente'
-                        actualizar_estado(row['id'], nuevo_estado)
-                        st.rerun()
 
                 # --- Botones ---
                 with st.container():
@@ -654,10 +1013,8 @@ def main():
                         with btn_col1:
                             if st.button("🗑️ Eliminar"):
                                 if st.session_state["selected_tasks"]:
-                                    for tarea_id in st.session_state["selected_tasks"]:
-                                        eliminar_tarea(tarea_id)
-                                    st.session_state["selected_tasks"] = []
-                                    st.session_state["ver_detalle"] = None
+                                    eliminar_tareas(st.session_state["selected_tasks"])
+                                    limpiar_seleccion()
                                     st.rerun()
                                 else:
                                     st.warning("Selecciona al menos una tarea")
@@ -667,6 +1024,7 @@ def main():
                                 if len(st.session_state["selected_tasks"]) == 1:
                                     tarea_id = st.session_state["selected_tasks"][0]
                                     st.session_state["tarea_seleccionada"] = tarea_id
+                                    st.session_state.pop("tarea_en_edicion", None)
                                     st.session_state["current_tab"] = "Agregar Tarea"
                                     st.rerun()
                                 elif st.session_state["selected_tasks"]:
@@ -685,87 +1043,109 @@ def main():
                                     st.warning("Selecciona una tarea primero")
 
                         with btn_col4:
-                            if st.button("📤 Exportar Excel"):
-                                if exportar_a_excel(EXCEL_EXPORTADO):
-                                    with open(EXCEL_EXPORTADO, "rb") as f:
-                                        st.download_button(
-                                            label="⬇️ Descargar Excel",
-                                            data=f,
-                                            file_name=EXCEL_EXPORTADO,
-                                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                                        )
+                            formato = st.selectbox("Formato", formatos_disponibles(), key="formato_exportacion",
+                                                   label_visibility="collapsed")
+                            if st.button("📤 Exportar"):
+                                datos = exportar_en_memoria(formato, st.session_state.get("filtro_archivadas", False))
+                                if datos is not None:
+                                    extension, mime = FORMATOS[formato]
+                                    st.download_button(
+                                        label=f"⬇️ Descargar {formato}",
+                                        data=datos,
+                                        file_name=Path(EXCEL_EXPORTADO).with_suffix(extension).name,
+                                        mime=mime
+                                    )
                                     st.success("Archivo listo para descargar")
                                 else:
                                     st.warning("No hay tareas para exportar")
 
+                        mostrar_acciones_masivas()
+
                     # Columna derecha: espacio (se mantiene para respetar el diseño)
                     with col_right:
                         st.markdown("&nbsp;", unsafe_allow_html=True)
 
                     st.markdown('</div>', unsafe_allow_html=True)
+                    mostrar_estado_sincronizacion()
 
                 # --- Detalle ---
                 if st.session_state["ver_detalle"]:
+                    fase("listado: detalle")
                     tarea_id = st.session_state["ver_detalle"]
-                    tarea = obtener_tarea_por_id(tarea_id)
+                    # Si está en la página ya se tienen sus datos; si no, se lee por ID
+                    en_pagina = tareas_df[tareas_df['id'] == tarea_id]
+                    tarea = (Tarea.desde_registro(en_pagina.to_dict('records')[0]) if not en_pagina.empty
+                             else obtener_tarea_por_id(tarea_id))
+                    archivada = not en_pagina.empty and bool(en_pagina.iloc[0].get('archivada', 0))
                     if tarea is None:
                         st.error("La tarea seleccionada ya no existe")
                         st.session_state["ver_detalle"] = None
                         st.rerun()
                     else:
-                        with st.expander(f"Detalle de la Tarea: {tarea['tarea']}", expanded=True):
-                            st.markdown(f"**Tarea:**\n{tarea['tarea']}")
+                        with st.expander(f"Detalle de la Tarea: {tarea.tarea}", expanded=True):
+                            if archivada:
+                                st.caption("📦 Tarea archivada: para modificarla hay que restaurarla")
+                            st.markdown(f"**Tarea:**\n{tarea.tarea}")
                             st.divider()
                             st.markdown("**Acciones a Realizar:**")
-                            st.markdown(f"{tarea['acciones']}")
+                            st.markdown(f"{tarea.acciones}")
                             st.divider()
                             st.markdown("**Observaciones:**")
-                            st.markdown(f"{tarea['observaciones'] or 'Sin observaciones'}")
+                            st.markdown(f"{tarea.observaciones or 'Sin observaciones'}")
                             st.divider()
                             st.markdown("**Estado:**")
-                            st.markdown(f"{tarea['estado']}")
+                            st.markdown(f"{tarea.estado}")
                             st.divider()
                             st.markdown("**Delegada a:**")
-                            st.markdown(f"{tarea['delegada'] or 'No delegada'}")
+                            st.markdown(f"{tarea.delegada or 'No delegada'}")
                             st.divider()
                             st.markdown("**Fecha Inicio:**")
-                            st.markdown(f"{tarea['fecha_inicio']}")
+                            st.markdown(f"{tarea.fecha_inicio}")
                             st.divider()
                             st.markdown("**Plazo:**")
-                            st.markdown(f"{tarea['plazo'] or 'Sin plazo definido'}")
+                            st.markdown(f"{tarea.plazo or 'Sin plazo definido'}")
                             st.divider()
                             st.markdown("**Fecha Término:**")
-                            st.markdown(f"{tarea['fecha_termino'] or 'Tarea aún no finalizada'}")
+                            st.markdown(f"{tarea.fecha_termino or 'Tarea aún no finalizada'}")
+                            st.divider()
+                            if st.toggle("🕓 Ver historial", key=f"historial_{tarea.id}"):
+                                mostrar_historial(tarea.id)
                             col1, col2 = st.columns([1, 3])
                             with col1:
                                 if st.button("Cerrar Detalle"):
                                     st.session_state["ver_detalle"] = None
                                     st.rerun()
+                            with col2:
+                                if archivada and st.button("♻️ Restaurar tarea"):
+                                    restaurar_tareas([tarea.id])
+                                    st.rerun()
+            elif st.session_state["filtros_activos"]:
+                st.info("No hay tareas que coincidan con los filtros")
             else:
                 st.info("No hay tareas registradas")
+        # Al final del listado: el fragmento no desplaza a los demás elementos
+        revisar_cambios()
     
     else:  # Agregar Tarea
+        fase("formulario de tarea")
         st.session_state["current_tab"] = "Agregar Tarea"
         if st.session_state["tarea_seleccionada"]:
             tarea_id = st.session_state["tarea_seleccionada"]
             tarea = obtener_tarea_por_id(tarea_id)
             if tarea is None:
                 st.error("La tarea seleccionada ya no existe")
-                st.session_state["tarea_seleccionada"] = None
-                st.session_state["current_tab"] = "Listado de Tareas"
+                cerrar_edicion()
                 st.rerun()
             modo = "edición"
+            # El formulario edita la versión leída al abrirlo (valores y 'rev'); si
+            # otra persona guarda antes, Guardar avisa en vez de pisar sus cambios
+            en_edicion = st.session_state.get("tarea_en_edicion")
+            if en_edicion is None or en_edicion.id != tarea_id:
+                st.session_state["tarea_en_edicion"] = tarea
+                st.session_state["conflicto_edicion"] = None
+            tarea = st.session_state["tarea_en_edicion"]
         else:
-            tarea = {
-                "tarea": "",
-                "acciones": "",
-                "fecha_inicio": datetime.now().strftime("%Y-%m-%d"),
-                "plazo": datetime.now().strftime("%Y-%m-%d"),
-                "observaciones": "",
-                "delegada": "",
-                "estado": "Pendiente",
-                "fecha_termino": None
-            }
+            tarea = Tarea(None, "", "", date.today(), date.today(), "", "Pendiente", "", None)
             modo = "agregar"
         
         st.subheader(f"{'Editar' if modo == 'edición' else 'Agregar'} Tarea")
@@ -779,50 +1159,50 @@ def main():
         delegada_key = f"delegada_{key_suffix}"
         estado_key = f"estado_{key_suffix}"
         
-        tarea_nombre = st.text_input("Tarea", value=tarea["tarea"], key=tarea_key)
-        acciones = st.text_area("Acciones a Realizar", value=tarea["acciones"], height=150, key=acciones_key)
+        tarea_nombre = st.text_input("Tarea", value=tarea.tarea, key=tarea_key)
+        acciones = st.text_area("Acciones a Realizar", value=tarea.acciones, height=150, key=acciones_key)
         
         col1, col2 = st.columns(2)
         with col1:
-            fecha_inicio_val = datetime.strptime(tarea["fecha_inicio"], "%Y-%m-%d").date() if tarea["fecha_inicio"] else datetime.now().date()
-            fecha_inicio = st.date_input("F. Inicio", value=fecha_inicio_val, key=fecha_inicio_key)
+            fecha_inicio = st.date_input("F. Inicio", value=tarea.fecha_inicio or date.today(), key=fecha_inicio_key)
         with col2:
-            plazo_val = datetime.strptime(tarea["plazo"], "%Y-%m-%d").date() if tarea["plazo"] else datetime.now().date()
-            plazo = st.date_input("Plazo", value=plazo_val, key=plazo_key)
+            plazo = st.date_input("Plazo", value=tarea.plazo or date.today(), key=plazo_key)
         
-        observaciones = st.text_area("Observaciones", value=tarea["observaciones"], height=100, key=observaciones_key)
-        delegada = st.text_input("Delegada a", value=tarea["delegada"], key=delegada_key)
+        observaciones = st.text_area("Observaciones", value=tarea.observaciones, height=100, key=observaciones_key)
+        delegada = st.text_input("Delegada a", value=tarea.delegada, key=delegada_key)
         estado = st.selectbox("Estado", 
-                              ["Pendiente", "En Proceso", "Terminada"], 
-                              index=["Pendiente", "En Proceso", "Terminada"].index(tarea["estado"]) if tarea["estado"] in ["Pendiente", "En Proceso", "Terminada"] else 0, 
+                              ESTADOS, 
+                              index=ESTADOS.index(tarea.estado) if tarea.estado in ESTADOS else 0, 
                               key=estado_key)
         
+        valores = {
+            "tarea": tarea_nombre,
+            "acciones": acciones,
+            "fecha_inicio": fecha_inicio.strftime("%Y-%m-%d"),
+            "plazo": plazo.strftime("%Y-%m-%d"),
+            "observaciones": observaciones,
+            "delegada": delegada,
+            "estado": estado,
+        }
+        
         col_btn1, col_btn2, col_btn3, col_btn4 = st.columns(4)
         with col_btn1:
             if st.button("💾 Guardar"):
                 if tarea_nombre:
-                    fecha_inicio_str = fecha_inicio.strftime("%Y-%m-%d")
-                    plazo_str = plazo.strftime("%Y-%m-%d")
-                    
                     if modo == "agregar":
-                        agregar_tarea(tarea_nombre, acciones, fecha_inicio_str, 
-                                     plazo_str, observaciones, delegada, estado)
+                        agregar_tarea(**valores)
                         st.success("Tarea agregada exitosamente")
-                    else:
-                        editar_tarea(tarea_id, tarea_nombre, acciones, fecha_inicio_str,
-                                    plazo_str, observaciones, delegada, estado)
+                        cerrar_edicion()
+                        st.rerun()
+                    elif guardar_edicion(tarea_id, valores, tarea.rev):
                         st.success("Tarea actualizada exitosamente")
-                    
-                    st.session_state["tarea_seleccionada"] = None
-                    st.session_state["current_tab"] = "Listado de Tareas"
                     st.rerun()
                 else:
                     st.warning("El nombre de la tarea es obligatorio")
         
         with col_btn2:
             if st.button("❌ Cancelar"):
-                st.session_state["tarea_seleccionada"] = None
-                st.session_state["current_tab"] = "Listado de Tareas"
+                cerrar_edicion()
                 st.rerun()
         
         with col_btn3:
@@ -832,16 +1212,40 @@ def main():
         
         with col_btn4:
             if st.button("📥 Importar desde Excel", help="Importar tareas desde el archivo Excel"):
-                resultado = importar_desde_excel()
-                if resultado:
-                    nuevas, actualizadas = resultado
-                    st.success(f"Importación exitosa: {nuevas} nuevas tareas, {actualizadas} actualizadas")
+                barra = st.progress(0.0, text="Importando...")
+                
+                def mostrar_progreso(filas, total):
+                    fraccion = min(filas / total, 1.0) if total else 0.0
+                    barra.progress(fraccion, text=f"Importando... {filas} filas procesadas")
+                
+                reporte = importar_desde_excel(progreso=mostrar_progreso)
+                barra.empty()
+                if reporte:
+                    st.session_state["reporte_importacion"] = reporte
                     st.rerun()
                 else:
                     st.error("Error en la importación")
         
+        if modo == "edición" and st.session_state.get("conflicto_edicion"):
+            mostrar_conflicto_edicion(st.session_state["conflicto_edicion"], valores)
+        
+        if st.session_state.get("reporte_importacion"):
+            mostrar_reporte_importacion(st.session_state.pop("reporte_importacion"))
+        
         st.info(f"Todas las tareas se sincronizan automáticamente con el archivo: {EXCEL_FILE}")
+        mostrar_estado_sincronizacion()
         st.info("Usa el botón 'Importar desde Excel' para cargar datos desde este archivo")
 
+    if panel_admin_abierto():
+        fase("panel de administración")
+        mostrar_panel_admin()
+        mostrar_archivo_admin()
+
 if __name__ == "__main__":
-    main()
+    try:
+        # Contar sentencias cuesta en cada una: solo mientras el panel está abierto
+        with ejecucion("rerun", contar_consultas=panel_admin_abierto()):
+            main()
+    finally:
+        # El próximo rerun corre en otro hilo: la conexión vuelve al pool del proceso
+        liberar_conexiones()
@@ -0,0 +1,118 @@
+# archivo.py
+"""Archivo de tareas terminadas hace tiempo (migración 9).
+
+Las tareas terminadas hace más de `dias` días salen de 'tareas' a
+'tareas_archivo'; así el listado, la búsqueda y las exportaciones recorren
+solo las tareas activas. Se mueven por lotes, cada uno en una transacción
+corta, y se pueden restaurar con el mismo ID y la misma revisión.
+
+    python archivo.py --dias 365
+"""
+import argparse
+import json
+import sys
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+from conexion import transaccion
+from instrumentacion import medido
+from migraciones import MARCA_ARCHIVO
+from modelo_tarea import CAMPOS
+
+DIAS_ARCHIVO = 365   # se archivan las terminadas hace más de esto
+LOTE_ARCHIVO = 500   # tareas por transacción
+
+_COLUMNAS = ", ".join(CAMPOS)
+
+
+def _mover(conn, ids, origen, destino, archivada_en=None):
+    """Pasa `ids` de una tabla a la otra sin que cuenten como altas ni bajas"""
+    lista = json.dumps(ids)
+    columnas, valores, parametros = _COLUMNAS, _COLUMNAS, (lista,)
+    if archivada_en:
+        columnas, valores, parametros = f"{_COLUMNAS}, archivada_en", f"{_COLUMNAS}, ?", (archivada_en, lista)
+    conn.execute("INSERT INTO indices_suspendidos (nombre) VALUES (?)", (MARCA_ARCHIVO,))
+    conn.execute(
+        f"INSERT INTO {destino} ({columnas}) "
+        f"SELECT {valores} FROM {origen} WHERE id IN (SELECT value FROM json_each(?))",
+        parametros
+    )
+    conn.execute(f"DELETE FROM {origen} WHERE id IN (SELECT value FROM json_each(?))", (lista,))
+    conn.execute("DELETE FROM indices_suspendidos WHERE nombre = ?", (MARCA_ARCHIVO,))
+
+
+def archivar_lote(conn, dias=DIAS_ARCHIVO, lote=LOTE_ARCHIVO):
+    """Archiva hasta `lote` tareas terminadas antes del corte; devuelve sus IDs"""
+    corte = (date.today() - timedelta(days=dias)).isoformat()
+    # Sin ANALYZE el planificador prefiere (estado, plazo) y recorre todas las terminadas
+    ids = [fila[0] for fila in conn.execute(
+        "SELECT id FROM tareas INDEXED BY idx_tareas_terminadas "
+        "WHERE estado = 'Terminada' AND fecha_termino < ? ORDER BY fecha_termino, id LIMIT ?",
+        (corte, lote)
+    )]
+    if ids:
+        _mover(conn, ids, "tareas", "tareas_archivo", datetime.now().isoformat(timespec="seconds"))
+    return ids
+
+
+def restaurar_ids(conn, ids):
+    """Devuelve a 'tareas' las archivadas de `ids`; entrega las que estaban archivadas"""
+    encontrados = [fila[0] for fila in conn.execute(
+        "SELECT id FROM tareas_archivo WHERE id IN (SELECT value FROM json_each(?)) ORDER BY id",
+        (json.dumps([int(id) for id in ids]),)
+    )]
+    if encontrados:
+        _mover(conn, encontrados, "tareas_archivo", "tareas")
+    return encontrados
+
+
+@contextmanager
+def _transaccion_con_ids(ruta):
+    with transaccion(ruta) as conn:
+        yield conn, set()
+
+
+def _escritura(ruta, canal):
+    # Con el canal de la app las sesiones saben al tiro qué tareas salieron del listado
+    return canal.transaccion() if canal is not None else _transaccion_con_ids(ruta)
+
+
+@medido
+def archivar(ruta, dias=DIAS_ARCHIVO, lote=LOTE_ARCHIVO, canal=None):
+    """Archiva por lotes todas las terminadas hace más de `dias` días; devuelve cuántas"""
+    total = 0
+    while True:
+        with _escritura(ruta, canal) as (conn, ids):
+            movidos = archivar_lote(conn, dias, lote)
+            ids.update(movidos)
+        total += len(movidos)
+        if len(movidos) < lote:
+            break
+    print(f"[archivo] {ruta}: {total} tareas archivadas (terminadas hace más de {dias} días)")
+    return total
+
+
+@medido
+def restaurar(ruta, ids, canal=None):
+    """Vuelve a activar tareas archivadas; devuelve los IDs restaurados"""
+    with _escritura(ruta, canal) as (conn, tocados):
+        restaurados = restaurar_ids(conn, ids)
+        tocados.update(restaurados)
+    return restaurados
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Archiva las tareas terminadas hace tiempo")
+    parser.add_argument("--db", default="tareas.db")
+    parser.add_argument("--dias", type=int, default=DIAS_ARCHIVO)
+    parser.add_argument("--lote", type=int, default=LOTE_ARCHIVO)
+    opciones = parser.parse_args(argumentos)
+
+    from migraciones import asegurar_esquema
+    asegurar_esquema(opciones.db)
+    archivar(opciones.db, opciones.dias, opciones.lote)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
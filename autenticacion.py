@@ -0,0 +1,278 @@
+# autenticacion.py
+import base64
+import hashlib
+import hmac
+import secrets
+import string
+import threading
+import time
+from collections import deque
+
+from conexion import obtener_conexion, reintentar_si_ocupada, transaccion
+from instrumentacion import medido
+
+USUARIOS_POR_DEFECTO = [
+    ("dcostar@isl.gob.cl", "123456", "seguridad"),
+    ("pclaissacs@isl.gob.cl", "123456", "prevencion"),
+]
+
+# scrypt: ~16 MiB y unas decenas de ms por verificación
+SCRYPT_N, SCRYPT_R, SCRYPT_P = 2 ** 14, 8, 1
+PREFIJO_HASH = "scrypt"
+
+DURACION_SESION = 8 * 3600  # segundos que vale un token (una jornada)
+MAX_SESIONES = 10000        # tokens verificados que se recuerdan en memoria
+MAX_INTENTOS = 5            # fallos por correo dentro de la ventana antes de bloquear
+VENTANA_INTENTOS = 300      # segundos
+MAX_CORREOS_VIGILADOS = 10000
+
+_bloqueo = threading.Lock()
+_bases_preparadas = set()
+_clave_firma = secrets.token_bytes(32)  # los tokens valen mientras viva el proceso
+_sesiones = {}                          # token -> (email, expira)
+_revocadas = {}                         # email -> instante desde el que se invalidan sus tokens
+_fallos = {}                            # email -> deque de instantes de intentos fallidos
+_hash_ficticio = None
+
+
+class ErrorAutenticacion(Exception):
+    """Credenciales rechazadas; el mensaje se puede mostrar tal cual"""
+
+
+class IntentosExcedidos(ErrorAutenticacion):
+    """Demasiados fallos seguidos para un correo: se rechaza sin consultar la BD"""
+    def __init__(self, segundos):
+        self.segundos = segundos
+        super().__init__(f"Demasiados intentos fallidos. Intenta de nuevo en {segundos} s")
+
+
+# =========================
+# 🔑 HASH DE CONTRASEÑAS
+# =========================
+def hashear(secreto):
+    """'scrypt$n$r$p$sal$hash' con sal aleatoria"""
+    sal = secrets.token_bytes(16)
+    derivada = hashlib.scrypt(secreto.encode(), salt=sal, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P)
+    return f"{PREFIJO_HASH}${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${sal.hex()}${derivada.hex()}"
+
+
+def es_hash(valor):
+    return valor.startswith(PREFIJO_HASH + "$")
+
+
+def verificar(secreto, guardado):
+    """Compara `secreto` con un hash de `hashear` en tiempo constante"""
+    try:
+        _, n, r, p, sal, esperado = guardado.split("$")
+        derivada = hashlib.scrypt(secreto.encode(), salt=bytes.fromhex(sal), n=int(n), r=int(r), p=int(p))
+    except ValueError:
+        return False
+    return hmac.compare_digest(derivada.hex(), esperado)
+
+
+def _verificar_sin_usuario(secreto):
+    # Mismo costo que con un usuario real: el tiempo no delata qué correos existen
+    global _hash_ficticio
+    if _hash_ficticio is None:
+        _hash_ficticio = hashear(secrets.token_hex(8))
+    verificar(secreto, _hash_ficticio)
+
+
+# =========================
+# 🗄️ BASE DE USUARIOS
+# =========================
+def preparar_usuarios(ruta):
+    """Crea la tabla, agrega los usuarios por defecto y hashea claves en texto plano.
+
+    Se hace una sola vez por proceso; las llamadas siguientes no tocan SQLite.
+    """
+    clave = str(ruta)
+    if clave in _bases_preparadas:
+        return
+    with _bloqueo:
+        if clave in _bases_preparadas:
+            return
+        with transaccion(ruta) as con:
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS usuarios(
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    email TEXT UNIQUE NOT NULL,
+                    password TEXT NOT NULL,
+                    secret_word TEXT NOT NULL
+                );
+            """)
+            existentes = {fila[0] for fila in con.execute("SELECT email FROM usuarios")}
+            for email, password, secret_word in USUARIOS_POR_DEFECTO:
+                if email not in existentes:
+                    con.execute(
+                        "INSERT INTO usuarios (email, password, secret_word) VALUES (?, ?, ?)",
+                        (email, hashear(password), hashear(secret_word))
+                    )
+            # Bases anteriores guardaban las claves en texto plano
+            planas = [fila for fila in con.execute("SELECT id, password, secret_word FROM usuarios")
+                      if not es_hash(fila[1]) or not es_hash(fila[2])]
+            for id_usuario, password, secret_word in planas:
+                con.execute(
+                    "UPDATE usuarios SET password = ?, secret_word = ? WHERE id = ?",
+                    (password if es_hash(password) else hashear(password),
+                     secret_word if es_hash(secret_word) else hashear(secret_word), id_usuario)
+                )
+            if planas:
+                print(f"[autenticacion] {len(planas)} usuarios migrados a claves con hash")
+        _bases_preparadas.add(clave)
+
+
+@medido
+def obtener_usuario(ruta, email):
+    """(password, secret_word) con hash del usuario, o None"""
+    return obtener_conexion(ruta).execute(
+        "SELECT password, secret_word FROM usuarios WHERE email = ?", (email,)
+    ).fetchone()
+
+
+@medido
+@reintentar_si_ocupada
+def _guardar_clave(ruta, email, nueva):
+    with transaccion(ruta) as con:
+        con.execute("UPDATE usuarios SET password = ? WHERE email = ?", (hashear(nueva), email))
+    revocar_sesiones(email)
+
+
+def generar_clave_temporal(largo=8):
+    alfabeto = string.ascii_letters + string.digits
+    return ''.join(secrets.choice(alfabeto) for _ in range(largo))
+
+
+# =========================
+# ⏳ LÍMITE DE INTENTOS POR CORREO
+# =========================
+def _esperar_si_bloqueado(clave):
+    ahora = time.monotonic()
+    with _bloqueo:
+        fallos = _fallos.get(clave)
+        if not fallos:
+            return
+        while fallos and ahora - fallos[0] > VENTANA_INTENTOS:
+            fallos.popleft()
+        if len(fallos) >= MAX_INTENTOS:
+            raise IntentosExcedidos(int(VENTANA_INTENTOS - (ahora - fallos[0])) + 1)
+
+
+def _registrar_fallo(clave):
+    ahora = time.monotonic()
+    with _bloqueo:
+        if len(_fallos) >= MAX_CORREOS_VIGILADOS:
+            # Una avalancha de correos distintos no debe hacer crecer el dict sin límite
+            for vencido in [c for c, f in _fallos.items() if not f or ahora - f[-1] > VENTANA_INTENTOS]:
+                del _fallos[vencido]
+        _fallos.setdefault(clave, deque(maxlen=MAX_INTENTOS)).append(ahora)
+
+
+def _comprobar(ruta, email, secreto, columna):
+    """Verifica `secreto` contra la columna 0 (password) o 1 (secret_word) del usuario.
+
+    Con el correo bloqueado lanza IntentosExcedidos antes de leer la BD o calcular hashes.
+    """
+    clave = email.lower()
+    _esperar_si_bloqueado(clave)
+    usuario = obtener_usuario(ruta, email)
+    if usuario is None:
+        _verificar_sin_usuario(secreto)
+    elif verificar(secreto, usuario[columna]):
+        with _bloqueo:
+            _fallos.pop(clave, None)
+        return True
+    _registrar_fallo(clave)
+    return False
+
+
+# =========================
+# 🎟️ SESIONES
+# =========================
+def _firmar(contenido):
+    return hmac.new(_clave_firma, contenido.encode(), hashlib.sha256).hexdigest()
+
+
+def emitir_sesion(email):
+    """Token firmado 'correo.emitido.nonce.firma' que vale DURACION_SESION segundos"""
+    emitido = int(time.time())
+    correo = base64.urlsafe_b64encode(email.encode()).decode()
+    contenido = f"{correo}.{emitido}.{secrets.token_urlsafe(8)}"
+    token = f"{contenido}.{_firmar(contenido)}"
+    with _bloqueo:
+        _recordar(token, email, emitido + DURACION_SESION)
+    return token
+
+
+def _recordar(token, email, expira):
+    if len(_sesiones) >= MAX_SESIONES:
+        ahora = time.time()
+        for vencido in [t for t, (_, exp) in _sesiones.items() if exp <= ahora]:
+            del _sesiones[vencido]
+        if len(_sesiones) >= MAX_SESIONES:
+            _sesiones.pop(next(iter(_sesiones)))
+    _sesiones[token] = (email, expira)
+
+
+def usuario_de_sesion(token):
+    """Correo dueño de un token vigente, o None. Solo memoria: no consulta usuarios.db"""
+    if not token:
+        return None
+    ahora = time.time()
+    with _bloqueo:
+        entrada = _sesiones.get(token)
+        if entrada is not None:
+            if entrada[1] > ahora:
+                return entrada[0]
+            del _sesiones[token]
+            return None
+    # No está en memoria (se descartó por espacio): se verifica la firma
+    try:
+        contenido, firma = token.rsplit(".", 1)
+        correo, emitido, _ = contenido.split(".")
+        email, emitido = base64.urlsafe_b64decode(correo).decode(), int(emitido)
+    except ValueError:
+        return None
+    if not hmac.compare_digest(firma, _firmar(contenido)) or emitido + DURACION_SESION <= ahora:
+        return None
+    with _bloqueo:
+        if emitido < _revocadas.get(email, 0):
+            return None
+        _recordar(token, email, emitido + DURACION_SESION)
+    return email
+
+
+def revocar_sesiones(email):
+    """Invalida los tokens ya emitidos para `email` (p. ej. tras cambiar la clave)"""
+    with _bloqueo:
+        _revocadas[email] = int(time.time()) + 1
+        for token in [t for t, (propietario, _) in _sesiones.items() if propietario == email]:
+            del _sesiones[token]
+
+
+# =========================
+# 🚪 OPERACIONES DEL LOGIN
+# =========================
+def iniciar_sesion(ruta, email, password):
+    """Token de sesión si las credenciales son correctas; si no, ErrorAutenticacion"""
+    email = (email or "").strip()
+    if not _comprobar(ruta, email, password, 0):
+        raise ErrorAutenticacion("Correo o contraseña incorrectos")
+    return emitir_sesion(email)
+
+
+def recuperar_clave(ruta, email, palabra_secreta):
+    """Genera y guarda una clave temporal si la palabra secreta es correcta; la devuelve"""
+    email = (email or "").strip()
+    if not _comprobar(ruta, email, palabra_secreta, 1):
+        raise ErrorAutenticacion("Correo o palabra secreta incorrectos")
+    temporal = generar_clave_temporal()
+    _guardar_clave(ruta, email, temporal)
+    return temporal
+
+
+def cambiar_clave(ruta, email, actual, nueva):
+    email = (email or "").strip()
+    if not _comprobar(ruta, email, actual, 0):
+        raise ErrorAutenticacion("Correo o contraseña actual incorrectos")
+    _guardar_clave(ruta, email, nueva)
@@ -0,0 +1,289 @@
+# benchmark_tareas.py
+"""Mide cómo escalan las operaciones de tareas con el tamaño de la tabla.
+
+Se ejecuta sin levantar Streamlit, sobre una base temporal con datos sintéticos:
+
+    python benchmark_tareas.py --tamanos 1000 10000 100000 --salida base.json
+    python benchmark_tareas.py --comparar base.json --tolerancia 0.25
+
+Con --comparar sale con código 1 si alguna operación empeora más que la tolerancia.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+TAMANOS = [1000, 10000, 100000]
+REPETICIONES = 5
+TOLERANCIA = 0.2  # 20 % más lento que la referencia se marca como regresión
+SEMILLA = 1234
+
+ESTADOS = ["Pendiente", "En Proceso", "Terminada"]
+DELEGADAS = [None, "Ana", "Carla", "Daniela", "Fernanda", "Marcela"]
+COLUMNAS_DB = ['tarea', 'acciones', 'fecha_inicio', 'plazo', 'observaciones',
+               'estado', 'delegada', 'fecha_termino']
+
+
+# =========================
+# 🧪 DATOS SINTÉTICOS
+# =========================
+def filas_sinteticas(cantidad, azar):
+    inicio = date(2023, 1, 1)
+    for i in range(cantidad):
+        fecha_inicio = inicio + timedelta(days=azar.randrange(700))
+        estado = azar.choice(ESTADOS)
+        yield (
+            f"Tarea sintética {i}",
+            f"Acciones de la tarea {i}",
+            fecha_inicio.isoformat(),
+            (fecha_inicio + timedelta(days=azar.randrange(1, 90))).isoformat(),
+            azar.choice([None, "Sin observaciones", "Revisar con jefatura"]),
+            estado,
+            azar.choice(DELEGADAS),
+            (fecha_inicio + timedelta(days=azar.randrange(60))).isoformat() if estado == "Terminada" else None,
+        )
+
+
+def poblar(ruta_db, cantidad, semilla=SEMILLA):
+    """Deja en 'tareas' exactamente `cantidad` filas sintéticas (IDs 1..cantidad) y devuelve el mayor ID"""
+    from conexion import transaccion
+    azar = random.Random(semilla)
+    with transaccion(ruta_db) as conn:
+        conn.execute("DELETE FROM tareas")
+        # AUTOINCREMENT seguiría desde el tamaño anterior y id_al_azar elegiría IDs borrados
+        conn.execute("DELETE FROM sqlite_sequence WHERE name = 'tareas'")
+        conn.executemany(
+            f"INSERT INTO tareas ({', '.join(COLUMNAS_DB)}) VALUES ({', '.join('?' for _ in COLUMNAS_DB)})",
+            filas_sinteticas(cantidad, azar)
+        )
+        conn.execute("DELETE FROM tareas_historial")
+        return conn.execute("SELECT MAX(id) FROM tareas").fetchone()[0]
+
+
+# =========================
+# ⏱️ MEDICIÓN
+# =========================
+def percentil(valores, p):
+    """Percentil con interpolación lineal (p entre 0 y 100)"""
+    ordenados = sorted(valores)
+    posicion = (len(ordenados) - 1) * p / 100
+    inferior = int(posicion)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * (posicion - inferior)
+
+
+def medir(preparar, ejecutar, repeticiones):
+    """Tiempos de `repeticiones` ejecuciones y memoria pico de una ejecución extra.
+
+    La memoria se mide aparte porque tracemalloc distorsiona los tiempos.
+    `preparar` (no cronometrado) devuelve los argumentos de `ejecutar`.
+    """
+    tiempos = []
+    for _ in range(repeticiones):
+        argumentos = preparar()
+        inicio = time.perf_counter()
+        ejecutar(*argumentos)
+        tiempos.append(time.perf_counter() - inicio)
+    argumentos = preparar()
+    tracemalloc.start()
+    try:
+        ejecutar(*argumentos)
+        pico = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        "repeticiones": repeticiones,
+        "min": min(tiempos),
+        "media": sum(tiempos) / len(tiempos),
+        "p50": percentil(tiempos, 50),
+        "p90": percentil(tiempos, 90),
+        "p99": percentil(tiempos, 99),
+        "max": max(tiempos),
+        "memoria_pico_kib": round(pico / 1024, 1),
+    }
+
+
+# =========================
+# 🏋️ OPERACIONES
+# =========================
+def operaciones(app, db, id_maximo, azar):
+    """(nombre, preparar, ejecutar) de cada operación a medir"""
+    from exportacion import exportar_tareas
+    from modelo_tarea import Tarea
+
+    def id_al_azar():
+        return azar.randint(1, id_maximo)
+
+    def en_frio(*argumentos):
+        # Las lecturas se miden sin caché: es el costo real tras cada escritura
+        def preparar():
+            app.cache_tareas().limpiar()
+            return argumentos
+        return preparar
+
+    def recortar(*argumentos, modificar=0):
+        # Las importaciones que insertan se deshacen para no hacer crecer la tabla.
+        # Con `modificar`, esa cantidad de filas se cambia en la base para que la
+        # importación tenga que reescribirlas y no mida solo el caso sin cambios
+        def preparar():
+            from conexion import transaccion
+            with transaccion(app.DB_FILE) as conn:
+                conn.execute("DELETE FROM tareas WHERE id > ?", (id_maximo,))
+                conn.executemany(
+                    "UPDATE tareas SET observaciones = ? WHERE id = ?",
+                    ((f"Cambiada en la base {azar.random()}", id) for id in
+                     azar.sample(range(1, id_maximo + 1), min(modificar, id_maximo)))
+                )
+            app.cache_tareas().limpiar()
+            return argumentos
+        return preparar
+
+    def importar_app(ruta, modificadas):
+        reporte = app.importar_archivo(ruta, exportar=False)
+        # Las ediciones de las operaciones anteriores también se revierten: al menos `modificadas`
+        assert reporte.actualizadas >= modificadas and not reporte.insertadas, reporte.resumen()
+        assert not reporte.invalidas and not reporte.omitidas, reporte.resumen()
+
+    def importar_db(ruta):
+        reporte = db.importar_tareas_desde_excel(ruta)
+        assert reporte.insertadas == id_maximo, reporte.resumen()
+
+    def datos_tarea():
+        return ("Tarea de prueba", "Acciones", "2024-01-01", "2024-02-01", None, "Ana", azar.choice(ESTADOS))
+
+    # Archivos de entrada: el de la app trae ID (solo reescribe lo que cambió), el de db.py no (inserta)
+    modificadas = max(1, id_maximo // 10)
+    app.exportar_a_excel("benchmark_app.xlsx")
+    exportar_tareas(app.DB_FILE, {col: col for col in COLUMNAS_DB}, 'xlsx', "benchmark_db.xlsx")
+
+    return [
+        ("app.obtener_tareas", en_frio(), app.obtener_tareas),
+        ("app.obtener_pagina_tareas", en_frio({'estados': ['Pendiente']}, 'plazo'),
+         lambda filtros, orden: app.obtener_pagina_tareas(filtros, orden, limite=50)),
+        ("app.buscar_coincidencias", en_frio("sintética 12"), app.buscar_coincidencias),
+        ("app.agregar_tarea", lambda: datos_tarea(),
+         lambda *datos: app.agregar_tarea(*datos, exportar=False)),
+        ("app.editar_tarea", lambda: (id_al_azar(), *datos_tarea()),
+         lambda id, *datos: app.editar_tarea(id, *datos, exportar=False)),
+        ("app.actualizar_estado", lambda: (id_al_azar(), azar.choice(ESTADOS)),
+         lambda id, estado: app.actualizar_estados({id: estado}, exportar=False)),
+        ("app.exportar_a_excel", lambda: ("benchmark_salida.xlsx",), app.exportar_a_excel),
+        ("app.exportar_csv", lambda: ("csv",), app.exportar_en_memoria),
+        ("app.importar_archivo", recortar("benchmark_app.xlsx", modificadas, modificar=modificadas),
+         importar_app),
+        ("db.obtener_todas", lambda: (), db.obtener_todas),
+        ("db.agregar_tarea", lambda: (Tarea(None, *datos_tarea()[:5], "Pendiente", "Ana", None),),
+         db.agregar_tarea),
+        ("db.actualizar_tarea", lambda: (Tarea(id_al_azar(), *datos_tarea()[:5], "En Proceso", "Ana", None),),
+         db.actualizar_tarea),
+        ("db.importar_tareas_desde_excel", recortar("benchmark_db.xlsx"), importar_db),
+    ]
+
+
+def ejecutar_benchmark(tamanos=TAMANOS, repeticiones=REPETICIONES, filtro=None, semilla=SEMILLA):
+    """Corre todas las operaciones para cada tamaño en un directorio temporal"""
+    directorio_original = os.getcwd()
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    # Fuera de `streamlit run` los decoradores de caché avisan que no hay runtime
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    resultados = {}
+    with tempfile.TemporaryDirectory(prefix="benchmark_tareas_") as temporal:
+        # Las rutas de la app son relativas: todo queda dentro del temporal
+        os.chdir(temporal)
+        try:
+            import app_streamlit as app
+            import db
+            from conexion import cerrar_conexiones
+            app.init_db()
+            for tamano in tamanos:
+                id_maximo = poblar(app.DB_FILE, tamano, semilla)
+                app.cache_tareas().limpiar()
+                azar = random.Random(semilla)
+                resultados[str(tamano)] = {}
+                for nombre, preparar, ejecutar in operaciones(app, db, id_maximo, azar):
+                    if filtro and filtro not in nombre:
+                        continue
+                    medida = medir(preparar, ejecutar, repeticiones)
+                    resultados[str(tamano)][nombre] = medida
+                    print(f"[benchmark] {tamano:>7} filas  {nombre:<32} p50 {medida['p50'] * 1000:9.1f} ms  "
+                          f"pico {medida['memoria_pico_kib']:>10.1f} KiB")
+            cerrar_conexiones()
+        finally:
+            os.chdir(directorio_original)
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit_actual(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "repeticiones": repeticiones,
+        "resultados": resultados,
+    }
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# =========================
+# 📊 COMPARACIÓN
+# =========================
+def comparar(actual, referencia, tolerancia=TOLERANCIA):
+    """Lista de (tamaño, operación, p50 referencia, p50 actual, razón) que empeoraron"""
+    regresiones = []
+    for tamano, operaciones_actuales in actual["resultados"].items():
+        for nombre, medida in operaciones_actuales.items():
+            base = referencia.get("resultados", {}).get(tamano, {}).get(nombre)
+            if not base or base["p50"] <= 0:
+                continue
+            razon = medida["p50"] / base["p50"]
+            if razon > 1 + tolerancia:
+                regresiones.append((tamano, nombre, base["p50"], medida["p50"], razon))
+    return regresiones
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Benchmark de las operaciones de tareas")
+    parser.add_argument("--tamanos", type=int, nargs="+", default=TAMANOS)
+    parser.add_argument("--repeticiones", type=int, default=REPETICIONES)
+    parser.add_argument("--solo", help="medir solo las operaciones cuyo nombre contiene este texto")
+    parser.add_argument("--salida", help="archivo JSON donde guardar los resultados")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior contra el que comparar")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA)
+    opciones = parser.parse_args(argumentos)
+
+    resultado = ejecutar_benchmark(opciones.tamanos, opciones.repeticiones, opciones.solo)
+    if opciones.salida:
+        with open(opciones.salida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+        print(f"[benchmark] Resultados guardados en {opciones.salida}")
+
+    if opciones.comparar:
+        with open(opciones.comparar, encoding="utf-8") as f:
+            referencia = json.load(f)
+        regresiones = comparar(resultado, referencia, opciones.tolerancia)
+        for tamano, nombre, antes, ahora, razon in regresiones:
+            print(f"[benchmark] REGRESIÓN {tamano} filas {nombre}: "
+                  f"{antes * 1000:.1f} ms -> {ahora * 1000:.1f} ms (x{razon:.2f})")
+        if regresiones:
+            return 1
+        print(f"[benchmark] Sin regresiones respecto de {opciones.comparar} "
+              f"(commit {referencia.get('commit')})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
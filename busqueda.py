@@ -0,0 +1,105 @@
+# busqueda.py
+import re
+from contextlib import contextmanager, nullcontext
+
+from conexion import obtener_conexion, transaccion
+
+INDICE = "tareas_fts"
+MARCA_INICIO, MARCA_FIN = "**", "**"  # resaltado en Markdown
+# Desde estas filas la importación suspende los triggers y reconstruye el índice al final
+UMBRAL_RECONSTRUCCION = 5000
+# Pesos de bm25 por columna: tarea, acciones, observaciones, delegada
+PESOS = (10.0, 4.0, 2.0, 1.0)
+
+
+def consulta_fts(texto):
+    """'informe mensu' -> '"informe"* "mensu"*': todas las palabras, por prefijo.
+
+    Devuelve None si el texto no tiene palabras. Las comillas y operadores que
+    escriba el usuario se descartan, así nunca se arma una consulta inválida.
+    """
+    palabras = re.findall(r"\w+", texto or "")
+    if not palabras:
+        return None
+    return " ".join(f'"{palabra}"*' for palabra in palabras)
+
+
+def buscar_tareas(ruta, texto, limite=20):
+    """Tareas que coinciden con `texto`, de la más a la menos relevante, con resaltado"""
+    consulta = consulta_fts(texto)
+    if consulta is None:
+        return []
+    conn = obtener_conexion(ruta)
+    # Primero solo los IDs mejor puntuados: highlight y snippet se calculan después
+    # para esas pocas filas y no para todas las coincidencias antes de ordenar
+    mejores = conn.execute(f'''
+        SELECT rowid, bm25({INDICE}, {', '.join(map(str, PESOS))}) AS puntaje
+        FROM {INDICE}
+        WHERE {INDICE} MATCH ?
+        ORDER BY puntaje
+        LIMIT ?
+    ''', (consulta, limite)).fetchall()
+    if not mejores:
+        return []
+    marcas = (MARCA_INICIO, MARCA_FIN)
+    resultados = []
+    for id_tarea, puntaje in mejores:
+        # Con rowid = ? FTS5 solo recorre esa fila (con IN revisaría todas las coincidencias)
+        fila = conn.execute(f'''
+            SELECT highlight({INDICE}, 0, ?, ?),
+                   snippet({INDICE}, 1, ?, ?, '…', 16),
+                   snippet({INDICE}, 2, ?, ?, '…', 16),
+                   highlight({INDICE}, 3, ?, ?)
+            FROM {INDICE}
+            WHERE {INDICE} MATCH ? AND rowid = ?
+        ''', (*marcas * 4, consulta, id_tarea)).fetchone()
+        if fila:
+            tarea, acciones, observaciones, delegada = fila
+            resultados.append({"id": id_tarea, "tarea": tarea, "acciones": acciones,
+                               "observaciones": observaciones, "delegada": delegada, "puntaje": puntaje})
+    return resultados
+
+
+def reconstruir_indice(ruta):
+    """Vuelve a indexar toda la tabla y reactiva los triggers"""
+    with transaccion(ruta) as conn:
+        conn.execute(f"INSERT INTO {INDICE} ({INDICE}) VALUES ('rebuild')")
+        conn.execute("DELETE FROM indices_suspendidos WHERE nombre = ?", (INDICE,))
+
+
+@contextmanager
+def indice_suspendido(ruta):
+    """Desactiva la sincronización fila a fila durante el bloque y reconstruye al salir.
+
+    Si mientras tanto nadie escribió en 'tareas' (p. ej. se reimportó un archivo
+    sin cambios) basta con reactivar los triggers.
+    """
+    from cache_tareas import leer_revision
+    with transaccion(ruta) as conn:
+        conn.execute("INSERT OR IGNORE INTO indices_suspendidos (nombre) VALUES (?)", (INDICE,))
+        revision = leer_revision(ruta)  # misma conexión: dentro de la transacción
+    try:
+        yield
+    finally:
+        if leer_revision(ruta) != revision:
+            reconstruir_indice(ruta)
+        else:
+            with transaccion(ruta) as conn:
+                conn.execute("DELETE FROM indices_suspendidos WHERE nombre = ?", (INDICE,))
+
+
+def indice_para_importacion(ruta_db, ruta_archivo):
+    """Suspende el índice solo si el archivo es grande; si no, los triggers bastan"""
+    from importacion import estimar_filas
+    filas = estimar_filas(ruta_archivo)
+    if filas is None or filas >= UMBRAL_RECONSTRUCCION:
+        return indice_suspendido(ruta_db)
+    return nullcontext()
+
+
+def reparar_indice(ruta):
+    """Reconstruye el índice si una importación se interrumpió dejándolo suspendido"""
+    conn = obtener_conexion(ruta)
+    if conn.execute("SELECT 1 FROM indices_suspendidos WHERE nombre = ?", (INDICE,)).fetchone():
+        print(f"[busqueda] {ruta}: índice suspendido por una importación interrumpida, se reconstruye")
+        reconstruir_indice(ruta)
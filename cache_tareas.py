@@ -0,0 +1,124 @@
+# cache_tareas.py
+import threading
+import time
+from collections import OrderedDict
+
+from conexion import obtener_conexion
+
+INTERVALO_VERIFICACION = 2.0  # segundos entre lecturas de la revisión en la BD
+MAX_CONSULTAS = 64            # páginas, conteos, listados completos
+MAX_POR_ID = 1024             # tareas individuales
+
+
+class _LRU:
+    def __init__(self, capacidad):
+        self.capacidad = capacidad
+        self._datos = OrderedDict()
+
+    def obtener(self, clave, revision):
+        entrada = self._datos.get(clave)
+        if entrada is None or entrada[0] != revision:
+            return None
+        self._datos.move_to_end(clave)
+        return entrada
+
+    def guardar(self, clave, revision, valor):
+        self._datos[clave] = (revision, valor)
+        self._datos.move_to_end(clave)
+        while len(self._datos) > self.capacidad:
+            self._datos.popitem(last=False)
+
+    def limpiar(self):
+        self._datos.clear()
+
+    def revalidar(self, desde, hasta, excepto):
+        """Las entradas de `desde` que no están en `excepto` pasan a valer en `hasta`"""
+        for clave, (revision, valor) in self._datos.items():
+            if revision == desde and clave not in excepto:
+                self._datos[clave] = (hasta, valor)
+
+    def __len__(self):
+        return len(self._datos)
+
+
+def leer_revision(ruta):
+    """Valor del contador que los triggers de 'tareas' incrementan en cada escritura"""
+    fila = obtener_conexion(ruta).execute("SELECT valor FROM revision_datos WHERE id = 1").fetchone()
+    return fila[0] if fila else 0
+
+
+class CacheTareas:
+    """Caché de lecturas compartida entre sesiones e invalidada por revisión.
+
+    Las escrituras de este proceso llaman a `registrar_escritura()`; los cambios
+    hechos por otros procesos se detectan releyendo la revisión como mucho cada
+    `intervalo` segundos. Mientras nada cambie, las lecturas no consultan SQLite.
+    Con un `canal` (notificaciones.py) la revisión se relee en cuanto el canal
+    anuncia una más nueva, sin esperar el intervalo, y como sabe qué IDs
+    cambiaron entre dos revisiones, las demás tareas leídas por ID siguen valiendo.
+    """
+
+    def __init__(self, ruta, intervalo=INTERVALO_VERIFICACION,
+                 max_consultas=MAX_CONSULTAS, max_por_id=MAX_POR_ID, canal=None):
+        self.ruta = ruta
+        self.canal = canal
+        self.intervalo = intervalo
+        self._bloqueo = threading.Lock()
+        self._consultas = _LRU(max_consultas)
+        self._por_id = _LRU(max_por_id)
+        self._revision = None
+        self._ultima = None                       # última revisión leída (sobrevive a registrar_escritura)
+        self._verificada_en = 0.0
+        self.aciertos = 0
+        self.fallos = 0
+
+    def revision(self):
+        ahora = time.monotonic()
+        # En memoria: sin consultar SQLite se sabe si otra sesión o proceso escribió
+        anunciada = self.canal.revision() if self.canal is not None else None
+        with self._bloqueo:
+            if (self._revision is not None and ahora - self._verificada_en < self.intervalo
+                    and (anunciada is None or anunciada <= self._revision)):
+                return self._revision
+        revision = leer_revision(self.ruta)
+        with self._bloqueo:
+            anterior = self._ultima
+            self._revision, self._verificada_en, self._ultima = revision, ahora, revision
+        if self.canal is not None and anterior is not None and revision != anterior:
+            ids = self.canal.ids_cambiados(anterior, revision)
+            if ids is not None:
+                with self._bloqueo:
+                    self._por_id.revalidar(anterior, revision, ids)
+        return revision
+
+    def registrar_escritura(self):
+        """Fuerza a releer la revisión en la próxima lectura"""
+        with self._bloqueo:
+            self._revision = None
+
+    def _obtener(self, lru, clave, calcular):
+        revision = self.revision()
+        with self._bloqueo:
+            entrada = lru.obtener(clave, revision)
+            if entrada is not None:
+                self.aciertos += 1
+                return entrada[1]
+            self.fallos += 1
+        valor = calcular()
+        with self._bloqueo:
+            lru.guardar(clave, revision, valor)
+        return valor
+
+    def consulta(self, clave, calcular):
+        """Resultado de `calcular()` para `clave` (hashable) en la revisión actual"""
+        return self._obtener(self._consultas, clave, calcular)
+
+    def tarea(self, id_tarea, calcular):
+        """Lectura de una tarea por ID (LRU acotada aparte de las consultas)"""
+        return self._obtener(self._por_id, id_tarea, calcular)
+
+    def limpiar(self):
+        with self._bloqueo:
+            self._consultas.limpiar()
+            self._por_id.limpiar()
+            self._revision = None
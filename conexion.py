@@ -0,0 +1,167 @@
+# conexion.py
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from instrumentacion import trazar
+
+# Pragmas por conexión (cache_size negativo = KiB)
+PRAGMAS = (
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 134217728",
+    "PRAGMA temp_store = MEMORY",
+)
+
+REINTENTOS = 5
+ESPERA_INICIAL = 0.05  # segundos; se duplica en cada reintento
+MAX_LIBRES = 8         # conexiones ociosas que se guardan por base
+
+_local = threading.local()
+_bloqueo_wal = threading.Lock()
+_bases_en_wal = set()
+_bloqueo_pool = threading.Lock()
+_libres = {}      # ruta -> [conexiones sin hilo asignado]
+_prestadas = {}   # conexión -> (ruta, hilo que la está usando)
+
+
+def _configurar_wal(conn, clave):
+    """Activa WAL una sola vez por archivo y proceso (el modo es persistente)"""
+    if clave in _bases_en_wal:
+        return
+    with _bloqueo_wal:
+        if clave not in _bases_en_wal:
+            conn.execute("PRAGMA journal_mode = WAL")
+            _bases_en_wal.add(clave)
+
+
+def _abrir(ruta):
+    # isolation_level=None: las transacciones se abren explícitamente en `transaccion()`.
+    # Una conexión la usa un solo hilo a la vez, pero al devolverla al pool cambia de hilo.
+    conn = sqlite3.connect(str(ruta), timeout=5.0, isolation_level=None, check_same_thread=False)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    _configurar_wal(conn, str(ruta))
+    return conn
+
+
+def _devolver(conn, clave):
+    """Deja `conn` libre para otro hilo (con _bloqueo_pool tomado)"""
+    if conn.in_transaction:
+        conn.rollback()
+    libres = _libres.setdefault(clave, [])
+    if len(libres) < MAX_LIBRES:
+        libres.append(conn)
+    else:
+        conn.close()
+
+
+def _tomar(clave):
+    """Una conexión libre del pool, o una nueva si no hay"""
+    with _bloqueo_pool:
+        if not _libres.get(clave):
+            # Hilos que terminaron sin devolver la suya (p. ej. los de los fragmentos)
+            for conn, (ruta, hilo) in list(_prestadas.items()):
+                if not hilo.is_alive():
+                    del _prestadas[conn]
+                    _devolver(conn, ruta)
+        libres = _libres.get(clave)
+        conn = libres.pop() if libres else None
+    if conn is None:
+        conn = _abrir(clave)
+    with _bloqueo_pool:
+        _prestadas[conn] = (clave, threading.current_thread())
+    return conn
+
+
+def obtener_conexion(ruta):
+    """Devuelve la conexión del hilo actual para `ruta`, tomándola del pool si hace falta.
+
+    Dentro de un hilo se reutiliza la misma conexión en cada llamada. Streamlit
+    ejecuta cada rerun en un hilo nuevo: al terminar, `liberar_conexiones()` la
+    devuelve al pool del proceso y el rerun siguiente la retoma ya configurada.
+    """
+    conexiones = getattr(_local, "conexiones", None)
+    if conexiones is None:
+        conexiones = _local.conexiones = {}
+    clave = str(ruta)
+    conn = conexiones.get(clave)
+    if conn is None:
+        conn = conexiones[clave] = _tomar(clave)
+    # Solo si la ejecución en curso cuenta sentencias para el panel de administración
+    trazar(conn)
+    return conn
+
+
+def liberar_conexiones():
+    """Devuelve al pool las conexiones del hilo actual (al final de cada rerun)"""
+    conexiones = getattr(_local, "conexiones", None) or {}
+    with _bloqueo_pool:
+        for clave, conn in conexiones.items():
+            _prestadas.pop(conn, None)
+            _devolver(conn, clave)
+    conexiones.clear()
+
+
+def cerrar_conexiones():
+    """Cierra las conexiones del hilo actual y las que esperan libres en el pool"""
+    conexiones = getattr(_local, "conexiones", None) or {}
+    with _bloqueo_pool:
+        for conn in conexiones.values():
+            _prestadas.pop(conn, None)
+            conn.close()
+        for libres in _libres.values():
+            for conn in libres:
+                conn.close()
+        _libres.clear()
+    conexiones.clear()
+
+
+def es_bloqueo(error):
+    mensaje = str(error).lower()
+    return "locked" in mensaje or "busy" in mensaje
+
+
+def con_reintentos(funcion, *args, intentos=REINTENTOS, **kwargs):
+    """Ejecuta `funcion` reintentando con espera exponencial si la base está ocupada"""
+    for intento in range(intentos):
+        try:
+            return funcion(*args, **kwargs)
+        except sqlite3.OperationalError as e:
+            if not es_bloqueo(e) or intento == intentos - 1:
+                raise
+            espera = ESPERA_INICIAL * (2 ** intento)
+            time.sleep(espera + random.uniform(0, espera))
+
+
+def reintentar_si_ocupada(funcion):
+    """Decorador: reintenta la función completa ante 'database is locked'"""
+    @wraps(funcion)
+    def envoltura(*args, **kwargs):
+        return con_reintentos(funcion, *args, **kwargs)
+    return envoltura
+
+
+@contextmanager
+def transaccion(ruta):
+    """Abre una transacción de escritura (BEGIN IMMEDIATE) en la conexión del hilo.
+
+    Si ya hay una transacción en curso en esta conexión, se reutiliza, de modo que
+    las funciones de escritura pueden anidarse dentro de una operación mayor.
+    """
+    conn = obtener_conexion(ruta)
+    if conn.in_transaction:
+        yield conn
+        return
+    con_reintentos(conn.execute, "BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
@@ -1,129 +1,104 @@
 # db.py
-import sqlite3
-from modelo_tarea import Tarea
-import pandas as pd
+from modelo_tarea import COLUMNAS_DATOS, Tarea
+from busqueda import indice_para_importacion
+from conexion import obtener_conexion, reintentar_si_ocupada, transaccion
+from importacion import TAMANO_BLOQUE, importar_por_bloques
+from instrumentacion import medido
+from migraciones import asegurar_esquema
 
 DB_NAME = "tareas.db"
 
 def conectar():
-    return sqlite3.connect(DB_NAME)
+    """Conexión compartida del hilo actual (no cerrar: la gestiona conexion.py)"""
+    return obtener_conexion(DB_NAME)
 
 def init_db():
-    conn = conectar()
-    c = conn.cursor()
-    print("[db] Creando o reparando tabla 'tareas'...")
-
-    # Verificar si existe la tabla
-    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='tareas'")
-    if not c.fetchone():
-        c.execute('''
-            CREATE TABLE tareas (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                estado TEXT,
-                nombre TEXT,
-                compromiso TEXT,
-                terminado INTEGER,
-                delegada INTEGER,
-                fecha_inicio TEXT,
-                plazo TEXT,
-                fecha_realizacion TEXT,
-                observaciones TEXT
-            )
-        ''')
-        print("[db] Tabla 'tareas' creada.")
-    else:
-        print("[db] Tabla 'tareas' ya existe.")
-
-    conn.commit()
-    conn.close()
+    """Crea o migra la tabla 'tareas' al esquema unificado que comparte app_streamlit.py"""
+    asegurar_esquema(DB_NAME)
 
+@medido
+@reintentar_si_ocupada
 def agregar_tarea(tarea: Tarea):
-    conn = conectar()
-    c = conn.cursor()
-    c.execute('''
-        INSERT INTO tareas (
-            estado, nombre, compromiso, terminado, delegada,
-            fecha_inicio, plazo, fecha_realizacion, observaciones
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        tarea.estado,
-        tarea.nombre,
-        tarea.compromiso,
-        tarea.terminado,
-        tarea.delegada,
-        tarea.fecha_inicio,
-        tarea.plazo,
-        tarea.fecha_realizacion,
-        tarea.observaciones
-    ))
-    conn.commit()
+    with transaccion(DB_NAME) as conn:
+        c = conn.execute(f'''
+            INSERT INTO tareas ({', '.join(COLUMNAS_DATOS)})
+            VALUES ({', '.join('?' for _ in COLUMNAS_DATOS)})
+        ''', tarea.parametros())
 
     tarea.id = c.lastrowid  # asigna el ID generado a la instancia
     print(f"[db] Tarea agregada con ID: {tarea.id}")
-    conn.close()
     return tarea.id
 
+@medido
+@reintentar_si_ocupada
+def agregar_tareas(tareas):
+    """Inserta muchas tareas con un solo executemany (acepta cualquier iterable)"""
+    with transaccion(DB_NAME) as conn:
+        c = conn.executemany(f'''
+            INSERT INTO tareas ({', '.join(COLUMNAS_DATOS)})
+            VALUES ({', '.join('?' for _ in COLUMNAS_DATOS)})
+        ''', (tarea.parametros() for tarea in tareas))
+    return c.rowcount
+
+def iterar_tareas(consulta="SELECT * FROM tareas ORDER BY id", parametros=()):
+    """Recorre las tareas de a una, sin cargar toda la tabla en memoria"""
+    return Tarea.desde_cursor(conectar().execute(consulta, parametros))
+
+@medido
 def obtener_todas():
-    conn = conectar()
-    c = conn.cursor()
-    c.execute("SELECT * FROM tareas")
-    filas = c.fetchall()
-    conn.close()
-    return filas
+    return list(iterar_tareas())
+
+@medido
+def obtener_tarea(id_tarea):
+    """La tarea con ese ID, o None si no existe"""
+    return next(iterar_tareas("SELECT * FROM tareas WHERE id = ?", (id_tarea,)), None)
 
 
+@medido
+@reintentar_si_ocupada
 def eliminar_tarea(id_tarea):
-    conn = conectar()
-    c = conn.cursor()
-    c.execute("DELETE FROM tareas WHERE id = ?", (id_tarea,))
-    conn.commit()
-    conn.close()
+    with transaccion(DB_NAME) as conn:
+        conn.execute("DELETE FROM tareas WHERE id = ?", (id_tarea,))
 
+@medido
+@reintentar_si_ocupada
 def actualizar_tarea(tarea: Tarea):
-    conn = conectar()
-    c = conn.cursor()
-    c.execute('''
-        UPDATE tareas
-        SET estado = ?, nombre = ?, compromiso = ?, terminado = ?, delegada = ?,
-            fecha_inicio = ?, plazo = ?, fecha_realizacion = ?, observaciones = ?
-        WHERE id = ?
-    ''', (
-        tarea.estado,
-        tarea.nombre,
-        tarea.compromiso,
-        tarea.terminado,
-        tarea.delegada,
-        tarea.fecha_inicio,
-        tarea.plazo,
-        tarea.fecha_realizacion,
-        tarea.observaciones,
-        tarea.id
-    ))
-    conn.commit()
-    conn.close()
-def importar_tareas_desde_excel(ruta_excel):
-    df = pd.read_excel(ruta_excel)
-
-    columnas_requeridas = [
-        'estado', 'nombre', 'compromiso', 'terminado',
-        'delegada', 'fecha_inicio', 'plazo', 'fecha_realizacion', 'observaciones'
-    ]
-    if not all(col in df.columns for col in columnas_requeridas):
-        raise ValueError("El archivo Excel no tiene todas las columnas requeridas.")
+    with transaccion(DB_NAME) as conn:
+        conn.execute(f'''
+            UPDATE tareas
+            SET {', '.join(f'{columna} = ?' for columna in COLUMNAS_DATOS)}
+            WHERE id = ?
+        ''', (*tarea.parametros(), tarea.id))
+# Columnas del formato antiguo de Excel (tareas_importar.xlsx) -> esquema unificado
+COLUMNAS_EXCEL_ANTIGUO = {
+    'nombre': 'tarea',
+    'compromiso': 'acciones',
+    'fecha_realizacion': 'fecha_termino',
+    'delegada': 'delegada_marcada'  # era un indicador 0/1, no el nombre: se descarta
+}
 
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
+def _estado_desde_terminado(bloque):
+    """Como la migración 1: 'terminado' = 1 pasa a 'Terminada'; sin estado, 'Pendiente'"""
+    if 'terminado' not in bloque.columns:
+        return bloque
+    import pandas as pd
+    bloque = bloque.copy()
+    terminada = pd.to_numeric(bloque['terminado'], errors='coerce').eq(1)
+    estado = bloque['estado'] if 'estado' in bloque.columns else pd.Series(None, index=bloque.index)
+    bloque['estado'] = estado.astype(object).where(estado.notna(), 'Pendiente').mask(terminada, 'Terminada')
+    return bloque
 
-    for _, fila in df.iterrows():
-        c.execute('''
-            INSERT INTO tareas (
-                estado, nombre, compromiso, terminado, delegada,
-                fecha_inicio, plazo, fecha_realizacion, observaciones
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            fila['estado'], fila['nombre'], fila['compromiso'], fila['terminado'],
-            fila['delegada'], fila['fecha_inicio'], fila['plazo'],
-            fila['fecha_realizacion'], fila['observaciones']
-        ))
-    conn.commit()
-    conn.close()
+@medido
+def importar_tareas_desde_excel(ruta_excel, tamano_bloque=TAMANO_BLOQUE, progreso=None):
+    """Inserta las filas de un .xlsx o .csv por bloques; devuelve un ReporteImportacion"""
+    columnas = list(COLUMNAS_DATOS)
+    # Lanza ValueError si al archivo le faltan columnas requeridas
+    with indice_para_importacion(DB_NAME, ruta_excel):
+        return importar_por_bloques(
+            DB_NAME, ruta_excel, 'tareas', columnas,
+            renombrar=COLUMNAS_EXCEL_ANTIGUO,
+            columnas_obligatorias=['estado', 'tarea', 'acciones', 'fecha_inicio', 'plazo',
+                                   'fecha_termino', 'observaciones'],
+            tamano_bloque=tamano_bloque, progreso=progreso, preparar=_estado_desde_terminado,
+            columnas_fecha=['fecha_inicio', 'plazo', 'fecha_termino'], requeridas=['tarea']
+        )
@@ -0,0 +1,121 @@
+# exportacion.py
+import csv
+import io
+import os
+from importlib.util import find_spec
+
+from conexion import obtener_conexion
+
+LOTE_EXPORTACION = 5000  # filas que se piden al cursor cada vez
+
+# formato -> (extensión, tipo MIME)
+FORMATOS = {
+    'xlsx': ('.xlsx', "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    'csv': ('.csv', "text/csv"),
+    'parquet': ('.parquet', "application/vnd.apache.parquet"),
+    'arrow': ('.arrow', "application/vnd.apache.arrow.file"),
+}
+FORMATOS_PYARROW = ('parquet', 'arrow')
+
+
+def formatos_disponibles():
+    """Formatos que se pueden generar con lo instalado (pyarrow es opcional)"""
+    hay_pyarrow = find_spec("pyarrow") is not None
+    return [formato for formato in FORMATOS if hay_pyarrow or formato not in FORMATOS_PYARROW]
+
+
+def _lotes(cursor, tamano=LOTE_EXPORTACION):
+    while True:
+        filas = cursor.fetchmany(tamano)
+        if not filas:
+            return
+        yield filas
+
+
+# =========================
+# ✍️ ESCRITORES (cursor -> archivo binario)
+# =========================
+def escribir_csv(cursor, encabezados, destino):
+    """CSV fila a fila desde el cursor; UTF-8 con BOM para que Excel respete los acentos"""
+    texto = io.TextIOWrapper(destino, encoding="utf-8-sig", newline="")
+    escritor = csv.writer(texto)
+    escritor.writerow(encabezados)
+    for filas in _lotes(cursor):
+        escritor.writerows(filas)
+    texto.flush()
+    texto.detach()  # `destino` sigue abierto para el llamador
+
+
+def escribir_xlsx(cursor, encabezados, destino):
+    """xlsx con el modo write_only de openpyxl: memoria constante, sin estilos"""
+    from openpyxl import Workbook
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet("Sheet1")
+    hoja.append(encabezados)
+    for filas in _lotes(cursor):
+        for fila in filas:
+            hoja.append(fila)
+    libro.save(destino)
+
+
+def _lotes_arrow(cursor, encabezados):
+    import pyarrow as pa
+    # 'id' es entero; el resto de columnas se guarda como texto (fechas ISO incluidas)
+    esquema = pa.schema([(nombre, pa.int64() if i == 0 else pa.string())
+                         for i, nombre in enumerate(encabezados)])
+    lotes = (
+        pa.record_batch([pa.array(col, type=campo.type) for col, campo in zip(zip(*filas), esquema)],
+                        schema=esquema)
+        for filas in _lotes(cursor)
+    )
+    return esquema, lotes
+
+
+def escribir_parquet(cursor, encabezados, destino):
+    import pyarrow.parquet as pq
+    esquema, lotes = _lotes_arrow(cursor, encabezados)
+    with pq.ParquetWriter(destino, esquema) as escritor:
+        for lote in lotes:
+            escritor.write_batch(lote)
+
+
+def escribir_arrow(cursor, encabezados, destino):
+    import pyarrow as pa
+    esquema, lotes = _lotes_arrow(cursor, encabezados)
+    with pa.ipc.new_file(destino, esquema) as escritor:
+        for lote in lotes:
+            escritor.write_batch(lote)
+
+
+ESCRITORES = {
+    'xlsx': escribir_xlsx,
+    'csv': escribir_csv,
+    'parquet': escribir_parquet,
+    'arrow': escribir_arrow,
+}
+
+
+def exportar_tareas(ruta_db, columnas, formato, destino=None, incluir_archivadas=False):
+    """Vuelca la tabla 'tareas' en `formato` sin pasar por un DataFrame.
+
+    `columnas` es el dict columna de la BD -> encabezado ('id' primero).
+    `destino` puede ser una ruta o un archivo binario; si se omite se usa un
+    BytesIO, listo para `st.download_button`. Devuelve el destino. Con
+    `incluir_archivadas` se agregan las filas de 'tareas_archivo'.
+    """
+    if formato not in ESCRITORES:
+        raise ValueError(f"Formato de exportación no soportado: {formato}")
+    if formato in FORMATOS_PYARROW and find_spec("pyarrow") is None:
+        raise ValueError(f"Para exportar a {formato} hay que instalar pyarrow")
+    lista = ', '.join(columnas)
+    origen = f"(SELECT {lista} FROM tareas UNION ALL SELECT {lista} FROM tareas_archivo)" \
+        if incluir_archivadas else "tareas"
+    cursor = obtener_conexion(ruta_db).execute(f"SELECT {lista} FROM {origen} ORDER BY id")
+    encabezados = list(columnas.values())
+    if isinstance(destino, (str, os.PathLike)):
+        with open(destino, "wb") as archivo:
+            ESCRITORES[formato](cursor, encabezados, archivo)
+        return destino
+    destino = io.BytesIO() if destino is None else destino
+    ESCRITORES[formato](cursor, encabezados, destino)
+    return destino
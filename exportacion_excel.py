@@ -0,0 +1,49 @@
+# exportacion_excel.py
+import os
+import threading
+
+from cache_tareas import leer_revision
+from exportacion import exportar_tareas
+from sincronizacion_excel import escribir_atomico
+
+
+class ExportadorExcel:
+    """Mantiene un .xlsx al día, escribiéndolo solo cuando algo cambió.
+
+    Se compara la revisión de 'revision_datos' (migración 3) con la de la última
+    exportación. Si cambió (o el archivo se tocó por fuera) se vuelve a generar
+    entero con la exportación por streaming de exportacion.py: guardar un .xlsx
+    siempre reescribe el archivo completo, así que mantener el libro en memoria
+    solo sumaba memoria proporcional a la tabla.
+    """
+
+    def __init__(self, ruta_db, ruta_excel, columnas):
+        self.ruta_db = ruta_db
+        self.ruta_excel = ruta_excel
+        self.columnas = columnas                  # dict columna de la BD -> encabezado
+        self._revision = None                     # revisión de los datos en nuestra última escritura
+        self._firma = None                        # (mtime, tamaño) tras nuestra última escritura
+        self._bloqueo = threading.Lock()
+
+    def exportar(self):
+        """Regenera el Excel si los datos cambiaron; devuelve True si lo escribió"""
+        with self._bloqueo:
+            # Se lee antes de exportar: un cambio que llegue mientras tanto sube la revisión
+            # y la próxima llamada vuelve a escribir
+            revision = leer_revision(self.ruta_db)
+            # Con la misma revisión solo se escribe si el archivo no es el que dejamos
+            # (primera exportación del proceso, o lo borraron o editaron por fuera)
+            if revision == self._revision and self._firma == self._firma_archivo():
+                return False
+            escribir_atomico(self.ruta_excel,
+                             lambda ruta: exportar_tareas(self.ruta_db, self.columnas, 'xlsx', ruta))
+            self._revision = revision
+            self._firma = self._firma_archivo()
+            return True
+
+    def _firma_archivo(self):
+        try:
+            info = os.stat(self.ruta_excel)
+        except FileNotFoundError:
+            return None
+        return (info.st_mtime_ns, info.st_size)
@@ -0,0 +1,194 @@
+# historial.py
+"""Consultas sobre tareas_historial (migración 8): cómo estaban las tareas en un momento dado.
+
+Los triggers anotan cada alta, baja y cambio (solo los campos modificados).
+El estado en un instante se obtiene aplicando en orden las entradas hasta ese
+instante; `compactar` junta las entradas anteriores al período de retención
+en una sola por tarea para que el historial no crezca sin límite.
+
+    python historial.py --en 2024-06-30 --salida tareas_al_30_de_junio.csv
+    python historial.py --compactar --dias 730
+"""
+import argparse
+import csv
+import json
+import sys
+from datetime import date, datetime, timedelta
+
+from conexion import obtener_conexion, transaccion
+from instrumentacion import medido
+from migraciones import CAMPOS_HISTORIAL
+from modelo_tarea import Tarea
+
+RETENCION_DIAS = 730        # antes de esto solo se conserva el último estado de cada tarea
+LOTE_COMPACTACION = 500     # tareas por transacción al compactar
+
+
+def instante(momento):
+    """Texto comparable con cambiado_en; una fecha sola cuenta hasta el final de ese día"""
+    if isinstance(momento, datetime):
+        return momento.isoformat(timespec="seconds")
+    if isinstance(momento, date):
+        return f"{momento.isoformat()}T23:59:59"
+    texto = str(momento).strip()
+    if len(texto) == 10:
+        return f"{date.fromisoformat(texto).isoformat()}T23:59:59"
+    return datetime.fromisoformat(texto).isoformat(timespec="seconds")
+
+
+def _aplicar(estado, operacion, cambios):
+    """Estado de la tarea (dict, o None si no existe) después de una entrada"""
+    if operacion == 'baja':
+        return None
+    datos = json.loads(cambios) if cambios else {}
+    if operacion in ('alta', 'base') or estado is None:
+        return datos
+    return {**estado, **datos}
+
+
+def _a_tarea(tarea_id, estado):
+    return Tarea(tarea_id, **{campo: estado.get(campo) for campo in CAMPOS_HISTORIAL})
+
+
+@medido
+def tareas_en(ruta, momento):
+    """Todas las tareas tal como estaban en `momento` (lista de Tarea por ID, con rev 0)"""
+    # El índice (tarea_id, cambiado_en) entrega las entradas ya agrupadas y en orden
+    cursor = obtener_conexion(ruta).execute(
+        "SELECT tarea_id, operacion, cambios FROM tareas_historial "
+        "WHERE cambiado_en <= ? ORDER BY tarea_id, cambiado_en, id",
+        (instante(momento),)
+    )
+    tareas, actual, estado = [], None, None
+    for tarea_id, operacion, cambios in cursor:
+        if tarea_id != actual:
+            if estado is not None:
+                tareas.append(_a_tarea(actual, estado))
+            actual, estado = tarea_id, None
+        estado = _aplicar(estado, operacion, cambios)
+    if estado is not None:
+        tareas.append(_a_tarea(actual, estado))
+    return tareas
+
+
+@medido
+def tarea_en(ruta, tarea_id, momento):
+    """Una tarea tal como estaba en `momento`, o None si aún no existía o ya se había eliminado"""
+    estado = None
+    for operacion, cambios in obtener_conexion(ruta).execute(
+        "SELECT operacion, cambios FROM tareas_historial "
+        "WHERE tarea_id = ? AND cambiado_en <= ? ORDER BY cambiado_en, id",
+        (tarea_id, instante(momento))
+    ):
+        estado = _aplicar(estado, operacion, cambios)
+    return _a_tarea(tarea_id, estado) if estado is not None else None
+
+
+@medido
+def historial_de(ruta, tarea_id):
+    """Entradas de una tarea, de la más antigua a la más reciente.
+
+    Cada una trae 'cambiado_en', 'operacion' y 'cambios' como {campo: (antes, después)}.
+    """
+    entradas, estado = [], None
+    for cambiado_en, operacion, cambios in obtener_conexion(ruta).execute(
+        "SELECT cambiado_en, operacion, cambios FROM tareas_historial "
+        "WHERE tarea_id = ? ORDER BY cambiado_en, id",
+        (tarea_id,)
+    ):
+        nuevo = _aplicar(estado, operacion, cambios)
+        anterior = estado or {}
+        entradas.append({
+            "cambiado_en": cambiado_en,
+            "operacion": operacion,
+            "cambios": {campo: (anterior.get(campo), valor)
+                        for campo, valor in (json.loads(cambios) if cambios else {}).items()
+                        if operacion in ('alta', 'base') or anterior.get(campo) != valor},
+        })
+        estado = nuevo
+    return entradas
+
+
+# =========================
+# 🧹 RETENCIÓN
+# =========================
+def compactar(ruta, antes_de=None, dias=RETENCION_DIAS, lote=LOTE_COMPACTACION):
+    """Junta las entradas anteriores a `antes_de` (o a hace `dias` días) en una 'base' por tarea.
+
+    La base lleva la fecha de la última entrada que reemplaza, así el estado
+    sigue siendo exacto desde ahí; antes de esa fecha la tarea no aparece.
+    Las tareas eliminadas antes del corte desaparecen del historial. Cada lote
+    de tareas va en su propia transacción para no bloquear la base mucho rato.
+    Devuelve (tareas compactadas, entradas eliminadas).
+    """
+    corte = instante(antes_de) if antes_de is not None else \
+        (datetime.now() - timedelta(days=dias)).isoformat(timespec="seconds")
+    compactadas = eliminadas = 0
+    ultimo = -1
+    while True:
+        ids = [fila[0] for fila in obtener_conexion(ruta).execute(
+            "SELECT tarea_id FROM tareas_historial WHERE tarea_id > ? AND cambiado_en <= ? "
+            "GROUP BY tarea_id HAVING COUNT(*) > 1 OR MAX(operacion = 'baja') "
+            "ORDER BY tarea_id LIMIT ?",
+            (ultimo, corte, lote)
+        )]
+        if not ids:
+            break
+        with transaccion(ruta) as conn:
+            for tarea_id in ids:
+                estado, fecha = None, None
+                for cambiado_en, operacion, cambios in conn.execute(
+                    "SELECT cambiado_en, operacion, cambios FROM tareas_historial "
+                    "WHERE tarea_id = ? AND cambiado_en <= ? ORDER BY cambiado_en, id",
+                    (tarea_id, corte)
+                ):
+                    estado = _aplicar(estado, operacion, cambios)
+                    fecha = cambiado_en  # la base toma la fecha de la última entrada
+                eliminadas += conn.execute(
+                    "DELETE FROM tareas_historial WHERE tarea_id = ? AND cambiado_en <= ?", (tarea_id, corte)
+                ).rowcount
+                if estado is not None:
+                    conn.execute(
+                        "INSERT INTO tareas_historial (tarea_id, cambiado_en, operacion, cambios) "
+                        "VALUES (?, ?, 'base', ?)",
+                        (tarea_id, fecha, json.dumps(estado, ensure_ascii=False))
+                    )
+                    eliminadas -= 1
+        compactadas += len(ids)
+        ultimo = ids[-1]
+    print(f"[historial] {ruta}: {compactadas} tareas compactadas hasta {corte}, {eliminadas} entradas menos")
+    return compactadas, eliminadas
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Historial de tareas: estado en una fecha y compactación")
+    parser.add_argument("--db", default="tareas.db")
+    parser.add_argument("--en", help="fecha u hora (ISO) cuyo estado se quiere reconstruir")
+    parser.add_argument("--salida", help="CSV donde guardar el estado reconstruido (por defecto, pantalla)")
+    parser.add_argument("--compactar", action="store_true", help="aplicar la retención del historial")
+    parser.add_argument("--dias", type=int, default=RETENCION_DIAS)
+    opciones = parser.parse_args(argumentos)
+    if not opciones.en and not opciones.compactar:
+        parser.error("indique --en o --compactar")
+
+    from migraciones import asegurar_esquema
+    asegurar_esquema(opciones.db)
+    if opciones.compactar:
+        compactar(opciones.db, dias=opciones.dias)
+    if opciones.en:
+        columnas = ('id',) + CAMPOS_HISTORIAL
+        filas = [tarea.parametros(columnas) for tarea in tareas_en(opciones.db, opciones.en)]
+        if opciones.salida:
+            with open(opciones.salida, "w", newline="", encoding="utf-8-sig") as archivo:
+                escritor = csv.writer(archivo)
+                escritor.writerow(columnas)
+                escritor.writerows(filas)
+            print(f"[historial] {len(filas)} tareas al {instante(opciones.en)} guardadas en {opciones.salida}")
+        else:
+            for fila in filas:
+                print(" | ".join("" if valor is None else str(valor) for valor in fila))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
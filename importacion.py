@@ -0,0 +1,368 @@
+# importacion.py
+import json
+import os
+from dataclasses import dataclass, field
+from datetime import date, datetime
+
+import pandas as pd
+
+from conexion import transaccion
+from modelo_tarea import huella
+
+FORMATO_FECHA = "%Y-%m-%d"
+# Formatos de texto que se aceptan como fecha al importar o migrar
+FORMATOS_ACEPTADOS = (FORMATO_FECHA, "%Y-%m-%d %H:%M:%S", "%d-%m-%Y", "%d/%m/%Y", "%Y/%m/%d")
+TAMANO_BLOQUE = 1000  # filas por bloque en la importación por streaming
+
+
+@dataclass
+class ReporteImportacion:
+    """Resultado detallado de una importación (filas numeradas como en el Excel)"""
+    insertadas: int = 0
+    actualizadas: int = 0
+    sin_cambios: int = 0                           # ya estaban iguales: no se escriben
+    omitidas: list = field(default_factory=list)   # [(fila, motivo)]
+    invalidas: list = field(default_factory=list)  # [(fila, motivo)]
+
+    @property
+    def total_escritas(self):
+        return self.insertadas + self.actualizadas
+
+    def resumen(self):
+        return (f"{self.insertadas} nuevas, {self.actualizadas} actualizadas, {self.sin_cambios} sin cambios, "
+                f"{len(self.omitidas)} omitidas, {len(self.invalidas)} inválidas")
+
+
+def fecha_iso(valor):
+    """'YYYY-MM-DD' para una fecha o un texto reconocible; None si está vacío o no se entiende"""
+    if valor is None or (not isinstance(valor, str) and pd.isna(valor)):
+        return None
+    if isinstance(valor, date):
+        return valor.strftime(FORMATO_FECHA)
+    texto = str(valor).strip()
+    for formato in FORMATOS_ACEPTADOS:
+        try:
+            return datetime.strptime(texto, formato).strftime(FORMATO_FECHA)
+        except ValueError:
+            continue
+    return None
+
+
+def normalizar_fechas(serie):
+    """Convierte una columna a texto 'YYYY-MM-DD' sin recorrer fila a fila.
+
+    Devuelve (serie_normalizada, invalidas): `invalidas` marca los valores no vacíos
+    que no se pudieron interpretar como fecha (quedan en None).
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        normalizada = serie.dt.strftime(FORMATO_FECHA).astype(object).where(serie.notna(), None)
+        return normalizada, pd.Series(False, index=serie.index)
+    # Camino rápido vectorizado: objetos fecha y texto ya en ISO
+    fechas = pd.to_datetime(serie, format=FORMATO_FECHA, errors="coerce")
+    normalizada = fechas.dt.strftime(FORMATO_FECHA).astype(object).where(fechas.notna(), None)
+    vacias = serie.isna() | serie.map(lambda v: isinstance(v, str) and not v.strip())
+    pendientes = fechas.isna() & ~vacias
+    if pendientes.any():
+        # Solo los formatos alternativos (dd-mm-aaaa, con hora, ...) se revisan uno a uno
+        normalizada[pendientes] = serie[pendientes].map(fecha_iso)
+    return normalizada, pendientes & normalizada.isna()
+
+
+def normalizar(df, columnas_fecha=()):
+    """Normaliza fechas y nulos por columna.
+
+    Devuelve el DataFrame de objetos Python y un dict columna -> máscara de fechas inválidas.
+    """
+    df = df.copy()
+    invalidas = {}
+    for col in columnas_fecha:
+        if col in df.columns:
+            df[col], invalidas[col] = normalizar_fechas(df[col])
+    df = df.astype(object)
+    return df.where(df.notna(), None), invalidas
+
+
+def _ids_existentes(conn, tabla, columna_id, ids):
+    if not ids:
+        return set()
+    cursor = conn.execute(
+        f"SELECT {columna_id} FROM {tabla} WHERE {columna_id} IN (SELECT value FROM json_each(?))",
+        (pd.Series(ids).to_json(orient="values"),),
+    )
+    return {fila[0] for fila in cursor}
+
+
+def _ids_por_clave(conn, tabla, columna_id, clave_natural, claves):
+    """{posición en `claves`: [IDs de `tabla` con esos mismos valores]}"""
+    condiciones = " AND ".join(f"t.{col} IS json_extract(c.value, '$[{i}]')"
+                               for i, col in enumerate(clave_natural))
+    coincidencias = {}
+    for posicion, id_fila in conn.execute(
+        f"SELECT c.key, t.{columna_id} FROM json_each(?) AS c JOIN {tabla} AS t ON {condiciones}",
+        (json.dumps(claves, default=str),),
+    ):
+        coincidencias.setdefault(posicion, []).append(id_fila)
+    return coincidencias
+
+
+def _resolver_clave_natural(conn, df, ids, candidatas, tablas, columna_id, clave_natural):
+    """Completa el ID de las filas que no lo traen buscándolas por `clave_natural` en `tablas`.
+
+    Devuelve (ids, repetidas en el archivo, ambiguas); las que no coinciden
+    con ninguna fila quedan sin ID y se insertan.
+    """
+    ids = ids.copy()
+    ambiguas = pd.Series(False, index=df.index)
+    sin_id = candidatas & ids.isna()
+    if not sin_id.any():
+        return ids, ambiguas.copy(), ambiguas
+    columnas_clave = list(clave_natural)
+    repetidas = df.loc[sin_id, columnas_clave].duplicated(keep="last").reindex(df.index, fill_value=False)
+    claves = df.loc[sin_id & ~repetidas, columnas_clave]
+    coincidencias = {}
+    for tabla in tablas:
+        for posicion, encontrados in _ids_por_clave(conn, tabla, columna_id, columnas_clave,
+                                                    claves.values.tolist()).items():
+            coincidencias.setdefault(posicion, []).extend(encontrados)
+    for posicion, encontrados in coincidencias.items():
+        if len(encontrados) == 1:
+            ids[claves.index[posicion]] = encontrados[0]
+        else:
+            ambiguas[claves.index[posicion]] = True
+    return ids, repetidas, ambiguas
+
+
+def _huellas_actuales(conn, tabla, columna_id, columnas, tabla_huellas, ids):
+    """{id: huella del contenido guardado}; si falta la guardada, se calcula de la fila"""
+    if not ids:
+        return {}
+    cursor = conn.execute(
+        f"SELECT t.{columna_id}, h.huella, {', '.join(f't.{col}' for col in columnas)} "
+        f"FROM {tabla} AS t LEFT JOIN {tabla_huellas} AS h ON h.id = t.{columna_id} "
+        f"WHERE t.{columna_id} IN (SELECT value FROM json_each(?))",
+        (pd.Series(ids).to_json(orient="values"),),
+    )
+    return {fila[0]: fila[1] or huella(fila[2:]) for fila in cursor}
+
+
+def _aplicar_con_huellas(conn, df, ids, es_actualizacion, es_insercion, huellas,
+                         tabla, columnas, columna_id, tabla_huellas):
+    """Altas y cambios en un solo INSERT ... ON CONFLICT DO UPDATE, y sus huellas"""
+    escribir = es_actualizacion | es_insercion
+    # Con la transacción de escritura abierta, las altas reciben IDs crecientes sobre el máximo actual
+    ultimo = conn.execute(f"SELECT COALESCE(MAX({columna_id}), 0) FROM {tabla}").fetchone()[0]
+    marcadores = ", ".join("?" for _ in columnas)
+    asignaciones = ", ".join(f"{col} = excluded.{col}" for col in columnas)
+    conn.executemany(
+        f"INSERT INTO {tabla} ({columna_id}, {', '.join(columnas)}) VALUES (?, {marcadores}) "
+        f"ON CONFLICT ({columna_id}) DO UPDATE SET {asignaciones}",
+        ((int(id_fila) if actualiza else None, *valores)
+         for id_fila, actualiza, valores in zip(ids[escribir], es_actualizacion[escribir],
+                                                df.loc[escribir, columnas].itertuples(index=False, name=None))),
+    )
+    escritos = ids[escribir].where(es_actualizacion[escribir])
+    if es_insercion.any():
+        escritos[es_insercion[escribir]] = [fila[0] for fila in conn.execute(
+            f"SELECT {columna_id} FROM {tabla} WHERE {columna_id} > ? ORDER BY {columna_id}", (ultimo,)
+        )]
+    # Después del INSERT: el trigger de la tabla borra la huella de las filas que cambian
+    conn.executemany(
+        f"INSERT OR REPLACE INTO {tabla_huellas} (id, huella) VALUES (?, ?)",
+        zip(escritos.map(int), huellas[escribir]),
+    )
+
+
+def importar_dataframe(conn, df, tabla, columnas, columna_id=None, columnas_fecha=(),
+                       requeridas=(), fila_inicial=2, reporte=None,
+                       clave_natural=(), tabla_huellas=None, tabla_archivo=None):
+    """Valida, separa en altas/actualizaciones y aplica todo con executemany.
+
+    `df` debe venir con los nombres de columna de la tabla. Se ejecuta sobre
+    `conn` sin confirmar: el llamador decide el alcance de la transacción.
+
+    Con `tabla_huellas` (requiere `columna_id`) la importación es idempotente:
+    las filas cuyo contenido coincide con la huella guardada no se escriben,
+    las sin ID se buscan por `clave_natural` (también en `tabla_archivo`) y
+    las que tienen o resuelven un ID archivado se omiten.
+    """
+    reporte = reporte or ReporteImportacion()
+    df, fechas_invalidas = normalizar(
+        df.reindex(columns=([columna_id] if columna_id else []) + list(columnas)), columnas_fecha
+    )
+    numeros_fila = pd.Series(range(fila_inicial, fila_inicial + len(df)), index=df.index)
+
+    en_blanco = df.isna().all(axis=1)
+    for fila in numeros_fila[en_blanco]:
+        reporte.omitidas.append((fila, "Fila vacía"))
+    validas = ~en_blanco
+    for col in requeridas:
+        vacias = df[col].map(lambda v: v is None or str(v).strip() == "")
+        for fila in numeros_fila[vacias & validas]:
+            reporte.invalidas.append((fila, f"Columna '{col}' vacía"))
+        validas &= ~vacias
+    for col, invalidas in fechas_invalidas.items():
+        for fila in numeros_fila[invalidas & validas]:
+            reporte.invalidas.append((fila, f"Fecha inválida en '{col}'"))
+        validas &= ~invalidas
+
+    if columna_id:
+        ids = pd.to_numeric(df[columna_id], errors="coerce")
+        no_numericos = df[columna_id].notna() & (ids.isna() | (ids % 1 != 0))
+        for fila in numeros_fila[no_numericos & validas]:
+            reporte.invalidas.append((fila, "ID no numérico"))
+        validas &= ~no_numericos
+
+        if clave_natural:
+            # Una tarea archivada también cuenta: si no, reimportar una planilla vieja la duplicaría
+            tablas = [tabla, tabla_archivo] if tabla_archivo else [tabla]
+            ids, repetidas, ambiguas = _resolver_clave_natural(conn, df, ids, validas, tablas,
+                                                               columna_id, clave_natural)
+            for fila in numeros_fila[repetidas]:
+                reporte.omitidas.append((fila, "Fila repetida en el archivo (se usa la última aparición)"))
+            for fila in numeros_fila[ambiguas]:
+                reporte.omitidas.append((fila, f"Coincide con varias filas ({', '.join(clave_natural)}); indique el ID"))
+            validas &= ~(repetidas | ambiguas)
+
+        con_id = validas & ids.notna()
+        duplicadas = con_id & ids.duplicated(keep="last")
+        for fila in numeros_fila[duplicadas]:
+            reporte.omitidas.append((fila, "ID repetido en el archivo (se usa la última aparición)"))
+        validas &= ~duplicadas
+
+        if tabla_archivo:
+            archivadas = validas & ids.isin(_ids_existentes(
+                conn, tabla_archivo, columna_id, ids[validas & ids.notna()].astype(int).tolist()))
+            for fila in numeros_fila[archivadas]:
+                reporte.omitidas.append((fila, "Tarea archivada: restáurela antes de importarla"))
+            validas &= ~archivadas
+
+        ids_validos = ids[validas & ids.notna()].astype(int).tolist()
+        if tabla_huellas:
+            actuales = _huellas_actuales(conn, tabla, columna_id, columnas, tabla_huellas, ids_validos)
+            existentes = set(actuales)
+        else:
+            existentes = _ids_existentes(conn, tabla, columna_id, ids_validos)
+        es_actualizacion = validas & ids.isin(existentes)
+        df[columna_id] = ids.astype(object).where(ids.notna(), None)
+    else:
+        es_actualizacion = pd.Series(False, index=df.index)
+    es_insercion = validas & ~es_actualizacion
+
+    columnas = list(columnas)
+    if tabla_huellas:
+        huellas = pd.Series(
+            [huella(valores) for valores in df.loc[validas, columnas].itertuples(index=False, name=None)],
+            index=df.index[validas], dtype=object,
+        ).reindex(df.index)
+        sin_cambios = es_actualizacion & (huellas == ids.map(actuales))
+        reporte.sin_cambios += int(sin_cambios.sum())
+        es_actualizacion &= ~sin_cambios
+        if es_actualizacion.any() or es_insercion.any():
+            _aplicar_con_huellas(conn, df, ids, es_actualizacion, es_insercion, huellas,
+                                 tabla, columnas, columna_id, tabla_huellas)
+        reporte.actualizadas += int(es_actualizacion.sum())
+        reporte.insertadas += int(es_insercion.sum())
+        return reporte
+
+    if es_actualizacion.any():
+        asignaciones = ", ".join(f"{col} = ?" for col in columnas)
+        filas = df.loc[es_actualizacion, columnas + [columna_id]].copy()
+        filas[columna_id] = filas[columna_id].map(int)
+        conn.executemany(
+            f"UPDATE {tabla} SET {asignaciones} WHERE {columna_id} = ?",
+            filas.itertuples(index=False, name=None),
+        )
+        reporte.actualizadas += int(es_actualizacion.sum())
+    if es_insercion.any():
+        marcadores = ", ".join("?" for _ in columnas)
+        conn.executemany(
+            f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES ({marcadores})",
+            df.loc[es_insercion, columnas].itertuples(index=False, name=None),
+        )
+        reporte.insertadas += int(es_insercion.sum())
+    return reporte
+
+
+# =========================
+# 📥 IMPORTACIÓN POR BLOQUES (memoria acotada)
+# =========================
+def es_csv(ruta):
+    return os.path.splitext(str(ruta))[1].lower() == ".csv"
+
+
+def estimar_filas(ruta):
+    """Número aproximado de filas de datos, sin cargar el archivo (None si no se sabe)"""
+    if es_csv(ruta):
+        lineas = 0
+        with open(ruta, "rb") as f:
+            for trozo in iter(lambda: f.read(1 << 20), b""):
+                lineas += trozo.count(b"\n")
+        return max(lineas - 1, 0)
+    from openpyxl import load_workbook
+    libro = load_workbook(ruta, read_only=True)
+    try:
+        max_fila = libro.active.max_row
+        return max(max_fila - 1, 0) if max_fila else None
+    finally:
+        libro.close()
+
+
+def _bloques_xlsx(ruta, tamano_bloque):
+    from openpyxl import load_workbook
+    libro = load_workbook(ruta, read_only=True, data_only=True)
+    try:
+        filas = libro.active.iter_rows(values_only=True)
+        encabezado = next(filas, None)
+        if encabezado is None:
+            return
+        encabezado = [str(c) if c is not None else f"_col{i}" for i, c in enumerate(encabezado)]
+        ancho = len(encabezado)
+        bloque = []
+        for fila in filas:
+            # En modo solo lectura las filas pueden venir recortadas a la derecha
+            bloque.append(fila[:ancho] + (None,) * (ancho - len(fila)))
+            if len(bloque) == tamano_bloque:
+                yield pd.DataFrame(bloque, columns=encabezado)
+                bloque = []
+        if bloque:
+            yield pd.DataFrame(bloque, columns=encabezado)
+    finally:
+        libro.close()
+
+
+def leer_por_bloques(ruta, tamano_bloque=TAMANO_BLOQUE):
+    """Genera DataFrames de a lo más `tamano_bloque` filas desde un .xlsx o .csv"""
+    if es_csv(ruta):
+        yield from pd.read_csv(ruta, chunksize=tamano_bloque)
+    else:
+        yield from _bloques_xlsx(ruta, tamano_bloque)
+
+
+def importar_por_bloques(ruta_db, ruta, tabla, columnas, renombrar=None,
+                         columnas_obligatorias=(), tamano_bloque=TAMANO_BLOQUE,
+                         progreso=None, preparar=None, **opciones):
+    """Importa `ruta` bloque a bloque, confirmando cada bloque por separado.
+
+    La memoria usada depende de `tamano_bloque` y no del tamaño del archivo.
+    `progreso(filas_leidas, total_estimado)` se llama tras cada bloque.
+    `preparar(bloque)`, si se da, ajusta cada bloque ya renombrado y devuelve el DataFrame.
+    `opciones` se pasan a `importar_dataframe` (columna_id, columnas_fecha, ...).
+    """
+    reporte = ReporteImportacion()
+    total = estimar_filas(ruta) if progreso else None
+    fila_inicial = 2
+    for bloque in leer_por_bloques(ruta, tamano_bloque):
+        if renombrar:
+            bloque = bloque.rename(columns=renombrar)
+        if preparar:
+            bloque = preparar(bloque)
+        faltantes = [col for col in columnas_obligatorias if col not in bloque.columns]
+        if faltantes:
+            raise ValueError(f"Faltan columnas requeridas: {', '.join(faltantes)}")
+        with transaccion(ruta_db) as conn:
+            importar_dataframe(conn, bloque, tabla, columnas, fila_inicial=fila_inicial,
+                               reporte=reporte, **opciones)
+        fila_inicial += len(bloque)
+        if progreso:
+            progreso(fila_inicial - 2, total)
+    return reporte
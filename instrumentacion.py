@@ -0,0 +1,197 @@
+# instrumentacion.py
+import io
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import wraps
+
+MAX_EJECUCIONES = 50  # ejecuciones que se guardan para el panel de administración
+VARIABLE_PERFIL = "TAREAS_PERFIL"  # si vale 1, cada ejecución se perfila con cProfile
+LINEAS_PERFIL = 30
+MAX_SENTENCIAS = 1000  # textos distintos que se acumulan antes de agruparlos por forma
+
+_local = threading.local()
+_bloqueo = threading.Lock()
+_ejecuciones = deque(maxlen=MAX_EJECUCIONES)
+
+_LITERAL_TEXTO = re.compile(r"'(?:[^']|'')*'")
+_LITERAL_NUMERO = re.compile(r"\b\d+(?:\.\d+)?\b")
+
+
+@dataclass
+class Ejecucion:
+    """Tiempos de una ejecución del script (un rerun) o de una tarea en segundo plano"""
+    etiqueta: str
+    hilo: str
+    inicio: datetime = field(default_factory=datetime.now)
+    duracion: float = 0.0
+    spans: list = field(default_factory=list)       # [(desde, nombre, profundidad, duración, consultas)]
+    consultas: Counter = field(default_factory=Counter)
+    total_consultas: int = 0
+    perfil: str = None
+    error: str = None
+
+    def a_dict(self):
+        return {
+            "etiqueta": self.etiqueta,
+            "hilo": self.hilo,
+            "inicio": self.inicio.isoformat(timespec="milliseconds"),
+            "duracion_ms": round(self.duracion * 1000, 2),
+            "total_consultas": self.total_consultas,
+            "spans": [
+                {"nombre": nombre, "profundidad": profundidad, "desde_ms": round(desde * 1000, 2),
+                 "duracion_ms": round(duracion * 1000, 2), "consultas": consultas}
+                for desde, nombre, profundidad, duracion, consultas in sorted(self.spans)
+            ],
+            "consultas": dict(agrupar_por_forma(self.consultas).most_common()),
+            "perfil": self.perfil,
+            "error": self.error,
+        }
+
+
+def _actual():
+    return getattr(_local, "ejecucion", None)
+
+
+@contextmanager
+def ejecucion(etiqueta, contar_consultas=False):
+    """Registra todo lo medido dentro del bloque como una ejecución.
+
+    Las ejecuciones anidadas se integran a la exterior. Las sentencias SQL solo
+    se cuentan con `contar_consultas` o con la variable de entorno TAREAS_PERFIL=1,
+    que además guarda un resumen de cProfile: el callback de traza se paga en
+    cada sentencia.
+    """
+    if _actual() is not None:
+        with medir(etiqueta):
+            yield _actual()
+        return
+    registro = Ejecucion(etiqueta, threading.current_thread().name)
+    perfilar = os.environ.get(VARIABLE_PERFIL) == "1"
+    _local.ejecucion = registro
+    _local.profundidad = 0
+    _local.fase = None
+    # Conexiones a las que se instaló el callback; None si esta ejecución no cuenta
+    _local.trazadas = set() if contar_consultas or perfilar else None
+    perfilador = None
+    if perfilar:
+        import cProfile
+        perfilador = cProfile.Profile()
+        perfilador.enable()
+    inicio = time.perf_counter()
+    _local.inicio = inicio
+    try:
+        yield registro
+    except Exception as e:
+        registro.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        # st.rerun() y st.stop() terminan el script con excepciones propias: se registra igual
+        _cerrar_fase()
+        registro.duracion = time.perf_counter() - inicio
+        if perfilador:
+            perfilador.disable()
+            registro.perfil = _resumen_perfil(perfilador)
+        for conn in _local.trazadas or ():
+            try:
+                conn.set_trace_callback(None)
+            except sqlite3.ProgrammingError:
+                pass  # se cerró durante la ejecución
+        _local.trazadas = None
+        _local.ejecucion = None
+        with _bloqueo:
+            _ejecuciones.append(registro)
+
+
+def _resumen_perfil(perfilador):
+    import pstats
+    salida = io.StringIO()
+    pstats.Stats(perfilador, stream=salida).sort_stats("cumulative").print_stats(LINEAS_PERFIL)
+    return salida.getvalue()
+
+
+@contextmanager
+def medir(nombre):
+    """Span con nombre: duración y consultas SQL ejecutadas dentro del bloque"""
+    registro = _actual()
+    if registro is None:
+        yield
+        return
+    profundidad = _local.profundidad
+    _local.profundidad += 1
+    consultas_antes = registro.total_consultas
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        fin = time.perf_counter()
+        _local.profundidad = profundidad
+        registro.spans.append((inicio - _local.inicio, nombre, profundidad, fin - inicio,
+                               registro.total_consultas - consultas_antes))
+
+
+def medido(funcion):
+    """Decorador: mide cada llamada a `funcion` como un span con su nombre"""
+    @wraps(funcion)
+    def envoltura(*args, **kwargs):
+        with medir(funcion.__name__):
+            return funcion(*args, **kwargs)
+    return envoltura
+
+
+def fase(nombre):
+    """Cierra la fase anterior y abre `nombre` (evita anidar bloques largos en main)"""
+    if _actual() is None:
+        return
+    _cerrar_fase()
+    contexto = medir(f"fase: {nombre}")
+    contexto.__enter__()
+    _local.fase = contexto
+
+
+def _cerrar_fase():
+    contexto = getattr(_local, "fase", None)
+    if contexto is not None:
+        _local.fase = None
+        contexto.__exit__(None, None, None)
+
+
+def trazar(conn):
+    """Instala el contador de sentencias en `conn` si la ejecución del hilo las cuenta"""
+    trazadas = getattr(_local, "trazadas", None)
+    if trazadas is not None and conn not in trazadas:
+        conn.set_trace_callback(registrar_sentencia)
+        trazadas.add(conn)
+
+
+def registrar_sentencia(sentencia):
+    """Callback para `Connection.set_trace_callback`: guarda el texto tal cual llega"""
+    registro = _actual()
+    if registro is None:
+        return
+    registro.total_consultas += 1
+    registro.consultas[sentencia] += 1
+    # Cada executemany trae los valores expandidos: sin este tope la memoria crece por fila
+    if len(registro.consultas) > MAX_SENTENCIAS:
+        registro.consultas = agrupar_por_forma(registro.consultas)
+
+
+def agrupar_por_forma(consultas):
+    """Suma las sentencias que solo difieren en los valores literales"""
+    formas = Counter()
+    for sentencia, veces in consultas.items():
+        forma = _LITERAL_NUMERO.sub("?", _LITERAL_TEXTO.sub("?", " ".join(sentencia.split())))
+        formas[forma[:200]] += veces
+    return formas
+
+
+def ultimas_ejecuciones():
+    """Copia de las últimas ejecuciones registradas, de la más reciente a la más antigua"""
+    with _bloqueo:
+        return list(reversed(_ejecuciones))
@@ -0,0 +1,550 @@
+# migraciones.py
+import threading
+from datetime import datetime
+
+from conexion import obtener_conexion, transaccion
+from modelo_tarea import huella
+
+COLUMNAS_FECHA = ['fecha_inicio', 'plazo', 'fecha_termino']
+LOTE_MIGRACION = 500  # filas por transacción al normalizar fechas
+
+_bloqueo = threading.Lock()
+_bases_migradas = set()
+
+
+# =========================
+# Pasos de migración
+# =========================
+ESQUEMA_TAREAS_V0 = '''
+    CREATE TABLE IF NOT EXISTS tareas (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        tarea TEXT NOT NULL,
+        acciones TEXT,
+        fecha_inicio TEXT,
+        plazo TEXT,
+        observaciones TEXT,
+        estado TEXT DEFAULT 'Pendiente',
+        delegada TEXT,
+        fecha_termino TEXT
+    )
+'''
+
+# Esquemas heredados -> SELECT que los lleva al esquema unificado
+_COPIA_ESQUEMA_APP = '''
+    SELECT id, nombre, descripcion, NULL, NULL, NULL, estado, responsable, NULL
+    FROM tareas
+'''
+_COPIA_ESQUEMA_DB = '''
+    SELECT id, COALESCE(nombre, ''), compromiso, fecha_inicio, plazo, observaciones,
+           CASE WHEN terminado = 1 THEN 'Terminada' ELSE COALESCE(estado, 'Pendiente') END,
+           CASE WHEN typeof(delegada) = 'text' THEN delegada END,
+           fecha_realizacion
+    FROM tareas
+'''
+
+
+def _migracion_1_unificar(conn):
+    """Crea 'tareas' o convierte los esquemas antiguos (app.py y db.py) al unificado"""
+    conn.execute(ESQUEMA_TAREAS_V0)
+    columnas = [col[1] for col in conn.execute("PRAGMA table_info(tareas)").fetchall()]
+
+    if 'nombre' in columnas:
+        copia = _COPIA_ESQUEMA_DB if 'compromiso' in columnas else _COPIA_ESQUEMA_APP
+        conn.execute(ESQUEMA_TAREAS_V0.replace("tareas", "tareas_nueva", 1))
+        conn.execute(f'''
+            INSERT INTO tareas_nueva (id, tarea, acciones, fecha_inicio, plazo, observaciones,
+                                      estado, delegada, fecha_termino)
+            {copia}
+        ''')
+        conn.execute("DROP TABLE tareas")
+        conn.execute("ALTER TABLE tareas_nueva RENAME TO tareas")
+        print("[migraciones] Esquema de 'tareas' convertido al formato unificado.")
+
+    # Asegurarse de que la columna fecha_termino exista
+    if 'nombre' not in columnas and 'fecha_termino' not in columnas:
+        conn.execute("ALTER TABLE tareas ADD COLUMN fecha_termino TEXT")
+
+
+def _normalizar_fechas_por_lotes(ruta):
+    """Reescribe las fechas a 'YYYY-MM-DD' en lotes cortos para no bloquear la base.
+
+    Las fechas ilegibles quedan en NULL y su texto original se anota en observaciones.
+    """
+    from importacion import fecha_iso  # importa pandas: solo cuando hay que migrar
+    no_canonica = " OR ".join(f"({col} IS NOT NULL AND date({col}, '+0 days') IS NOT {col})"
+                              for col in COLUMNAS_FECHA)
+    ultimo_id = 0
+    while True:
+        filas = obtener_conexion(ruta).execute(
+            f"SELECT id, {', '.join(COLUMNAS_FECHA)}, observaciones FROM tareas "
+            f"WHERE id > ? AND ({no_canonica}) ORDER BY id LIMIT ?",
+            (ultimo_id, LOTE_MIGRACION)
+        ).fetchall()
+        if not filas:
+            break
+        cambios = []
+        for id_tarea, *fechas, observaciones in filas:
+            normalizadas = []
+            for col, valor in zip(COLUMNAS_FECHA, fechas):
+                iso = fecha_iso(valor)
+                if iso is None and valor is not None and str(valor).strip():
+                    observaciones = f"{observaciones or ''} [{col} original: {valor}]".strip()
+                normalizadas.append(iso)
+            cambios.append((*normalizadas, observaciones, id_tarea))
+        with transaccion(ruta) as conn:
+            conn.executemany(
+                f"UPDATE tareas SET {', '.join(f'{col} = ?' for col in COLUMNAS_FECHA)}, observaciones = ? "
+                "WHERE id = ?",
+                cambios
+            )
+        ultimo_id = filas[-1][0]
+
+
+def _migracion_2_fechas_e_indices(conn):
+    """Reconstruye 'tareas' con CHECK de fechas ISO y crea los índices del listado"""
+    secuencia = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'tareas'").fetchone()
+    # '+0 days' normaliza fechas imposibles (2024-02-30 -> 2024-03-01), así el CHECK las rechaza
+    checks = ",\n            ".join(f"CHECK ({col} IS NULL OR date({col}, '+0 days') = {col})"
+                                   for col in COLUMNAS_FECHA)
+    conn.execute(f'''
+        CREATE TABLE tareas_nueva (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tarea TEXT NOT NULL,
+            acciones TEXT,
+            fecha_inicio TEXT,
+            plazo TEXT,
+            observaciones TEXT,
+            estado TEXT DEFAULT 'Pendiente',
+            delegada TEXT,
+            fecha_termino TEXT,
+            {checks}
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO tareas_nueva (id, tarea, acciones, fecha_inicio, plazo, observaciones,
+                                  estado, delegada, fecha_termino)
+        SELECT id, tarea, acciones, fecha_inicio, plazo, observaciones,
+               estado, delegada, fecha_termino
+        FROM tareas
+    ''')
+    conn.execute("DROP TABLE tareas")
+    conn.execute("ALTER TABLE tareas_nueva RENAME TO tareas")
+    if secuencia:
+        # Conservar el contador de AUTOINCREMENT para no reutilizar IDs borrados
+        conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'tareas'", secuencia)
+    # (estado, plazo) también cubre las búsquedas solo por estado
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tareas_estado_plazo ON tareas (estado, plazo)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tareas_delegada ON tareas (delegada)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tareas_plazo ON tareas (plazo)")
+
+
+def _migracion_3_revision(conn):
+    """Contador global de revisión que los triggers incrementan en cada escritura"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS revision_datos (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            valor INTEGER NOT NULL
+        )
+    ''')
+    conn.execute("INSERT OR IGNORE INTO revision_datos (id, valor) VALUES (1, 0)")
+    for operacion in ("INSERT", "UPDATE", "DELETE"):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS tareas_revision_{operacion.lower()}
+            AFTER {operacion} ON tareas
+            BEGIN
+                UPDATE revision_datos SET valor = valor + 1 WHERE id = 1;
+            END
+        ''')
+
+
+def _migracion_4_registro_cambios(conn):
+    """Registro de filas cambiadas para la exportación incremental a Excel"""
+    # REPLACE reinserta la fila con una secuencia nueva: queda solo el último cambio por ID
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tareas_cambios (
+            secuencia INTEGER PRIMARY KEY AUTOINCREMENT,
+            tarea_id INTEGER NOT NULL UNIQUE
+        )
+    ''')
+    for operacion, fila in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS tareas_cambios_{operacion.lower()}
+            AFTER {operacion} ON tareas
+            BEGIN
+                INSERT OR REPLACE INTO tareas_cambios (tarea_id) VALUES ({fila}.id);
+            END
+        ''')
+
+
+def _migracion_5_busqueda(conn):
+    """Índice FTS5 de texto completo sobre 'tareas', sincronizado por triggers"""
+    # Mientras una importación masiva tenga su nombre aquí, los triggers no hacen nada
+    # y el índice se reconstruye entero al final (ver busqueda.indice_suspendido)
+    conn.execute("CREATE TABLE IF NOT EXISTS indices_suspendidos (nombre TEXT PRIMARY KEY)")
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS tareas_fts USING fts5(
+            tarea, acciones, observaciones, delegada,
+            content='tareas', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+    ''')
+    activo = "NOT EXISTS (SELECT 1 FROM indices_suspendidos WHERE nombre = 'tareas_fts')"
+    columnas = "tarea, acciones, observaciones, delegada"
+    nuevos = "NEW.id, NEW.tarea, NEW.acciones, NEW.observaciones, NEW.delegada"
+    viejos = "'delete', OLD.id, OLD.tarea, OLD.acciones, OLD.observaciones, OLD.delegada"
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS tareas_fts_insert AFTER INSERT ON tareas WHEN {activo}
+        BEGIN
+            INSERT INTO tareas_fts (rowid, {columnas}) VALUES ({nuevos});
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS tareas_fts_delete AFTER DELETE ON tareas WHEN {activo}
+        BEGIN
+            INSERT INTO tareas_fts (tareas_fts, rowid, {columnas}) VALUES ({viejos});
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS tareas_fts_update AFTER UPDATE OF {columnas} ON tareas WHEN {activo}
+        BEGIN
+            INSERT INTO tareas_fts (tareas_fts, rowid, {columnas}) VALUES ({viejos});
+            INSERT INTO tareas_fts (rowid, {columnas}) VALUES ({nuevos});
+        END
+    ''')
+    conn.execute("INSERT INTO tareas_fts (tareas_fts) VALUES ('rebuild')")
+
+
+def _sumar_al_resumen(fila):
+    """Cuerpo de trigger: suma la fila NEW/OLD a las tablas de resumen"""
+    return f'''
+        INSERT INTO resumen_estado (estado, cantidad) VALUES (COALESCE({fila}.estado, ''), 1)
+        ON CONFLICT (estado) DO UPDATE SET cantidad = cantidad + 1;
+        INSERT INTO resumen_delegada (delegada, abiertas, terminadas)
+        VALUES (COALESCE({fila}.delegada, ''), {fila}.estado IS NOT 'Terminada', {fila}.estado IS 'Terminada')
+        ON CONFLICT (delegada) DO UPDATE SET abiertas = abiertas + excluded.abiertas,
+                                             terminadas = terminadas + excluded.terminadas;
+        INSERT INTO resumen_plazo (plazo, abiertas)
+        SELECT {fila}.plazo, 1 WHERE {fila}.plazo IS NOT NULL AND {fila}.estado IS NOT 'Terminada'
+        ON CONFLICT (plazo) DO UPDATE SET abiertas = abiertas + 1;
+    '''
+
+
+def _restar_del_resumen(fila):
+    """Cuerpo de trigger: descuenta la fila NEW/OLD y borra los contadores que quedan en cero"""
+    return f'''
+        UPDATE resumen_estado SET cantidad = cantidad - 1 WHERE estado = COALESCE({fila}.estado, '');
+        DELETE FROM resumen_estado WHERE estado = COALESCE({fila}.estado, '') AND cantidad = 0;
+        UPDATE resumen_delegada
+        SET abiertas = abiertas - ({fila}.estado IS NOT 'Terminada'),
+            terminadas = terminadas - ({fila}.estado IS 'Terminada')
+        WHERE delegada = COALESCE({fila}.delegada, '');
+        DELETE FROM resumen_delegada
+        WHERE delegada = COALESCE({fila}.delegada, '') AND abiertas = 0 AND terminadas = 0;
+        UPDATE resumen_plazo SET abiertas = abiertas - 1
+        WHERE plazo = {fila}.plazo AND {fila}.estado IS NOT 'Terminada';
+        DELETE FROM resumen_plazo WHERE plazo = {fila}.plazo AND abiertas = 0;
+    '''
+
+
+def _migracion_6_resumen(conn):
+    """Tablas de resumen del tablero (por estado, por delegada y abiertas por plazo)"""
+    # '' representa estado o delegada vacíos (NULL no sirve como clave de conflicto)
+    conn.execute("CREATE TABLE IF NOT EXISTS resumen_estado (estado TEXT PRIMARY KEY, cantidad INTEGER NOT NULL)")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS resumen_delegada (
+            delegada TEXT PRIMARY KEY,
+            abiertas INTEGER NOT NULL,
+            terminadas INTEGER NOT NULL
+        )
+    ''')
+    # Abiertas por fecha de plazo: las vencidas se suman sobre unas cuantas fechas, no sobre las tareas
+    conn.execute("CREATE TABLE IF NOT EXISTS resumen_plazo (plazo TEXT PRIMARY KEY, abiertas INTEGER NOT NULL)")
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS tareas_resumen_insert AFTER INSERT ON tareas
+        BEGIN {_sumar_al_resumen("NEW")} END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS tareas_resumen_delete AFTER DELETE ON tareas
+        BEGIN {_restar_del_resumen("OLD")} END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS tareas_resumen_update AFTER UPDATE OF estado, delegada, plazo ON tareas
+        BEGIN {_restar_del_resumen("OLD")} {_sumar_al_resumen("NEW")} END
+    ''')
+    # Carga inicial con lo que ya hay en la tabla
+    conn.execute("DELETE FROM resumen_estado")
+    conn.execute("DELETE FROM resumen_delegada")
+    conn.execute("DELETE FROM resumen_plazo")
+    conn.execute("INSERT INTO resumen_estado SELECT COALESCE(estado, ''), COUNT(*) FROM tareas GROUP BY 1")
+    conn.execute('''
+        INSERT INTO resumen_delegada
+        SELECT COALESCE(delegada, ''), SUM(estado IS NOT 'Terminada'), SUM(estado IS 'Terminada')
+        FROM tareas GROUP BY 1
+    ''')
+    conn.execute('''
+        INSERT INTO resumen_plazo
+        SELECT plazo, COUNT(*) FROM tareas
+        WHERE plazo IS NOT NULL AND estado IS NOT 'Terminada' GROUP BY plazo
+    ''')
+
+
+def _migracion_7_rev_por_fila(conn):
+    """Contador 'rev' por fila para detectar ediciones concurrentes"""
+    columnas = {fila[1] for fila in conn.execute("PRAGMA table_info(tareas)")}
+    if 'rev' not in columnas:
+        conn.execute("ALTER TABLE tareas ADD COLUMN rev INTEGER NOT NULL DEFAULT 0")
+    # La app sube 'rev' en el mismo UPDATE; el trigger cubre a quien no lo haga
+    # (importación, db.py). Solo actúa si 'rev' no cambió, así no se repite.
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS tareas_rev AFTER UPDATE ON tareas WHEN NEW.rev = OLD.rev
+        BEGIN
+            UPDATE tareas SET rev = OLD.rev + 1 WHERE id = NEW.id;
+        END
+    ''')
+
+
+# Columnas que guarda el historial (todas menos 'id' y 'rev')
+CAMPOS_HISTORIAL = ('tarea', 'acciones', 'fecha_inicio', 'plazo', 'observaciones',
+                    'estado', 'delegada', 'fecha_termino')
+AHORA_SQL = "strftime('%Y-%m-%dT%H:%M:%S', 'now', 'localtime')"
+
+
+def _fila_json(fila):
+    return "json_object(" + ", ".join(f"'{campo}', {fila}.{campo}" for campo in CAMPOS_HISTORIAL) + ")"
+
+
+def _migracion_8_historial(conn):
+    """Historial de solo anexar: altas, bajas y, en cada cambio, solo los campos modificados"""
+    # operacion: 'alta' y 'base' traen la fila completa, 'cambio' solo lo que cambió, 'baja' nada
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tareas_historial (
+            id INTEGER PRIMARY KEY,
+            tarea_id INTEGER NOT NULL,
+            cambiado_en TEXT NOT NULL,
+            operacion TEXT NOT NULL CHECK (operacion IN ('alta', 'cambio', 'baja', 'base')),
+            cambios TEXT
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_historial_tarea_fecha ON tareas_historial (tarea_id, cambiado_en)")
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS tareas_historial_insert AFTER INSERT ON tareas
+        BEGIN
+            INSERT INTO tareas_historial (tarea_id, cambiado_en, operacion, cambios)
+            VALUES (NEW.id, {AHORA_SQL}, 'alta', {_fila_json("NEW")});
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS tareas_historial_delete AFTER DELETE ON tareas
+        BEGIN
+            INSERT INTO tareas_historial (tarea_id, cambiado_en, operacion) VALUES (OLD.id, {AHORA_SQL}, 'baja');
+        END
+    ''')
+    # Solo los campos que cambiaron; el UPDATE de tareas_rev (solo 'rev') no deja rastro
+    distinto = " OR ".join(f"NEW.{campo} IS NOT OLD.{campo}" for campo in CAMPOS_HISTORIAL)
+    cambiados = " UNION ALL ".join(
+        f"SELECT '{campo}' AS campo, NEW.{campo} AS valor WHERE NEW.{campo} IS NOT OLD.{campo}"
+        for campo in CAMPOS_HISTORIAL
+    )
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS tareas_historial_update AFTER UPDATE ON tareas WHEN {distinto}
+        BEGIN
+            INSERT INTO tareas_historial (tarea_id, cambiado_en, operacion, cambios)
+            VALUES (NEW.id, {AHORA_SQL}, 'cambio',
+                    (SELECT json_group_object(campo, valor) FROM ({cambiados})));
+        END
+    ''')
+    # Punto de partida: el estado actual de cada tarea (lo anterior no se conoce)
+    conn.execute(f'''
+        INSERT INTO tareas_historial (tarea_id, cambiado_en, operacion, cambios)
+        SELECT id, {AHORA_SQL}, 'base', {_fila_json("tareas")} FROM tareas
+    ''')
+
+
+# Mientras esté en indices_suspendidos, mover filas entre 'tareas' y el archivo no
+# cuenta como alta ni baja para el historial ni para el resumen (ver archivo.py)
+MARCA_ARCHIVO = 'archivo'
+
+
+def _migracion_9_archivo(conn):
+    """Tabla de tareas archivadas y triggers que ignoran los traslados al archivo"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tareas_archivo (
+            id INTEGER PRIMARY KEY,
+            tarea TEXT NOT NULL,
+            acciones TEXT,
+            fecha_inicio TEXT,
+            plazo TEXT,
+            observaciones TEXT,
+            estado TEXT,
+            delegada TEXT,
+            fecha_termino TEXT,
+            rev INTEGER NOT NULL DEFAULT 0,
+            archivada_en TEXT NOT NULL
+        )
+    ''')
+    # Solo las terminadas: es lo que recorre cada lote de archivado
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tareas_terminadas ON tareas (fecha_termino) "
+                 "WHERE estado = 'Terminada'")
+    no_archivando = f"NOT EXISTS (SELECT 1 FROM indices_suspendidos WHERE nombre = '{MARCA_ARCHIVO}')"
+    for nombre in ("tareas_resumen_insert", "tareas_resumen_delete",
+                   "tareas_historial_insert", "tareas_historial_delete"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {nombre}")
+    conn.execute(f'''
+        CREATE TRIGGER tareas_resumen_insert AFTER INSERT ON tareas WHEN {no_archivando}
+        BEGIN {_sumar_al_resumen("NEW")} END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER tareas_resumen_delete AFTER DELETE ON tareas WHEN {no_archivando}
+        BEGIN {_restar_del_resumen("OLD")} END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER tareas_historial_insert AFTER INSERT ON tareas WHEN {no_archivando}
+        BEGIN
+            INSERT INTO tareas_historial (tarea_id, cambiado_en, operacion, cambios)
+            VALUES (NEW.id, {AHORA_SQL}, 'alta', {_fila_json("NEW")});
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER tareas_historial_delete AFTER DELETE ON tareas WHEN {no_archivando}
+        BEGIN
+            INSERT INTO tareas_historial (tarea_id, cambiado_en, operacion) VALUES (OLD.id, {AHORA_SQL}, 'baja');
+        END
+    ''')
+
+
+def _migracion_10_huellas(conn):
+    """Huella del contenido de cada tarea, para que reimportar filas sin cambios no escriba nada"""
+    # En tabla aparte: una columna en 'tareas' rompería SELECT * -> Tarea y escribirla
+    # dispararía los triggers de revisión, registro de cambios y 'rev'
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tareas_huellas (
+            id INTEGER PRIMARY KEY,   -- ID de la tarea
+            huella TEXT NOT NULL
+        )
+    ''')
+    # Dentro de un INSERT ... ON CONFLICT DO UPDATE sobre 'tareas', SQLite ignora el OR REPLACE
+    # de los triggers y falla por UNIQUE: se reemplaza la fila del registro a mano
+    for operacion, fila in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+        conn.execute(f"DROP TRIGGER IF EXISTS tareas_cambios_{operacion.lower()}")
+        conn.execute(f'''
+            CREATE TRIGGER tareas_cambios_{operacion.lower()} AFTER {operacion} ON tareas
+            BEGIN
+                DELETE FROM tareas_cambios WHERE tarea_id = {fila}.id;
+                INSERT INTO tareas_cambios (tarea_id) VALUES ({fila}.id);
+            END
+        ''')
+    # Clave natural con la que se reconocen las filas importadas sin ID
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tareas_clave_natural ON tareas (tarea, fecha_inicio, delegada)")
+    # Un cambio hecho fuera de la importación deja la huella obsoleta: se borra
+    distinto = " OR ".join(f"NEW.{campo} IS NOT OLD.{campo}" for campo in CAMPOS_HISTORIAL)
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS tareas_huellas_update AFTER UPDATE ON tareas WHEN {distinto}
+        BEGIN
+            DELETE FROM tareas_huellas WHERE id = OLD.id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS tareas_huellas_delete AFTER DELETE ON tareas
+        BEGIN
+            DELETE FROM tareas_huellas WHERE id = OLD.id;
+        END
+    ''')
+    conn.create_function("huella", len(CAMPOS_HISTORIAL), lambda *valores: huella(valores), deterministic=True)
+    conn.execute(f'''
+        INSERT OR REPLACE INTO tareas_huellas (id, huella)
+        SELECT id, huella({", ".join(CAMPOS_HISTORIAL)}) FROM tareas
+    ''')
+
+
+def _migracion_11_sin_registro_cambios(conn):
+    """Quita 'tareas_cambios': la exportación a Excel compara 'revision_datos'"""
+    # El Excel se regenera entero, así que el registro por ID ya no aportaba nada
+    # y sus triggers costaban dos escrituras más por fila modificada
+    for operacion in ("insert", "update", "delete"):
+        conn.execute(f"DROP TRIGGER IF EXISTS tareas_cambios_{operacion}")
+    conn.execute("DROP TABLE IF EXISTS tareas_cambios")
+
+
+def _migracion_12_clave_natural_archivo(conn):
+    """La importación también busca por clave natural entre las tareas archivadas"""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tareas_archivo_clave_natural "
+                 "ON tareas_archivo (tarea, fecha_inicio, delegada)")
+
+
+# (versión, descripción, preparación fuera de transacción o None, paso transaccional)
+MIGRACIONES = [
+    (1, "Esquema unificado de tareas", None, _migracion_1_unificar),
+    (2, "Fechas ISO con CHECK e índices del listado", _normalizar_fechas_por_lotes, _migracion_2_fechas_e_indices),
+    (3, "Contador de revisión para invalidar cachés", None, _migracion_3_revision),
+    (4, "Registro de cambios para la exportación incremental", None, _migracion_4_registro_cambios),
+    (5, "Búsqueda de texto completo (FTS5)", None, _migracion_5_busqueda),
+    (6, "Resúmenes del tablero mantenidos por triggers", None, _migracion_6_resumen),
+    (7, "Revisión por fila para ediciones concurrentes", None, _migracion_7_rev_por_fila),
+    (8, "Historial de cambios por tarea", None, _migracion_8_historial),
+    (9, "Archivo de tareas terminadas", None, _migracion_9_archivo),
+    (10, "Huellas de contenido para importaciones idempotentes", None, _migracion_10_huellas),
+    (11, "Sin registro de cambios: la exportación usa la revisión", None, _migracion_11_sin_registro_cambios),
+    (12, "Clave natural en el archivo de tareas", None, _migracion_12_clave_natural_archivo),
+]
+
+
+# =========================
+# Motor de migraciones
+# =========================
+def _crear_tabla_versiones(conn):
+    """Crea schema_version y registra lo aplicado antes con PRAGMA user_version"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            descripcion TEXT NOT NULL,
+            aplicada_en TEXT NOT NULL
+        )
+    ''')
+    version_anterior = conn.execute("PRAGMA user_version").fetchone()[0]
+    ahora = datetime.now().isoformat(timespec="seconds")
+    conn.executemany(
+        "INSERT OR IGNORE INTO schema_version (version, descripcion, aplicada_en) VALUES (?, ?, ?)",
+        [(version, descripcion, ahora) for version, descripcion, _, _ in MIGRACIONES
+         if version <= version_anterior]
+    )
+
+
+def version_actual(ruta):
+    conn = obtener_conexion(ruta)
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def aplicar_migraciones(ruta):
+    """Aplica en orden los pasos pendientes; cada paso en su propia transacción.
+
+    Dentro de la transacción se vuelve a comprobar la versión, así dos procesos
+    que migran a la vez no aplican el mismo paso dos veces.
+    """
+    with transaccion(ruta) as conn:
+        _crear_tabla_versiones(conn)
+    for version, descripcion, preparar, aplicar in MIGRACIONES:
+        if version <= version_actual(ruta):
+            continue
+        if preparar:
+            preparar(ruta)
+        with transaccion(ruta) as conn:
+            if conn.execute("SELECT 1 FROM schema_version WHERE version = ?", (version,)).fetchone():
+                continue
+            aplicar(conn)
+            conn.execute(
+                "INSERT INTO schema_version (version, descripcion, aplicada_en) VALUES (?, ?, ?)",
+                (version, descripcion, datetime.now().isoformat(timespec="seconds"))
+            )
+            conn.execute(f"PRAGMA user_version = {version}")
+        print(f"[migraciones] {ruta}: aplicada versión {version} ({descripcion})")
+
+
+def asegurar_esquema(ruta):
+    """Migra `ruta` una sola vez por proceso; las llamadas siguientes no tocan SQLite"""
+    clave = str(ruta)
+    if clave in _bases_migradas:
+        return
+    with _bloqueo:
+        if clave not in _bases_migradas:
+            aplicar_migraciones(ruta)
+            _bases_migradas.add(clave)
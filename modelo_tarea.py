@@ -1,20 +1,113 @@
 # modelo_tarea.py
+import hashlib
+import json
+from dataclasses import dataclass, fields
+from datetime import date, datetime
+
+CAMPOS_FECHA = ('fecha_inicio', 'plazo', 'fecha_termino')
+
+
+def _es_nulo(valor):
+    # NaN y NaT (lo que deja pandas en las celdas vacías) son distintos de sí mismos
+    return valor is None or valor != valor
+
+
+def _fecha(valor, campo):
+    """date a partir de lo que entregan SQLite, pandas o st.date_input; None si está vacía"""
+    # Primero los casos de SQLite (texto ISO o NULL), que son la gran mayoría
+    if valor is None or valor == "":
+        return None
+    if isinstance(valor, str):
+        try:
+            return date.fromisoformat(valor[:10])
+        except ValueError:
+            raise ValueError(f"Fecha inválida en '{campo}': {valor!r}") from None
+    if _es_nulo(valor):
+        return None
+    if isinstance(valor, datetime):  # incluye pandas.Timestamp
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    raise ValueError(f"Fecha inválida en '{campo}': {valor!r}")
+
+
+@dataclass(slots=True)
 class Tarea:
-    def __init__(self, id, estado, nombre, compromiso, terminado, delegada, fecha_inicio, plazo, fecha_realizacion, observaciones):
-        self.id = id
-        self.estado = estado
-        self.nombre = nombre
-        self.compromiso = compromiso
-        self.terminado = terminado
-        self.delegada = delegada
-        self.fecha_inicio = fecha_inicio
-        self.plazo = plazo
-        self.fecha_realizacion = fecha_realizacion
-        self.observaciones = observaciones
+    """Una fila de la tabla 'tareas' (esquema unificado).
+
+    Las fechas se validan y convierten a `date` una sola vez, al construirla;
+    `parametros()` las devuelve en ISO para los INSERT/UPDATE.
+    """
+    # Mismo orden de columnas que la tabla 'tareas', así Tarea(*fila) funciona con SELECT *
+    id: int
+    tarea: str
+    acciones: str
+    fecha_inicio: date
+    plazo: date
+    observaciones: str
+    estado: str
+    delegada: str
+    fecha_termino: date
+    rev: int = 0  # revisión de la fila (migración 7)
+
+    def __post_init__(self):
+        self.id = None if _es_nulo(self.id) else int(self.id)
+        self.fecha_inicio = _fecha(self.fecha_inicio, 'fecha_inicio')
+        self.plazo = _fecha(self.plazo, 'plazo')
+        self.fecha_termino = _fecha(self.fecha_termino, 'fecha_termino')
+        self.rev = 0 if _es_nulo(self.rev) else int(self.rev)
+
+    @classmethod
+    def desde_fila(cls, fila):
+        """Desde un sqlite3.Row (por nombre de columna) o una tupla de SELECT *"""
+        if hasattr(fila, "keys"):
+            return cls(**{columna: fila[columna] for columna in fila.keys() if columna in _NOMBRES})
+        return cls(*fila)
+
+    @classmethod
+    def desde_cursor(cls, cursor):
+        """Genera tareas desde un cursor ya ejecutado, sin cargar todas las filas"""
+        nombres = tuple(columna[0] for columna in cursor.description)
+        if nombres == CAMPOS:
+            # SELECT *: posicional, sin armar un dict por fila
+            for fila in cursor:
+                yield cls(*fila)
+        else:
+            for fila in cursor:
+                yield cls.desde_registro(dict(zip(nombres, fila)))
+
+    @classmethod
+    def desde_registro(cls, registro):
+        """Desde un dict de DataFrame.to_dict('records'): NaN/NaT pasan a None, Timestamp a date"""
+        return cls(**{campo: None if _es_nulo(registro.get(campo)) else registro.get(campo)
+                      for campo in CAMPOS})
 
+    def parametros(self, columnas=None):
+        """Tupla de valores para execute/executemany (fechas en ISO), en el orden de `columnas`"""
+        columnas = COLUMNAS_DATOS if columnas is None else columnas
+        return tuple(
+            valor.isoformat() if isinstance(valor, date) else valor
+            for valor in (getattr(self, columna) for columna in columnas)
+        )
 
+    def a_dict(self):
+        """Valores tal como se guardan en la BD (fechas en ISO)"""
+        return dict(zip(CAMPOS, self.parametros(CAMPOS)))
 
 
+CAMPOS = tuple(campo.name for campo in fields(Tarea))
+_NOMBRES = frozenset(CAMPOS)
+# Columnas que escriben los INSERT/UPDATE (el ID y 'rev' los maneja la BD)
+COLUMNAS_DATOS = ('tarea', 'acciones', 'fecha_inicio', 'plazo', 'observaciones',
+                  'estado', 'delegada', 'fecha_termino')
 
 
+def huella(valores):
+    """Resumen del contenido normalizado de una fila: mismo texto sin espacios sobrantes, mismo valor.
 
+    Vacíos y None cuentan igual; las fechas deben venir ya en ISO.
+    """
+    normalizados = [None if _es_nulo(valor) or str(valor).strip() == "" else str(valor).strip()
+                    for valor in valores]
+    texto = json.dumps(normalizados, ensure_ascii=False)
+    return hashlib.blake2b(texto.encode("utf-8"), digest_size=16).hexdigest()
@@ -0,0 +1,128 @@
+# notificaciones.py
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from cache_tareas import leer_revision
+from conexion import obtener_conexion, transaccion
+
+MAX_CAMBIOS = 256           # transacciones recordadas con sus IDs
+INTERVALO_VIGILANCIA = 1.0  # segundos entre revisiones de la fecha del archivo
+
+_canales = {}
+_bloqueo_canales = threading.Lock()
+
+
+def canal_de(ruta):
+    """El canal de `ruta` para todo el proceso (también fuera de `streamlit run`)"""
+    with _bloqueo_canales:
+        if ruta not in _canales:
+            _canales[ruta] = CanalCambios(ruta)
+        return _canales[ruta]
+
+
+class CanalCambios:
+    """Feed de cambios de 'tareas' dentro del proceso, indexado por revision_datos.
+
+    Las escrituras de la app publican (revisión anterior, revisión nueva, IDs
+    tocados). Las de otros procesos se detectan vigilando la fecha del archivo
+    y su -wal, y se publican sin IDs. Las sesiones y /cambios consultan
+    `revision()` sin tocar SQLite; la caché pide `ids_cambiados()` para
+    conservar las tareas que no se tocaron.
+    """
+
+    def __init__(self, ruta, max_cambios=MAX_CAMBIOS):
+        self.ruta = ruta
+        self._bloqueo = threading.Lock()
+        self._cambios = deque(maxlen=max_cambios)  # (desde, hasta, frozenset de IDs o None)
+        self._revision = leer_revision(ruta)
+        self._vigilante = None
+
+    def revision(self):
+        """Última revisión conocida (no consulta la BD)"""
+        with self._bloqueo:
+            return self._revision
+
+    def publicar(self, desde, hasta, ids=None):
+        """Anuncia que la BD pasó de `desde` a `hasta`; `ids` None = no se sabe qué cambió"""
+        if hasta <= desde:
+            return
+        ids = frozenset(ids) if ids is not None else None
+        with self._bloqueo:
+            self._cambios.append((desde, hasta, ids))
+            self._revision = max(self._revision, hasta)
+
+    def ids_cambiados(self, desde, hasta=None):
+        """IDs tocados entre dos revisiones, o None si algún tramo no se conoce"""
+        hasta = self.revision() if hasta is None else hasta
+        with self._bloqueo:
+            tramos = {d: (h, ids) for d, h, ids in self._cambios if ids is not None}
+        ids, actual = set(), desde
+        while actual < hasta:
+            if actual not in tramos:
+                return None  # escritura de otro proceso o ya olvidada
+            actual, parte = tramos[actual]
+            ids |= parte
+        return ids
+
+    @contextmanager
+    def transaccion(self, ids=()):
+        """transaccion() que al confirmar publica el tramo de revisiones y los IDs.
+
+        Entrega (conn, ids): dentro se pueden agregar IDs que se conocen recién
+        al escribir (lastrowid). La revisión se lee con el bloqueo de escritura
+        tomado, así el tramo corresponde exactamente a esta transacción. Si va
+        anidada en otra no se publica: la verá la vigilancia del archivo.
+        """
+        anidada = obtener_conexion(self.ruta).in_transaction
+        ids = {int(id) for id in ids}
+        with transaccion(self.ruta) as conn:
+            desde = leer_revision(self.ruta)
+            yield conn, ids
+            hasta = leer_revision(self.ruta)
+        if not anidada:
+            self.publicar(desde, hasta, ids)
+
+    # =========================
+    # 👀 VIGILANCIA DEL ARCHIVO
+    # =========================
+    def vigilar(self, intervalo=INTERVALO_VIGILANCIA):
+        """Hilo que detecta escrituras de otros procesos (importaciones, db.py por fuera)"""
+        with self._bloqueo:
+            if self._vigilante is not None:
+                return
+            self._vigilante = threading.Thread(
+                target=self._vigilar, args=(intervalo,), name="vigilancia de tareas.db", daemon=True
+            )
+        self._vigilante.start()
+
+    def _firma(self):
+        # En modo WAL los commits escriben en el -wal; el archivo principal cambia al hacer checkpoint
+        firma = []
+        for ruta in (self.ruta, self.ruta + "-wal"):
+            try:
+                info = os.stat(ruta)
+                firma.append((info.st_mtime_ns, info.st_size))
+            except FileNotFoundError:
+                firma.append(None)
+        return tuple(firma)
+
+    def _vigilar(self, intervalo):
+        firma = self._firma()
+        while True:
+            time.sleep(intervalo)
+            nueva = self._firma()
+            if nueva == firma:
+                continue
+            firma = nueva
+            try:
+                revision = leer_revision(self.ruta)
+            except sqlite3.Error as e:
+                print(f"[notificaciones] No se pudo leer la revisión: {e}")
+                continue
+            conocida = self.revision()
+            if revision > conocida:
+                self.publicar(conocida, revision)
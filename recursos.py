@@ -0,0 +1,170 @@
+# recursos.py
+import base64
+import io
+import re
+from functools import lru_cache
+
+ALTO_LOGO = 60         # px con que se muestra el logo en el encabezado (ver .header-logo img)
+ESCALA_PANTALLA = 2    # se guarda al doble para que se vea nítido en pantallas de alta densidad
+
+# Plantilla de estilos de la app (llaves dobles por str.format)
+CSS_APP = """
+    .header-container {{
+        display: flex;
+        align-items: center;
+        justify-content: center;
+        background-color: {color_fondo};
+        height: 85px;
+        width: 100%;
+        color: white;
+        position: relative;
+        margin: -1rem -1rem 1.2rem -1rem;
+    }}
+    .header-logo {{
+        position: absolute;
+        left: 20px;
+        top: 5px;
+        display: flex;
+        flex-direction: column;
+        align-items: flex-start;
+    }}
+    .header-logo img {{
+        height: 60px;
+    }}
+    .header-subtitle {{
+        position: absolute;
+        bottom: 5px;
+        left: 20px;
+        font-size: 10px;
+    }}
+    .header-title {{
+        font-size: 20px;
+        font-weight: bold;
+    }}
+    .main-container {{
+        display: flex;
+        flex-direction: column;
+        height: calc(100vh - 150px) !important;
+        min-height: 500px !important;
+    }}
+    .table-container {{
+        flex: 1;
+        display: flex;
+        flex-direction: column;
+        min-height: 300px;
+    }}
+    .stDataFrame, .stDataEditor {{
+        flex: 1;
+        min-height: 200px;
+    }}
+    .button-container {{
+        margin-top: auto;
+        padding-bottom: 5px !important;
+    }}
+    div[data-testid="stVerticalBlock"] {{
+        height: 100% !important;
+    }}
+    div[data-testid="stHorizontalBlock"] {{
+        height: 100% !important;
+    }}
+
+    /* 🔐 Estilos para pestañas del login (tomado de app.py) */
+    .stTabs [data-baseweb="tab-list"] {{
+        gap: 8px;
+    }}
+    .stTabs [data-baseweb="tab"] {{
+        height: 40px;
+        white-space: pre-wrap;
+        background-color: #f0f2f6;
+        border-radius: 4px 4px 0px 0px;
+        gap: 1px;
+        padding-top: 10px;
+        padding-bottom: 10px;
+    }}
+    .stTabs [aria-selected="true"] {{
+        background-color: {color_fondo};
+        color: white;
+    }}
+
+    /* Selector de vista compacto y alineado a la izquierda */
+    div[data-baseweb="select"] {{
+        width: 220px !important;
+        margin-left: 0 !important;
+    }}
+"""
+
+ENCABEZADO_CON_LOGO = """
+<div class="header-container">
+    <div class="header-logo">
+        <img src="{img_src}" alt="Logo">
+    </div>
+    <div class="header-subtitle">{subtitulo}</div>
+    <div class="header-title">{titulo}</div>
+</div>
+"""
+
+ENCABEZADO_SIN_LOGO = """
+<div style="display: flex; align-items: center; justify-content: center;
+            background-color: {color_fondo}; height: 85px; width: 100%;
+            color: white; position: relative; margin: -1rem -1rem 1.2rem -1rem;">
+    <div style="position: absolute; left: 20px; top: 5px; display: flex;
+               flex-direction: column; align-items: flex-start;">
+        <div style="font-size: 24px; font-weight: bold;">ISL</div>
+    </div>
+    <div style="position: absolute; bottom: 5px; left: 20px; font-size: 10px;">
+        {subtitulo}
+    </div>
+    <div style="font-size: 20px; font-weight: bold;">{titulo}</div>
+</div>
+"""
+
+
+def _minificar(texto):
+    """Quita comentarios y espacios sobrantes: el markup se reenvía en cada rerun"""
+    texto = re.sub(r"/\*.*?\*/", "", texto, flags=re.S)
+    texto = re.sub(r"\s+", " ", texto)
+    return re.sub(r"\s*([{}:;,>])\s*", r"\1", texto).strip()
+
+
+def _reducir_imagen(datos, alto):
+    """PNG reescalado a `alto` px; sin Pillow (opcional) se devuelve tal cual"""
+    try:
+        from PIL import Image
+    except ImportError:
+        return datos
+    with Image.open(io.BytesIO(datos)) as imagen:
+        if imagen.height <= alto:
+            return datos
+        ancho = round(imagen.width * alto / imagen.height)
+        reducida = imagen.convert("RGBA").resize((ancho, alto), Image.LANCZOS)
+    salida = io.BytesIO()
+    reducida.save(salida, format="PNG", optimize=True)
+    return min(salida.getvalue(), datos, key=len)
+
+
+@lru_cache(maxsize=None)
+def logo_data_uri(ruta, alto=ALTO_LOGO):
+    """Logo reducido a su tamaño de despliegue como data URI, una vez por proceso.
+
+    Devuelve None si el archivo no existe.
+    """
+    try:
+        with open(ruta, "rb") as f:
+            datos = f.read()
+    except FileNotFoundError:
+        print(f"[recursos] Archivo de imagen no encontrado: {ruta}")
+        return None
+    datos = _reducir_imagen(datos, alto * ESCALA_PANTALLA)
+    return f"data:image/png;base64,{base64.b64encode(datos).decode()}"
+
+
+@lru_cache(maxsize=None)
+def css_app(color_fondo):
+    return f"<style>{_minificar(CSS_APP.format(color_fondo=color_fondo))}</style>"
+
+
+@lru_cache(maxsize=None)
+def encabezado_html(img_src, titulo, subtitulo, color_fondo):
+    plantilla = ENCABEZADO_CON_LOGO if img_src else ENCABEZADO_SIN_LOGO
+    html = plantilla.format(img_src=img_src, titulo=titulo, subtitulo=subtitulo, color_fondo=color_fondo)
+    return " ".join(html.split())
@@ -0,0 +1,39 @@
+# resumen.py
+from dataclasses import dataclass, field
+from datetime import date
+
+from conexion import obtener_conexion
+
+
+@dataclass
+class ResumenTareas:
+    """Cifras del tablero leídas de las tablas de resumen (no recorre 'tareas')"""
+    por_estado: dict = field(default_factory=dict)    # estado -> cantidad
+    por_delegada: list = field(default_factory=list)  # [(delegada, abiertas, terminadas)]
+    vencidas: int = 0
+    vencen_hoy: int = 0
+
+    @property
+    def total(self):
+        return sum(self.por_estado.values())
+
+
+def leer_resumen(ruta, hoy=None):
+    """Cuenta por estado, carga por delegada y tareas abiertas vencidas a la fecha `hoy`.
+
+    Cada consulta lee una tabla de resumen de pocas filas (estados, delegadas o
+    fechas de plazo distintas), así el costo no depende del número de tareas.
+    """
+    hoy = (hoy or date.today()).isoformat()
+    conn = obtener_conexion(ruta)
+    por_estado = dict(conn.execute("SELECT estado, cantidad FROM resumen_estado"))
+    por_delegada = conn.execute(
+        "SELECT delegada, abiertas, terminadas FROM resumen_delegada ORDER BY abiertas DESC, delegada"
+    ).fetchall()
+    vencidas, vencen_hoy = conn.execute(
+        "SELECT COALESCE(SUM(CASE WHEN plazo < ? THEN abiertas END), 0), "
+        "       COALESCE(SUM(CASE WHEN plazo = ? THEN abiertas END), 0) "
+        "FROM resumen_plazo WHERE plazo <= ?",
+        (hoy, hoy, hoy)
+    ).fetchone()
+    return ResumenTareas(por_estado, por_delegada, vencidas, vencen_hoy)
@@ -0,0 +1,93 @@
+# sincronizacion_excel.py
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+RETARDO_POR_DEFECTO = 2.0  # segundos de espera para agrupar ráfagas de cambios
+
+
+def escribir_atomico(ruta, escribir, sufijo=".xlsx"):
+    """Escribe un archivo en un temporal del mismo directorio y lo renombra.
+
+    `escribir` recibe la ruta temporal. Si falla, el archivo original queda intacto.
+    """
+    directorio = os.path.dirname(os.path.abspath(ruta))
+    fd, ruta_temporal = tempfile.mkstemp(prefix=".tmp_", suffix=sufijo, dir=directorio)
+    os.close(fd)
+    try:
+        escribir(ruta_temporal)
+        os.replace(ruta_temporal, ruta)
+    except BaseException:
+        if os.path.exists(ruta_temporal):
+            os.remove(ruta_temporal)
+        raise
+
+
+class SincronizadorExcel:
+    """Exporta en segundo plano cuando hay cambios pendientes.
+
+    Las escrituras solo llaman a `marcar_pendiente()`; el hilo espera `retardo`
+    segundos sin nuevos cambios y realiza una única exportación.
+    """
+
+    def __init__(self, exportar, retardo=RETARDO_POR_DEFECTO):
+        self._exportar = exportar
+        self.retardo = retardo
+        self._condicion = threading.Condition()
+        self._bloqueo_exportacion = threading.Lock()  # evita dos exportaciones simultáneas
+        self._pendiente = False
+        self._ultimo_cambio = 0.0
+        self._exportando = False
+        self._ultima_sincronizacion = None
+        self._ultimo_error = None
+        self._hilo = threading.Thread(target=self._bucle, name="sincronizador-excel", daemon=True)
+        self._hilo.start()
+
+    def marcar_pendiente(self):
+        """Registra que la base de datos cambió y el Excel debe regenerarse"""
+        with self._condicion:
+            self._pendiente = True
+            self._ultimo_cambio = time.monotonic()
+            self._condicion.notify_all()
+
+    def estado(self):
+        """Devuelve el estado de la sincronización sin bloquear"""
+        with self._condicion:
+            return {
+                "pendiente": self._pendiente,
+                "exportando": self._exportando,
+                "ultima_sincronizacion": self._ultima_sincronizacion,
+                "ultimo_error": self._ultimo_error,
+            }
+
+    def _bucle(self):
+        while True:
+            with self._condicion:
+                while not self._pendiente:
+                    self._condicion.wait()
+                # Esperar a que la ráfaga de cambios se calme
+                while True:
+                    restante = self._ultimo_cambio + self.retardo - time.monotonic()
+                    if restante <= 0:
+                        break
+                    self._condicion.wait(restante)
+                self._pendiente = False
+            self._ejecutar_exportacion()
+
+    def _ejecutar_exportacion(self):
+        with self._bloqueo_exportacion:
+            with self._condicion:
+                self._exportando = True
+            try:
+                self._exportar()
+            except Exception as e:
+                with self._condicion:
+                    self._ultimo_error = str(e)
+                    self._exportando = False
+                return
+            with self._condicion:
+                self._ultima_sincronizacion = datetime.now()
+                self._ultimo_error = None
+                self._exportando = False